@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -68,10 +69,62 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
         "rest_framework.filters.SearchFilter",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "silant.pagination.SizedPageNumberPagination",
     "PAGE_SIZE": 20,
 }
 
+# Потолок для ?page_size= в списках API
+SILANT_MAX_PAGE_SIZE = 1000
+
+# Сколько записей принимает пакетная запись ТО/рекламаций (POST/PATCH .../bulk/)
+SILANT_BULK_MAX_ITEMS = 1000
+
+# Общий для всех процессов кэш: счётчики изменений (ETag), справочник сервисных компаний.
+# Файловый бэкенд виден и веб-процессам, и команде импорта; в продакшене — Redis/Memcached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache",
+    },
+    # ведро троттлинга публичного поиска: нужен бэкенд с атомарными add/incr
+    # (у файлового это get + set). LocMem атомарен в пределах процесса; при нескольких
+    # процессах задайте REDIS_URL (нужен пакет redis) — ведро станет общим.
+    "throttle": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "silant-throttle",
+    },
+}
+if os.environ.get("REDIS_URL"):
+    CACHES["throttle"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+
+# Публичный поиск по зав. №: кэш найденных (с) и ненайденных (с) номеров,
+# max-age для прокси/CDN и token bucket на IP (токенов в секунду, ёмкость ведра).
+SILANT_PUBLIC_CACHE_TIMEOUT = 24 * 3600
+SILANT_PUBLIC_NEGATIVE_TIMEOUT = 60
+SILANT_PUBLIC_MAX_AGE = 60
+SILANT_PUBLIC_THROTTLE = {"rate": 1, "burst": 20}
+# Алиас из CACHES для ведра троттлинга (бэкенд с атомарными add/incr, см. CACHES["throttle"]).
+SILANT_THROTTLE_CACHE = "throttle"
+
+# Сколько секунд держать группы пользователя в общем кэше (0 — только в пределах запроса).
+# Сбрасывается сигналами при изменении групп; для нескольких процессов нужен общий бэкенд кэша.
+SILANT_ROLE_CACHE_TIMEOUT = 0
+
+# Сколько секунд держать в кэше набор id машин пользователя (для фильтра ТО и рекламаций
+# по роли; 0 — не кэшировать). Сбрасывается сигналами при смене клиента/сервиса машины и импортом.
+SILANT_FLEET_CACHE_TIMEOUT = 3600
+
+# Сколько секунд держать медианы интенсивности парка для прогноза ТО (машинам без показаний);
+# периодический rebuild_maintenance_due пересчитывает их раньше.
+SILANT_DUE_FALLBACK_TIMEOUT = 24 * 3600
+
+# Алиас из CACHES для общего счётчика версии справочников (None — только в пределах процесса).
+# С общим бэкендом правка справочника видна всем воркерам.
+SILANT_REFERENCE_CACHE = "default"
+
 # CORS/CSRF под React dev-сервер
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -108,6 +161,23 @@ DATABASES = {
     }
 }
 
+# PostgreSQL включается переменной POSTGRES_DB (нужен psycopg, см. requirements.txt).
+# Соединения переиспользуются (CONN_MAX_AGE) и проверяются перед запросом;
+# PGBOUNCER=1 — режим для pgbouncer в transaction pooling: без серверных курсоров.
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", "postgres"),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("PGBOUNCER") == "1",
+        "OPTIONS": {"connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", "5"))},
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,12 @@
+# Настройки для тестов (python manage.py test выбирает их сам).
+# База — как в settings.py: SQLite или PostgreSQL по POSTGRES_DB.
+from .settings import *  # noqa: F401,F403
+
+# кэш в памяти процесса: тесты не видят backend/.cache и не мешают друг другу
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "silant-tests"},
+    "throttle": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "silant-tests-throttle"},
+}
+
+# быстрый хэш паролей — тесты создают много пользователей
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -1,12 +1,11 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
-from .roles import CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP
+from .roles import CLIENT_GROUP, SERVICE_GROUP, has_role, is_manager
+from .scope import condition
 
 def is_in(user, group_name):
-    return user.is_authenticated and user.groups.filter(name=group_name).exists()
+    return has_role(user, group_name)
 
-def is_manager(user): return is_in(user, MANAGER_GROUP) or user.is_staff or user.is_superuser
 def is_client(user):  return is_in(user, CLIENT_GROUP)
 def is_service(user): return is_in(user, SERVICE_GROUP)
 
@@ -21,25 +20,11 @@ class RoleQuerysetMixin(LoginRequiredMixin):
     filter_on = "machine"
 
     def get_base_filter(self):
-        user = self.request.user
-        if user.is_staff or user.is_superuser:
-            return Q()
-        active = _active_role(self.request, user)
-        if active == "manager":
-            return Q()
-        if not active:      
-            if self.filter_on is None:
-                return Q(client=user) | Q(service_company=user)
-            return Q(**{f"{self.filter_on}__client": user}) | Q(**{f"{self.filter_on}__service_company": user})
-        if active == "service":
-            return Q(service_company=user) if self.filter_on is None else Q(**{f"{self.filter_on}__service_company": user})
-        if active == "client":
-            return Q(client=user) if self.filter_on is None else Q(**{f"{self.filter_on}__client": user})
-        return Q()
+        return condition(self.request.user, self.request, self.model, via=self.filter_on)
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        return qs.filter(self.get_base_filter()).distinct()
+        # условие из scope.condition не размножает строки — DISTINCT не нужен
+        return super().get_queryset().filter(self.get_base_filter())
 
 class OwnerWriteRequiredMixin:
     """
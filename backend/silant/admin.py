@@ -1,6 +1,39 @@
+from functools import reduce
+from operator import and_, or_
+
 from django.contrib import admin
+from django.db.models import Q
 from .models import Machine, Maintenance, Complaint, Reference
 from .acl import is_manager
+from . import fulltext, search
+
+
+class IndexedSearchMixin:
+    """
+    Поиск админки: поля машины из search.FIELDS ищутся через поисковый индекс,
+    остальные search_fields — обычным icontains; строки, подошедшие хоть
+    одним способом, попадают в результат. С search_fulltext = True текстовые
+    поля рекламации ищутся полнотекстовым индексом (fulltext.py).
+    """
+    search_machine_prefix = ""
+    search_fulltext = False
+
+    def get_search_results(self, request, queryset, search_term):
+        words = search.terms(search_term)
+        if not words:
+            return queryset, False
+        indexed = {self.search_machine_prefix + name for name in search.FIELDS}
+        rest = [name for name in self.get_search_fields(request) if name not in indexed]
+        cond = search.match(search_term, self.search_machine_prefix, using=queryset.db)
+        if self.search_fulltext:
+            rest = [name for name in rest if name not in fulltext.FIELDS]
+            found = fulltext.search(queryset.model.objects.using(queryset.db), search_term)
+            cond |= Q(pk__in=found.values("pk"))
+        if rest:
+            cond |= reduce(and_, (
+                reduce(or_, (Q(**{f"{name}__icontains": w}) for name in rest)) for w in words
+            ))
+        return queryset.filter(cond), False
 
 @admin.register(Reference)
 class ReferenceAdmin(admin.ModelAdmin):
@@ -46,7 +79,7 @@ class ComplaintInline(admin.TabularInline):
 
 # ---- Машины ----
 @admin.register(Machine)
-class MachineAdmin(admin.ModelAdmin):
+class MachineAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = (
         "serial_number", "model_technique", "model_engine",
         "shipment_date", "client", "service_company",
@@ -72,10 +105,11 @@ class MachineAdmin(admin.ModelAdmin):
 
 # ---- ТО ----
 @admin.register(Maintenance)
-class MaintenanceAdmin(admin.ModelAdmin):
+class MaintenanceAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("performed_date", "machine", "kind", "operating_hours", "service_company")
     list_filter = ("performed_date", "kind", "service_company")
     search_fields = ("machine__serial_number", "work_order_number")
+    search_machine_prefix = "machine__"
     date_hierarchy = "performed_date"
     ordering = ("-performed_date", "-id")
     list_select_related = ("machine", "kind", "organization", "service_company")
@@ -84,11 +118,13 @@ class MaintenanceAdmin(admin.ModelAdmin):
 
 # ---- Рекламации ----
 @admin.register(Complaint)
-class ComplaintAdmin(admin.ModelAdmin):
+class ComplaintAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("failure_date", "machine", "failure_node", "recovery_method",
                     "recovery_date", "downtime_days", "service_company")
     list_filter = ("failure_date", "failure_node", "recovery_method", "service_company")
     search_fields = ("machine__serial_number", "failure_description", "parts_used")
+    search_machine_prefix = "machine__"
+    search_fulltext = True
     date_hierarchy = "failure_date"
     ordering = ("-failure_date", "-id")
     list_select_related = ("machine", "failure_node", "recovery_method", "service_company")
@@ -0,0 +1,234 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+
+from .directory import display_name
+from .models import Complaint, ComplaintRollup
+from .refcache import ref_name
+
+# ---- аналитика надёжности по рекламациям ----
+# Свёртка ComplaintRollup хранит по месяцу и измерениям число отказов и сумму
+# наработки между отказами (наработка при отказе минус наработка при предыдущем
+# отказе той же машины; для первого отказа — от нуля). Отсюда MTBF группы =
+# сумма интервалов / число отказов. Простой хранится как измерение, поэтому
+# среднее и перцентили считаются точно (взвешенно по числу отказов).
+# Пересчёт — целыми месяцами: интервал рекламации зависит только от предыдущей
+# рекламации машины, так что изменение задевает свой месяц и месяц следующей.
+
+DIMENSIONS = {
+    # имя в URL -> (поле свёртки, как показывать ключ)
+    "model": ("model_technique_id", "ref"),
+    "engine": ("model_engine_id", "ref"),
+    "failure-node": ("failure_node_id", "ref"),
+    "service-company": ("service_company_id", "user"),
+    "month": ("month", "month"),
+}
+PERCENTILES = (50, 90, 95)
+
+
+def _month(day) -> datetime.date:
+    return day.replace(day=1)
+
+
+def _next_month(day) -> datetime.date:
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+# ---- пересчёт свёртки ----
+
+def _facts(months, using):
+    """Рекламации месяцев months, сгруппированные по измерениям свёртки (GROUP BY в БД)."""
+    cond = Q()
+    for month in months:
+        cond |= Q(failure_date__gte=month, failure_date__lt=_next_month(month))
+    previous = (
+        Complaint.objects.using(using)
+        .filter(machine_id=OuterRef("machine_id"))
+        .filter(Q(failure_date__lt=OuterRef("failure_date"))
+                | Q(failure_date=OuterRef("failure_date"), id__lt=OuterRef("id")))
+        .order_by("-failure_date", "-id")
+        .values("operating_hours")[:1]
+    )
+    return (
+        Complaint.objects.using(using).filter(cond)
+        .annotate(
+            interval=Greatest(
+                F("operating_hours") - Coalesce(Subquery(previous), Value(0)),
+                Value(0), output_field=IntegerField(),
+            ),
+        )
+        .values(
+            "failure_node_id", "recovery_method_id", "downtime_days",
+            month=TruncMonth("failure_date"),
+            machine_model=F("machine__model_technique_id"),
+            machine_engine=F("machine__model_engine_id"),
+            machine_client=F("machine__client_id"),
+            machine_service=F("machine__service_company_id"),
+        )
+        .order_by()
+        .annotate(failures=Count("id"), interval_hours=Sum("interval"))
+    )
+
+
+def refresh_months(months, using: str = "default") -> int:
+    """Пересчитывает свёртку за перечисленные месяцы (любые даты внутри месяца)."""
+    months = sorted({_month(m) for m in months if m is not None})
+    total = 0
+    for i in range(0, len(months), 12):
+        chunk = months[i:i + 12]
+        with transaction.atomic(using=using):
+            ComplaintRollup.objects.using(using).filter(month__in=chunk).delete()
+            rows = [
+                ComplaintRollup(
+                    month=row["month"],
+                    model_technique_id=row["machine_model"],
+                    model_engine_id=row["machine_engine"],
+                    failure_node_id=row["failure_node_id"],
+                    recovery_method_id=row["recovery_method_id"],
+                    client_id=row["machine_client"],
+                    service_company_id=row["machine_service"],
+                    downtime_days=row["downtime_days"],
+                    failures=row["failures"],
+                    interval_hours=row["interval_hours"] or 0,
+                )
+                for row in _facts(chunk, using)
+            ]
+            ComplaintRollup.objects.using(using).bulk_create(rows, batch_size=1000)
+        total += len(rows)
+    return total
+
+
+def months_after_change(machine_id, failure_date, using: str = "default") -> set:
+    """Месяцы, которые задевает рекламация машины на эту дату: свой и следующей рекламации."""
+    if machine_id is None or failure_date is None:
+        return set()
+    months = {_month(failure_date)}
+    following = (
+        Complaint.objects.using(using)
+        .filter(machine_id=machine_id, failure_date__gt=failure_date)
+        .order_by("failure_date").values_list("failure_date", flat=True).first()
+    )
+    if following:
+        months.add(_month(following))
+    return months
+
+
+def refresh_machines(machine_ids, using: str = "default") -> int:
+    """Пересчитывает все месяцы, в которых есть рекламации этих машин."""
+    ids = [pk for pk in machine_ids if pk is not None]
+    months = set()
+    for i in range(0, len(ids), 500):
+        months.update(
+            Complaint.objects.using(using).filter(machine_id__in=ids[i:i + 500])
+            .dates("failure_date", "month")
+        )
+    return refresh_months(months, using)
+
+
+def refresh_changes_on_commit(changes, using: str = "default"):
+    """changes — [(machine_id, failure_date)] до и после правки; пересчёт после фиксации."""
+    changes = {c for c in changes if c[0] is not None and c[1] is not None}
+    if not changes:
+        return
+
+    def run():
+        months = set()
+        for machine_id, failure_date in changes:
+            months |= months_after_change(machine_id, failure_date, using)
+        refresh_months(months, using)
+
+    transaction.on_commit(run, using=using)
+
+
+def refresh_machines_on_commit(machine_ids, using: str = "default"):
+    ids = {pk for pk in machine_ids if pk is not None}
+    if ids:
+        transaction.on_commit(lambda: refresh_machines(ids, using), using=using)
+
+
+def rebuild(using: str = "default") -> int:
+    months = Complaint.objects.using(using).dates("failure_date", "month")
+    with transaction.atomic(using=using):
+        ComplaintRollup.objects.using(using).all().delete()
+        return refresh_months(months, using)
+
+
+# ---- отчёт ----
+
+def _weighted_percentiles(values, weights, percents):
+    order = np.argsort(values, kind="stable")
+    values, weights = np.asarray(values)[order], np.asarray(weights)[order]
+    cumulative = np.cumsum(weights)
+    total = cumulative[-1]
+    return [float(values[np.searchsorted(cumulative, total * p / 100.0, side="left")]) for p in percents]
+
+
+def _label(kind, key, users):
+    if key is None:
+        return None
+    if kind == "ref":
+        return ref_name(key)
+    if kind == "user":
+        return users.get(key, "")
+    return key.strftime("%Y-%m")
+
+
+def report(rollup_qs, dimension: str) -> list:
+    """
+    Показатели по измерению dimension из queryset свёртки (уже ограниченного по роли):
+    отказы, MTBF, простой (сумма, среднее, перцентили), доли способов восстановления.
+    dimension=None — одна строка по всему queryset.
+    """
+    field, kind = DIMENSIONS[dimension] if dimension else (None, None)
+    rows = list(
+        rollup_qs.values(*[f for f in (field,) if f], "downtime_days", "recovery_method_id")
+        .order_by()
+        .annotate(failures=Sum("failures"), interval_hours=Sum("interval_hours"))
+    )
+    if not rows:
+        return []
+    frame = pd.DataFrame(rows)
+    frame["downtime_total"] = frame["downtime_days"] * frame["failures"]
+    # ключ группы строкой: None (например, машина без клиента) не теряется в groupby
+    keys = {"" if row.get(field) is None else str(row[field]): row.get(field) for row in rows}
+    frame["key"] = ["" if row.get(field) is None else str(row[field]) for row in rows]
+
+    users = {}
+    if kind == "user":
+        users = {pk: display_name(first, name) for pk, first, name in
+                 User.objects.filter(pk__in=[k for k in keys.values() if k is not None])
+                 .values_list("pk", "first_name", "username")}
+
+    result = []
+    for key, group in frame.groupby("key", sort=False):
+        raw = keys[key]
+        failures = int(group["failures"].sum())
+        downtime = group.groupby("downtime_days")["failures"].sum()
+        mix = group.groupby("recovery_method_id")["failures"].sum().sort_values(ascending=False, kind="stable")
+        percentiles = _weighted_percentiles(downtime.index.to_numpy(), downtime.to_numpy(), PERCENTILES)
+        result.append({
+            "key": raw.isoformat() if kind == "month" else raw,
+            "name": _label(kind, raw, users),
+            "failures": failures,
+            "mtbf_hours": round(float(group["interval_hours"].sum()) / failures, 1),
+            "downtime_total": int(group["downtime_total"].sum()),
+            "downtime_mean": round(float(group["downtime_total"].sum()) / failures, 2),
+            **{f"downtime_p{p}": v for p, v in zip(PERCENTILES, percentiles)},
+            "recovery_mix": [
+                {"id": int(pk), "name": ref_name(int(pk)), "failures": int(n), "share": round(int(n) / failures, 4)}
+                for pk, n in mix.items()
+            ],
+        })
+    if dimension is None:
+        for item in result:
+            del item["key"], item["name"]
+    elif kind == "month":
+        result.sort(key=lambda item: item["key"])
+    else:
+        result.sort(key=lambda item: (-item["failures"], item["name"] or ""))
+    return result
@@ -1,5 +1,14 @@
-from django.db.models import Q
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
@@ -9,27 +18,20 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .models import Machine, Maintenance, Complaint, Reference
+from . import analytics, fulltext, listing, machine_stats, maintenance_due, public_lookup, refcache, scope, versions
+from .directory import service_companies
+from .filters import MaintenanceApiFilter
+from .models import Machine, Maintenance, MaintenanceDue, Complaint, ComplaintRollup, Reference
 from .serializers import (
     MachineSerializer, MachinePublicSerializer,
-    MaintenanceSerializer, ComplaintSerializer, ReferenceSerializer
+    MaintenanceSerializer, MaintenanceDueSerializer, ComplaintSerializer, ReferenceSerializer
 )
+from .pagination import KeysetPagination, SizedPageNumberPagination
+from .search import IndexedSearchFilter
+from .throttling import PublicLookupThrottle
 from .permissions import IsManager, CanWriteMaintenance, CanWriteComplaint
-from .roles import CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP
-
-
-# ---- активная роль из заголовка ----
-VALID_GROUPS = {CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP}
-
-def _active_from_header(request, user):
-    """
-    Читает X-Active-Role и валидирует, что пользователь состоит в этой группе.
-    Возвращает 'manager' | 'service' | 'client' | None
-    """
-    role = (request.headers.get("X-Active-Role") or "").strip().lower()
-    if role in VALID_GROUPS and user.groups.filter(name=role).exists():
-        return role
-    return None
+from .acl import OwnerWriteRequiredMixin
+from .roles import active_role, group_names
 
 
 # ---- профиль текущего пользователя ----
@@ -41,66 +43,287 @@ def profile(request):
         "id": u.id,
         "username": u.username,
         "first_name": u.first_name,
-        "groups": list(u.groups.values_list("name", flat=True)),
+        "groups": sorted(group_names(u)),
     })
 
 
 # ---- ограничение queryset с учётом активной роли ----
 def limited_qs_for(user, request, queryset, is_child=False):
-    # анон на приватные списки не допущен
-    if not user.is_authenticated:
-        return queryset.none()
+    """
+    Что видит пользователь: staff/superuser и менеджер (выбран явно) — всё;
+    при роли service/client — свои машины по этому полю; без роли — машины,
+    где он клиент или сервис; аноним — ничего. is_child — ТО/рекламации (через machine).
+    """
+    return scope.restrict(queryset, user, request, via="machine" if is_child else None)
 
-    # staff/superuser — полный доступ
-    if user.is_staff or user.is_superuser:
-        return queryset
 
-    active = _active_from_header(request, user)
+# ---- условные GET (ETag / 304) ----
+class ConditionalGetMixin:
+    """
+    ETag для списка и карточки: счётчики изменений таблиц из etag_tables,
+    пользователь, активная роль и строка запроса. Если клиент прислал тот же
+    If-None-Match — 304 без запроса к данным и без сериализации.
+    """
+    etag_tables = ()
+
+    def _etag(self, request):
+        user = request.user
+        return versions.etag(
+            self.basename, self.action, versions.current(*self.etag_tables),
+            user.pk, user.is_staff or user.is_superuser, active_role(request, user),
+            request.get_full_path(), request.headers.get("Accept", ""),
+        )
+
+    def _conditional(self, request, respond):
+        tag = self._etag(request)
+        response = Response(status=304) if versions.matches(request, tag) else respond()
+        if response.status_code in (200, 304):
+            response["ETag"] = tag
+            response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Authorization", "X-Active-Role", "Cookie"))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+
+# ---- все строки списка одним потоком (JSON Lines) ----
+class JsonLinesMixin:
+    """
+    GET <список>/all/ — все строки с теми же фильтрами, сортировкой и правами,
+    что и у списка, без пагинации: по JSON-объекту на строку.
+    Строки читаются из БД кусками (.iterator), память не растёт с объёмом.
+    """
+    stream_chunk_size = 2000
 
-    # менеджер (выбран явно) — полный доступ
-    if active == "manager":
-        return queryset
+    def _json_lines(self, queryset):
+        encoder = JSONEncoder(ensure_ascii=False)
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        for obj in queryset.iterator(chunk_size=self.stream_chunk_size):
+            yield encoder.encode(serializer_class(obj, context=context).data) + "\n"
+
+    @action(detail=False, methods=["get"], url_path="all", pagination_class=None)
+    def all_rows(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self._json_lines(queryset), content_type="application/x-ndjson; charset=utf-8")
+
+
+# ---- списки без сериализатора, выбор полей ----
+class LeanListMixin:
+    """
+    Список и /all/ читаются через queryset.values() по колонкам view.lean_listing
+    (silant.listing), строки собираются словарями — JSON тот же, что у
+    serializer_class, без разбора полей DRF на каждой строке.
+    ?fields=a,b — только эти поля, ?omit=c,d — все, кроме этих (в списке, /all/ и
+    карточке): невыбранные поля не читаются из БД и не добавляют JOIN.
+    Фильтры, сортировка, права и пагинация — прежние; запись — сериализатором.
+    """
+    lean_listing = None
+    fields_param = "fields"
+    omit_param = "omit"
+    projected_actions = ("list", "retrieve", "all_rows")
+
+    def requested_fields(self):
+        """Выбранные поля в порядке сериализатора; None — все (или действие без выбора полей)."""
+        if self.action not in self.projected_actions:
+            return None
+        if not hasattr(self, "_requested_fields"):
+            keys = self.lean_listing.keys
+            chosen, errors = keys, {}
+            for param in (self.fields_param, self.omit_param):
+                names = [n.strip() for n in self.request.query_params.get(param, "").split(",") if n.strip()]
+                unknown = [n for n in names if n not in keys]
+                if unknown:
+                    errors[param] = [f"unknown fields: {', '.join(unknown)}"]
+                elif names:
+                    keep = param == self.fields_param
+                    chosen = tuple(k for k in chosen if (k in names) == keep)
+            if errors:
+                raise ValidationError(errors)
+            self._requested_fields = None if chosen == keys else chosen
+        return self._requested_fields
+
+    def get_listing(self):
+        fields = self.requested_fields()
+        return self.lean_listing if fields is None else self.lean_listing.project(fields)
 
-    # роль не задана — старое поведение (OR по клиенту/сервису)
-    if not active:
-        if is_child:
-            return queryset.filter(
-                Q(machine__client=user) | Q(machine__service_company=user)
-            )
-        return queryset.filter(Q(client=user) | Q(service_company=user))
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "retrieve" and self.requested_fields() is not None:
+            queryset = self.get_listing().only(queryset)
+        return queryset
 
-    # явная роль service/client
-    if active == "service":
-        return queryset.filter(machine__service_company=user) if is_child \
-               else queryset.filter(service_company=user)
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.requested_fields()
+        if fields is not None:
+            for name in set(serializer.fields) - set(fields):
+                serializer.fields.pop(name)
+        return serializer
+
+    def list(self, request, *args, **kwargs):
+        lean = self.get_listing()
+        # id и ключ сортировки нужны курсору KeysetPagination, даже если их нет в ответе
+        queryset = lean.values(
+            self.filter_queryset(self.get_queryset()), extra=("id", *getattr(self, "keyset_fields", ())),
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(lean.rows(page))
+        return Response(lean.rows(queryset))
+
+    def _json_lines(self, queryset):
+        lean = self.get_listing()  # неверный ?fields= — 400 до начала потока
+        return self._lean_lines(lean, lean.values(queryset))
+
+    def _lean_lines(self, lean, values):
+        encoder = JSONEncoder(ensure_ascii=False)
+        row, name = lean.row, listing.ref_names()
+        for v in values.iterator(chunk_size=self.stream_chunk_size):
+            yield encoder.encode(row(v, name)) + "\n"
+
+
+# ---- пакетная запись ----
+class BulkWriteMixin(OwnerWriteRequiredMixin):
+    """
+    POST <список>/bulk/ — создать, PATCH <список>/bulk/ — изменить (у каждой записи id)
+    до SILANT_BULK_MAX_ITEMS записей за запрос. Проверка — сериализатором списка
+    (машины одним запросом, справочники из refcache), права на все машины — по правилам
+    OwnerWriteRequiredMixin, запись — bulk_create/bulk_update в одной транзакции.
+    Ответ — итог по каждой записи: {index, status: created|updated|error, id, errors};
+    неверные записи не мешают остальным. Сервисная компания берётся из машины.
+    bulk_create не шлёт сигналов — сводки, индексы и ETag'и обновляет bulk_written.
+    """
 
-    if active == "client":
-        return queryset.filter(machine__client=user) if is_child \
-               else queryset.filter(client=user)
+    def bulk_written(self, objs, previous):
+        """
+        Хук после записи пачки (внутри её транзакции): objs — созданные и изменённые
+        записи, previous — их прежние {machine_id, failure_date}. Здесь ничего не делает.
+        """
 
-    # на всякий случай
-    return queryset.none()
+    @swagger_auto_schema(
+        methods=["post", "patch"],
+        operation_description="Пакетная запись: POST — создать, PATCH — изменить записи по id. "
+                              "Тело — JSON-массив объектов; ответ — результат по каждой записи.",
+    )
+    @action(detail=False, methods=["post", "patch"], url_path="bulk")
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"detail": "expected a JSON array"}, status=400)
+        limit = getattr(settings, "SILANT_BULK_MAX_ITEMS", 1000)
+        if len(items) > limit:
+            return Response({"detail": f"too many items (max {limit})"}, status=400)
+
+        updating = request.method == "PATCH"
+        model = self.queryset.model
+        existing = {}
+        if updating:
+            ids = {item.get("id") for item in items if isinstance(item, dict) and isinstance(item.get("id"), int)}
+            existing = model.objects.in_bulk(ids)
+        serializer = self.get_serializer(data=items, many=True, partial=updating)
+        checked = serializer.validate_items(items)
+        machines = dict(serializer.child.fields["machine"].prefetched or {})
+        missing = {obj.machine_id for obj in existing.values()} - set(machines)
+        if missing:
+            machines.update(Machine.objects.in_bulk(missing))
+
+        user = request.user
+        denied = {"non_field_errors": ["Недостаточно прав для изменения объекта."]}
+        results, created, changed, previous, fields = [], [], [], [], set()
+        for index, (item, (data, errors)) in enumerate(zip(items, checked)):
+            obj = None
+            if errors is None and updating:
+                obj = existing.get(item.get("id"))
+                if obj is None:
+                    errors = {"id": ["Запись не найдена."]}
+                elif not self._is_allowed_for_user(machines[obj.machine_id], user):
+                    errors = denied
+            if errors is None:
+                machine = data.get("machine") or machines[obj.machine_id]
+                if not self._is_allowed_for_user(machine, user):
+                    errors = denied
+            if errors is not None:
+                pk = item.get("id") if updating and isinstance(item, dict) else None
+                results.append({"index": index, "status": "error", "id": pk, "errors": errors})
+                continue
+            if updating:
+                previous.append({"machine_id": obj.machine_id, "failure_date": getattr(obj, "failure_date", None)})
+                for name, value in data.items():
+                    setattr(obj, name, value)
+                fields.update(data)
+                changed.append(obj)
+            else:
+                obj = model(**data)
+                created.append(obj)
+            if not updating or previous[-1]["machine_id"] != obj.machine_id:
+                obj.service_company_id = machine.service_company_id
+            if hasattr(obj, "fill_downtime"):
+                obj.fill_downtime()
+            results.append({"index": index, "status": "updated" if updating else "created", "obj": obj})
+
+        with transaction.atomic():
+            if created:
+                model.objects.bulk_create(created, batch_size=500)
+            if changed:
+                extra = ["service_company"] + (["downtime_days"] if model is Complaint else [])
+                model.objects.bulk_update(changed, sorted(fields) + extra, batch_size=500)
+            if created or changed:
+                self.bulk_written(created + changed, previous)
+
+        for result in results:
+            obj = result.pop("obj", None)
+            if obj is not None:
+                result.update(id=obj.pk, errors=None)
+        written = len(created) + len(changed)
+        failed = len(results) - written
+        status = 207 if written and failed else 400 if failed else 200 if updating else 201
+        return Response({
+            "created": len(created), "updated": len(changed), "errors": failed, "results": results,
+        }, status=status)
 
 
 # ===== Машины =====
-class MachineViewSet(viewsets.ModelViewSet):
-    queryset = Machine.objects.select_related(
-        "model_technique", "model_engine", "model_transmission",
-        "model_drive_bridge", "model_steer_bridge"
-    ).all()
+class MachineViewSet(ConditionalGetMixin, LeanListMixin, JsonLinesMixin, viewsets.ModelViewSet):
+    # названия справочников сериализатор берёт из refcache, JOIN к Reference не нужен
+    # сводка по ТО/рекламациям — аннотациями из MachineStats (один LEFT JOIN, без N+1),
+    # при ?fields= — только если её поля выбраны или по ним сортируют
+    queryset = Machine.objects.select_related("client", "service_company").all()
+    etag_tables = (versions.MACHINES, versions.MAINTENANCE, versions.COMPLAINTS, versions.REFERENCES, versions.USERS)
     serializer_class = MachineSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    lean_listing = listing.MACHINES
+    filter_backends = [DjangoFilterBackend, OrderingFilter, IndexedSearchFilter]
     filterset_fields = {
         "model_technique": ["exact"],
         "model_engine": ["exact"],
         "model_transmission": ["exact"],
         "model_steer_bridge": ["exact"],
         "model_drive_bridge": ["exact"],
+        "stats__last_maintenance_date": ["lte", "gte", "isnull"],
+        "stats__complaint_count": ["gte", "lte"],
+        "stats__downtime_days": ["gte", "lte"],
+        "stats__operating_hours": ["gte", "lte"],
     }
     ordering = ("-shipment_date",)
+    pagination_class = KeysetPagination
+    keyset_fields = ("shipment_date",)
 
     def get_queryset(self):
-        return limited_qs_for(self.request.user, self.request, super().get_queryset())
+        queryset = machine_stats.annotate(super().get_queryset(), names=self._stat_fields())
+        return limited_qs_for(self.request.user, self.request, queryset)
+
+    def _stat_fields(self):
+        """Поля сводки, которые нужны запросу: выбранные ?fields= и те, по которым сортируют."""
+        fields = self.requested_fields()
+        if fields is None:
+            return None
+        ordering = self.request.query_params.get(OrderingFilter.ordering_param, "")
+        wanted = set(fields) | {term.strip().lstrip("-") for term in ordering.split(",")}
+        return [name for name in machine_stats.API_FIELDS if name in wanted]
 
     def get_permissions(self):
         # писать машины — только менеджер
@@ -110,49 +333,127 @@ class MachineViewSet(viewsets.ModelViewSet):
 
 
 # ===== ТО =====
-class MaintenanceViewSet(viewsets.ModelViewSet):
-    queryset = Maintenance.objects.select_related(
-        "machine", "kind", "organization", "service_company"
-    ).all()
+class MaintenanceViewSet(ConditionalGetMixin, LeanListMixin, JsonLinesMixin, BulkWriteMixin, viewsets.ModelViewSet):
+    queryset = Maintenance.objects.select_related("machine", "service_company").all()
+    etag_tables = (versions.MAINTENANCE, versions.MACHINES, versions.REFERENCES, versions.USERS)
     serializer_class = MaintenanceSerializer
+    lean_listing = listing.MAINTENANCE
     permission_classes = [IsAuthenticated, CanWriteMaintenance]
 
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = {
-        "kind": ["exact"],
-        "machine__serial_number": ["icontains", "exact"],
-        "service_company": ["exact"],
-    }
+    filter_backends = [DjangoFilterBackend, OrderingFilter, IndexedSearchFilter]
+    filterset_class = MaintenanceApiFilter
     ordering = ("-performed_date",)
+    search_machine_prefix = "machine__"
+    pagination_class = KeysetPagination
+    keyset_fields = ("performed_date",)
+    model_kind = "maintenance"
 
     def get_queryset(self):
         return limited_qs_for(self.request.user, self.request, super().get_queryset(), is_child=True)
 
+    def bulk_written(self, objs, previous):
+        machine_ids = {o.machine_id for o in objs} | {p["machine_id"] for p in previous}
+        versions.bump(versions.MAINTENANCE)
+        machine_stats.refresh(machine_ids)
+        maintenance_due.refresh(machine_ids)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="within_days", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description=f"Горизонт в днях (по умолчанию {maintenance_due.DEFAULT_WITHIN_DAYS}); "
+                            "просроченные ТО входят всегда",
+            ),
+            openapi.Parameter(name="kind", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Вид ТО"),
+        ],
+        responses={200: MaintenanceDueSerializer(many=True)},
+        operation_description="Прогноз ТО: машины, которым ТО понадобится в ближайшие within_days дней "
+                              "(по интенсивности работы), по дате.",
+    )
+    @action(detail=False, methods=["get"], url_path="due", pagination_class=SizedPageNumberPagination,
+            serializer_class=MaintenanceDueSerializer, filter_backends=[])
+    def due(self, request):
+        try:
+            within = int(request.query_params.get("within_days", maintenance_due.DEFAULT_WITHIN_DAYS))
+            kind = request.query_params.get("kind")
+            kind = int(kind) if kind else None
+        except ValueError:
+            return Response({"detail": "within_days/kind: expected integer"}, status=400)
+        if within < 0:
+            return Response({"detail": "within_days must be >= 0"}, status=400)
+        # клиент и сервис машины продублированы в прогнозе — JOIN к Machine для прав не нужен
+        queryset = limited_qs_for(request.user, request, MaintenanceDue.objects.select_related("machine").only(
+            *[f.attname for f in MaintenanceDue._meta.concrete_fields], "machine__serial_number",
+        ))
+        queryset = queryset.filter(due_date__lte=timezone.localdate() + datetime.timedelta(days=within))
+        if kind is not None:
+            queryset = queryset.filter(kind_id=kind)
+        page = self.paginate_queryset(queryset.order_by("due_date", "id"))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
 
 # ===== Рекламации =====
-class ComplaintViewSet(viewsets.ModelViewSet):
-    queryset = Complaint.objects.select_related(
-        "machine", "failure_node", "recovery_method", "service_company"
-    ).all()
+class ComplaintViewSet(ConditionalGetMixin, LeanListMixin, JsonLinesMixin, BulkWriteMixin, viewsets.ModelViewSet):
+    queryset = Complaint.objects.select_related("machine", "service_company").all()
+    etag_tables = (versions.COMPLAINTS, versions.MACHINES, versions.REFERENCES, versions.USERS)
     serializer_class = ComplaintSerializer
+    lean_listing = listing.COMPLAINTS
     permission_classes = [IsAuthenticated, CanWriteComplaint]
 
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, IndexedSearchFilter]
     filterset_fields = {
         "failure_node": ["exact"],
         "recovery_method": ["exact"],
         "service_company": ["exact"],
     }
     ordering = ("-failure_date",)
+    search_machine_prefix = "machine__"
+    pagination_class = KeysetPagination
+    keyset_fields = ("failure_date",)
+    model_kind = "complaint"
 
     def get_queryset(self):
         return limited_qs_for(self.request.user, self.request, super().get_queryset(), is_child=True)
 
+    def bulk_written(self, objs, previous):
+        machine_ids = {o.machine_id for o in objs} | {p["machine_id"] for p in previous}
+        versions.bump(versions.COMPLAINTS)
+        fulltext.index_complaints(objs)
+        machine_stats.refresh(machine_ids)
+        maintenance_due.refresh(machine_ids)
+        # как при импорте: свёртку пересчитываем по машинам, а не по каждой рекламации
+        analytics.refresh_machines_on_commit(machine_ids)
+
+    @swagger_auto_schema(
+        manual_parameters=[openapi.Parameter(
+            name="q", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+            description="Слова из описания отказа или запчастей (словоформы учитываются)",
+        )],
+        operation_description="Полнотекстовый поиск рекламаций: по релевантности, "
+                              "с подсветкой совпадений (highlight, HTML с <mark>).",
+    )
+    @action(detail=False, methods=["get"], url_path="search", pagination_class=SizedPageNumberPagination)
+    def text_search(self, request):
+        text = request.query_params.get("q") or ""
+        phrases = fulltext.parse(text)
+        if not phrases:
+            return Response({"detail": "q query param is required"}, status=400)
+        queryset = fulltext.search(self.filter_queryset(self.get_queryset()), text)
+        page = self.paginate_queryset(queryset)
+        rows = []
+        for obj, data in zip(page, self.get_serializer(page, many=True).data):
+            data["search_score"] = obj.search_score
+            data["highlight"] = fulltext.highlights(obj, phrases)
+            rows.append(data)
+        return self.get_paginated_response(rows)
+
 
 # ===== Справочники =====
-class ReferenceViewSet(viewsets.ModelViewSet):
+class ReferenceViewSet(ConditionalGetMixin, LeanListMixin, JsonLinesMixin, viewsets.ModelViewSet):
     queryset = Reference.objects.all()
+    etag_tables = (versions.REFERENCES,)
     serializer_class = ReferenceSerializer
+    lean_listing = listing.REFERENCES
 
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ["entity", "name"]
@@ -164,33 +465,131 @@ class ReferenceViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [IsManager()]
 
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def bundle(self, request):
+        """Все справочники одним ответом: {entity: [{id, name, description}]}, с ETag."""
+        snap = refcache.snapshot()
+        if versions.matches(request, snap.etag):
+            response = Response(status=304)
+        else:
+            response = Response(snap.bundle)
+        response["ETag"] = snap.etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+# ===== Сервисные компании (для фильтров) =====
+class ServiceCompanyList(APIView):
+    """
+    id и отображаемое имя сервисных компаний из кэшированного справочника.
+    Видимость как у списка машин: кому limited_qs_for отдаёт все машины — все компании,
+    остальным — только компании своих машин (с учётом активной роли).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        items = service_companies()
+        user = request.user
+        if not (user.is_staff or user.is_superuser or active_role(request, user) == "manager"):
+            machines = limited_qs_for(user, request, Machine.objects.all())
+            visible = set(machines.order_by().values_list("service_company_id", flat=True).distinct())
+            items = [item for item in items if item["id"] in visible]
+        return Response(items)
+
+
+# ===== Аналитика надёжности =====
+class AnalyticsView(APIView):
+    """
+    GET /api/analytics/ — итог по всем видимым рекламациям и список разрезов;
+    GET /api/analytics/<разрез>/ — показатели по модели, двигателю, узлу отказа,
+    сервисной компании или месяцу. ?date_from= / ?date_to= (ГГГГ-ММ или дата) — по месяцам отказа.
+    Считается по свёртке ComplaintRollup с теми же правами, что список машин.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dimension=None):
+        if dimension is not None and dimension not in analytics.DIMENSIONS:
+            return Response({"detail": f"unknown dimension, expected one of: {', '.join(analytics.DIMENSIONS)}"},
+                            status=404)
+        queryset = limited_qs_for(request.user, request, ComplaintRollup.objects.all())
+        try:
+            date_from = _month_param(request.query_params.get("date_from"))
+            date_to = _month_param(request.query_params.get("date_to"))
+        except ValueError:
+            return Response({"detail": "date_from/date_to: expected YYYY-MM or YYYY-MM-DD"}, status=400)
+        if date_from:
+            queryset = queryset.filter(month__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(month__lte=date_to)
+        if dimension is None:
+            total = analytics.report(queryset, None)
+            return Response({
+                "total": total[0] if total else None,
+                "dimensions": list(analytics.DIMENSIONS),
+            })
+        return Response(analytics.report(queryset, dimension))
+
+
+def _month_param(value):
+    """'2024-05' или '2024-05-17' -> первое число месяца; пусто -> None."""
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 7:
+        value += "-01"
+    return datetime.date.fromisoformat(value).replace(day=1)
+
 
 # ===== Публичная точка: поиск по серийному номеру =====
 serial_param = openapi.Parameter(
     name="serial",
     in_=openapi.IN_QUERY,
-    description="Заводской номер машины (точное совпадение)",
+    description=f"Заводской номер машины (точное совпадение); до {public_lookup.MAX_BATCH} номеров через запятую",
     type=openapi.TYPE_STRING,
     required=True,
 )
 
 class PublicMachineBySerial(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [PublicLookupThrottle]
+
+    @staticmethod
+    def throttle_cost(request):
+        return max(1, len(public_lookup.parse_serials(request.query_params.get("serial"))))
 
     @swagger_auto_schema(
         manual_parameters=[serial_param],
         responses={200: MachinePublicSerializer},
-        operation_description="Публичный поиск по заводскому номеру. Возвращает поля 1–10."
+        operation_description="Публичный поиск по заводскому номеру. Возвращает поля 1–10. "
+                              "Для нескольких номеров — список в том же порядке, "
+                              "ненайденные: {serial_number, detail: not_found}."
     )
     def get(self, request):
-        serial = (request.query_params.get("serial") or "").strip()
-        if not serial:
+        raw = request.query_params.get("serial") or ""
+        serials = public_lookup.parse_serials(raw)
+        if not serials:
             return Response({"detail": "serial query param is required"}, status=400)
-
-        m = Machine.objects.select_related(
-            "model_technique", "model_engine", "model_transmission",
-            "model_drive_bridge", "model_steer_bridge"
-        ).filter(serial_number=serial).first()
-        if not m:
-            return Response({"detail": "not_found"}, status=404)
-        return Response(MachinePublicSerializer(m).data)
+        if len(serials) > public_lookup.MAX_BATCH:
+            return Response({"detail": f"too many serials (max {public_lookup.MAX_BATCH})"}, status=400)
+        batch = "," in raw
+
+        data_state = public_lookup.state()
+        tag = versions.etag("public", data_state, serials, batch)
+        if versions.matches(request, tag):
+            response = Response(status=304)
+        else:
+            found = public_lookup.lookup(serials, data_state)
+            if batch:
+                response = Response([
+                    found[s] if found[s] is not None else {"serial_number": s, "detail": "not_found"}
+                    for s in serials
+                ])
+            elif found[serials[0]] is None:
+                response = Response({"detail": "not_found"}, status=404)
+            else:
+                response = Response(found[serials[0]])
+        response["ETag"] = tag
+        # ответ одинаков для всех — его можно держать в CDN/прокси
+        max_age = getattr(settings, "SILANT_PUBLIC_MAX_AGE", 60)
+        response["Cache-Control"] = f"public, max-age={max_age if response.status_code != 404 else min(max_age, 30)}"
+        return response
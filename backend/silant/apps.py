@@ -6,5 +6,9 @@ class SilantConfig(AppConfig):
     name = 'silant'
     def ready(self):
         from django.db.models.signals import post_migrate
+        from . import fulltext, maintenance_due, search
         from .signals import ensure_groups_and_perms
-        post_migrate.connect(ensure_groups_and_perms, sender=self)
\ No newline at end of file
+        post_migrate.connect(ensure_groups_and_perms, sender=self)
+        post_migrate.connect(search.ensure_index, sender=self)
+        post_migrate.connect(fulltext.ensure_index, sender=self)
+        post_migrate.connect(maintenance_due.ensure_plan, sender=self)
\ No newline at end of file
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .roles import SERVICE_GROUP
+
+# ---- справочник сервисных компаний ----
+# Список (id, отображаемое имя) всех пользователей группы service строится
+# одним запросом и хранится в кэше Django до изменения пользователей или групп
+# (сброс — в signals.py).
+
+CACHE_KEY = "silant:service-companies"
+
+
+def display_name(first_name, username) -> str:
+    """Как userDisplayName во фронтенде: имя, иначе логин."""
+    return (first_name or "").strip() or username or ""
+
+
+def service_companies() -> list:
+    """[{'id': ..., 'name': ...}] всех сервисных компаний, по алфавиту."""
+    items = cache.get(CACHE_KEY)
+    if items is None:
+        rows = (
+            User.objects.filter(groups__name=SERVICE_GROUP)
+            .values_list("id", "first_name", "username")
+            .distinct()
+        )
+        items = sorted(
+            ({"id": pk, "name": display_name(first, username)} for pk, first, username in rows),
+            key=lambda item: (item["name"].lower(), item["id"]),
+        )
+        cache.set(CACHE_KEY, items, None)
+    return items
+
+
+def service_company_choices():
+    """choices для фильтров HTML-страниц."""
+    return [(item["id"], item["name"]) for item in service_companies()]
+
+
+def forget_service_companies():
+    cache.delete(CACHE_KEY)
+    # список, собранный внутри ещё не зафиксированной транзакции, тоже устарел
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
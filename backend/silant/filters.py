@@ -1,41 +1,59 @@
+from functools import partial
+
 import django_filters as f
-from django.contrib.auth.models import User
-from .models import Machine, Maintenance, Complaint, Reference
-from .roles import SERVICE_GROUP
+from .directory import service_company_choices
+from .models import Machine, Maintenance, Complaint
+from .refcache import ref_choices
+from .search import matching
+
+def ref_filter(label: str, entity: str):
+    """Выбор значения справочника; варианты берутся из кэша, а не запросом на каждую форму."""
+    return f.ChoiceFilter(label=label, choices=partial(ref_choices, entity))
 
-def ref_qs(entity: str):
-    return Reference.objects.filter(entity=entity)
+class SerialContainsFilter(f.CharFilter):
+    """Подстрока зав. № машины через поисковый индекс (search.py), а не LIKE '%…%'."""
+    def filter(self, qs, value):
+        if value in f.constants.EMPTY_VALUES:
+            return qs
+        prefix = self.field_name[: -len("serial_number")]
+        return matching(qs, value, prefix, columns=("serial_number",))
 
 class MachineFilter(f.FilterSet):
-    model_technique   = f.ModelChoiceFilter(label="Модель техники",      queryset=ref_qs("Модель техники"))
-    model_engine      = f.ModelChoiceFilter(label="Модель двигателя",     queryset=ref_qs("Модель двигателя"))
-    model_transmission= f.ModelChoiceFilter(label="Модель трансмиссии",   queryset=ref_qs("Модель трансмиссии"))
-    model_steer_bridge= f.ModelChoiceFilter(label="Модель управляемого моста", queryset=ref_qs("Модель управляемого моста"))
-    model_drive_bridge= f.ModelChoiceFilter(label="Модель ведущего моста",    queryset=ref_qs("Модель ведущего моста"))
+    model_technique   = ref_filter("Модель техники", "Модель техники")
+    model_engine      = ref_filter("Модель двигателя", "Модель двигателя")
+    model_transmission= ref_filter("Модель трансмиссии", "Модель трансмиссии")
+    model_steer_bridge= ref_filter("Модель управляемого моста", "Модель управляемого моста")
+    model_drive_bridge= ref_filter("Модель ведущего моста", "Модель ведущего моста")
 
     class Meta:
         model = Machine
         fields = ["model_technique","model_engine","model_transmission","model_steer_bridge","model_drive_bridge"]
 
 class MaintenanceFilter(f.FilterSet):
-    kind            = f.ModelChoiceFilter(label="Вид ТО", queryset=ref_qs("Вид ТО"))
-    machine__serial_number = f.CharFilter(label="Зав. № машины", lookup_expr="icontains")
-    service_company = f.ModelChoiceFilter(
-        label="Сервисная компания",
-        queryset=User.objects.filter(groups__name=SERVICE_GROUP).distinct()
-    )
+    kind            = ref_filter("Вид ТО", "Вид ТО")
+    machine__serial_number = SerialContainsFilter(label="Зав. № машины", field_name="machine__serial_number")
+    service_company = f.ChoiceFilter(label="Сервисная компания", choices=service_company_choices)
 
     class Meta:
         model = Maintenance
         fields = ["kind","machine__serial_number","service_company"]
 
+class MaintenanceApiFilter(f.FilterSet):
+    """Фильтры API ТО: имена те же, что давал filterset_fields, icontains — по индексу."""
+    machine__serial_number__icontains = SerialContainsFilter(field_name="machine__serial_number")
+
+    class Meta:
+        model = Maintenance
+        fields = {
+            "kind": ["exact"],
+            "machine__serial_number": ["exact"],
+            "service_company": ["exact"],
+        }
+
 class ComplaintFilter(f.FilterSet):
-    failure_node    = f.ModelChoiceFilter(label="Узел отказа", queryset=ref_qs("Узел отказа"))
-    recovery_method = f.ModelChoiceFilter(label="Способ восстановления", queryset=ref_qs("Способ восстановления"))
-    service_company = f.ModelChoiceFilter(
-        label="Сервисная компания",
-        queryset=User.objects.filter(groups__name=SERVICE_GROUP).distinct()
-    )
+    failure_node    = ref_filter("Узел отказа", "Узел отказа")
+    recovery_method = ref_filter("Способ восстановления", "Способ восстановления")
+    service_company = f.ChoiceFilter(label="Сервисная компания", choices=service_company_choices)
 
     class Meta:
         model = Complaint
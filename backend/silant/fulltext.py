@@ -0,0 +1,226 @@
+import html
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Complaint
+from .stemmer import WORD_RE, stem, stems, words
+
+# ---- полнотекстовый поиск по рекламациям ----
+# Ищется по описанию отказа и использованным запчастям с учётом словоформ:
+#   * SQLite — FTS5-таблица silant_complaint_fts (rowid = id рекламации),
+#     в которую кладутся основы слов от stemmer.stem; таблица обновляется
+#     сигналами post_save/post_delete и импортом после bulk-записи;
+#   * PostgreSQL — выражение to_tsvector('russian', ...) с GIN-индексом,
+#     синхронизировать ничего не нужно;
+#   * иначе — icontains по словам запроса.
+# Каждое слово запроса ищется как префикс основы, слова через пробел — все сразу,
+# «ГН-32.01» (слово со знаками внутри) — фразой.
+# Подсветка делается в Python одинаково для всех СУБД: <mark> вокруг слов,
+# основа которых начинается с основы слова запроса; остальной текст экранирован.
+
+FTS_TABLE = "silant_complaint_fts"
+FIELDS = ("failure_description", "parts_used")
+# веса колонок для bm25 в порядке FIELDS
+FTS_WEIGHTS = (2.0, 1.0)
+MAX_TERMS = 8
+SNIPPET_CHARS = 160
+
+PG_CONFIG = "russian"
+PG_VECTOR = (
+    "to_tsvector('russian'::regconfig, "
+    "COALESCE({table}.failure_description, '') || ' ' || COALESCE({table}.parts_used, ''))"
+)
+
+_fts_ready = {}
+
+
+def backend(using: str = "default") -> str:
+    """'fts5' | 'tsvector' | 'like'."""
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        return "tsvector"
+    if connection.vendor == "sqlite":
+        if using not in _fts_ready:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                _fts_ready[using] = cursor.fetchone() is not None
+        if _fts_ready[using]:
+            return "fts5"
+    return "like"
+
+
+def _terms(text) -> list:
+    """[(слово запроса как есть, его слова)] без повторов, не больше MAX_TERMS."""
+    terms, seen = [], []
+    for term in (text or "").split():
+        parts = words(term)
+        if parts and parts not in seen:
+            seen.append(parts)
+            terms.append((term, parts))
+    return terms[:MAX_TERMS]
+
+
+def parse(text) -> list:
+    """Запрос -> список фраз; фраза — список слов ('ГН-32' -> ['ГН', '32'])."""
+    return [parts for _, parts in _terms(text)]
+
+
+# ---- синхронизация индекса (SQLite) ----
+
+def _document(obj) -> list:
+    return [" ".join(stems(getattr(obj, field) or "")) for field in FIELDS]
+
+
+def index_complaints(objs, using: str = "default"):
+    """Переиндексирует рекламации (объекты с pk). На PostgreSQL ничего не делает."""
+    objs = [o for o in objs if o.pk is not None]
+    if not objs or backend(using) != "fts5":
+        return
+    cols = ", ".join(FIELDS)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(o.pk,) for o in objs])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (%s, %s, %s)",
+            [(o.pk, *_document(o)) for o in objs],
+        )
+
+
+def unindex_complaints(ids, using: str = "default"):
+    ids = list(ids)
+    if not ids or backend(using) != "fts5":
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+
+
+def rebuild(using: str = "default", chunk_size: int = 2000) -> int:
+    """Заново строит FTS-таблицу по всем рекламациям; возвращает их число."""
+    if backend(using) != "fts5":
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    total, chunk = 0, []
+    for obj in Complaint.objects.using(using).only("id", *FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            index_complaints(chunk, using)
+            total, chunk = total + len(chunk), []
+    index_complaints(chunk, using)
+    return total + len(chunk)
+
+
+def ensure_index(using="default", **kwargs):
+    """post_migrate: наполняет FTS-таблицу, если она отстаёт от рекламаций."""
+    _fts_ready.clear()
+    if backend(using) != "fts5":
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        indexed = cursor.fetchone()[0]
+    if indexed != Complaint.objects.using(using).count():
+        rebuild(using)
+
+
+# ---- запрос ----
+
+def _fts_query(phrases) -> str:
+    parts = []
+    for phrase in phrases:
+        tokens = [stem(w) for w in phrase]
+        if len(tokens) == 1:
+            parts.append('"%s"*' % tokens[0])
+        else:
+            parts.append('"%s"' % " ".join(tokens))
+    return " AND ".join(parts)
+
+
+def _tsquery(text):
+    """
+    SQL tsquery и его параметры. Слова — префиксы основ; слово со знаками
+    разбирает phraseto_tsquery: парсер PostgreSQL видит в «НШ-32» не «нш 32»,
+    а «нш» и число «-32», и запрос должен разбираться так же, как документ.
+    """
+    terms = _terms(text)
+    single = ["'%s':*" % parts[0].lower() for _, parts in terms if len(parts) == 1]
+    sql, params = [], []
+    if single:
+        sql.append(f"to_tsquery('{PG_CONFIG}', %s)")
+        params.append(" & ".join(single))
+    for term, parts in terms:
+        if len(parts) > 1:
+            sql.append(f"phraseto_tsquery('{PG_CONFIG}', %s)")
+            params.append(term)
+    return " && ".join(sql), params
+
+
+def search(queryset, text):
+    """
+    Рекламации queryset, подходящие под запрос, с аннотацией search_score
+    (больше — лучше), упорядоченные по ней, затем по дате отказа.
+    """
+    phrases = parse(text)
+    if not phrases:
+        return queryset.none()
+    kind = backend(queryset.db)
+    table = '"%s"' % Complaint._meta.db_table
+    if kind == "fts5":
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        # соединение с FTS-таблицей, а не подзапрос на строку: bm25 считается за один проход
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {table}.\"id\"", f"{FTS_TABLE} MATCH %s"],
+            params=[_fts_query(phrases)],
+            select={"search_score": f"-bm25({FTS_TABLE}, {weights})"},
+        )
+    elif kind == "tsvector":
+        vector = PG_VECTOR.format(table=table)
+        query, params = _tsquery(text)
+        queryset = queryset.filter(RawSQL(
+            f"{vector} @@ ({query})", params, output_field=BooleanField()
+        )).annotate(search_score=RawSQL(
+            f"ts_rank({vector}, {query})", params, output_field=FloatField()
+        ))
+    else:
+        for phrase in phrases:
+            needle = " ".join(phrase)
+            queryset = queryset.filter(
+                Q(failure_description__icontains=needle) | Q(parts_used__icontains=needle)
+            )
+        queryset = queryset.annotate(search_score=Value(0.0, output_field=FloatField()))
+    return queryset.order_by("-search_score", "-failure_date", "-id")
+
+
+# ---- подсветка ----
+
+def highlight(text, phrases, limit: int = SNIPPET_CHARS) -> str:
+    """
+    Фрагмент text (не длиннее limit символов плюс «…») с найденными словами
+    в <mark></mark>; пустая строка, если совпадений нет. Результат — HTML.
+    """
+    text = text or ""
+    wanted = {stem(w) for phrase in phrases for w in phrase}
+    spans = [
+        m.span() for m in WORD_RE.finditer(text)
+        if any(stem(m.group()).startswith(s) for s in wanted)
+    ]
+    if not spans:
+        return ""
+    start, end = 0, len(text)
+    if end > limit:
+        start = max(0, spans[0][0] - limit // 4)
+        end = min(len(text), start + limit)
+    out, pos = [], start
+    for a, b in spans:
+        if a < start or b > end:
+            continue
+        out.append(html.escape(text[pos:a]))
+        out.append("<mark>%s</mark>" % html.escape(text[a:b]))
+        pos = b
+    out.append(html.escape(text[pos:end]))
+    return ("…" if start else "") + "".join(out) + ("…" if end < len(text) else "")
+
+
+def highlights(obj, phrases) -> dict:
+    return {field: highlight(getattr(obj, field), phrases) for field in FIELDS}
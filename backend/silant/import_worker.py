@@ -0,0 +1,14 @@
+"""
+Инициализация процессов пула для parsing_excel --workers.
+
+Модуль намеренно не импортирует модели: при запуске через spawn (Windows/macOS)
+процесс получает initializer до django.setup(), а модели до него грузить нельзя.
+"""
+import os
+
+
+def init_worker(settings_module: str):
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
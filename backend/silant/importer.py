@@ -0,0 +1,1195 @@
+"""
+Движок импорта выгрузок (машины, ТО, рекламации).
+
+Лист сначала приводится к «каноническому» DataFrame (нормализованные строки,
+даты уже разобраны) без обращений к БД, затем пишется пачками:
+справочники, пользователи и машины заранее загружаются в словари,
+а запись идёт через bulk_create / bulk_update.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, date
+from functools import lru_cache
+from itertools import chain, count, islice
+from pathlib import Path
+from typing import Iterator, Optional
+import csv
+import json
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.db import DatabaseError, models, transaction
+from slugify import slugify
+
+from . import analytics, fulltext, machine_stats, maintenance_due, refcache, scope, versions
+from .directory import forget_service_companies
+from .models import Reference, Machine, Maintenance, Complaint, ImportLedger
+from .roles import CLIENT_GROUP, SERVICE_GROUP
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CHUNK_SIZE = 5000
+# простой от DAYS_LIMIT не влезет ни в одну целую колонку БД — такой считаем по датам
+DAYS_LIMIT = 2 ** 63
+# наработка пишется в PositiveIntegerField: больше — не влезет в колонку
+HOURS_LIMIT = 2 ** 31 - 1
+DATE_CACHE_SIZE = 65536
+CSV_SUFFIXES = (".csv", ".tsv", ".txt")
+
+
+def _normalize_company_name(name: str) -> str:
+    """Унифицируем отображаемое имя: убираем кавычки, лишние пробелы, типографику."""
+    s = (name or "").strip()
+    # привести разные кавычки к обычным и убрать их
+    s = s.replace("«", '"').replace("»", '"').replace("“", '"').replace("”", '"')
+    s = s.replace("'", '"')
+    s = re.sub(r'"+', "", s)
+    # схлопнуть пробелы
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+def norm_val(s):
+    if pd.isna(s):
+        return ""
+    return str(s).strip()
+
+def parse_days(value, fail_dt=None, rec_dt=None) -> Optional[int]:
+    """
+    Парсит 'время простоя, дни' из произвольной строки/числа.
+    Если число не найдено — пытается вычислить по разнице дат.
+    """
+    s = norm_val(value)
+    if s:
+        m = re.search(r'([-+]?\d+(?:[.,]\d+)?)', s)
+        if m:
+            try:
+                val = float(m.group(1).replace(",", "."))
+                d = int(round(val))
+                if 0 <= d < DAYS_LIMIT:
+                    return d
+            except Exception:
+                pass
+
+    # считаем по датам
+    if fail_dt and rec_dt:
+        try:
+            diff = (rec_dt - fail_dt).days
+            if diff >= 0 and diff < 10000:
+                return diff
+        except Exception:
+            pass
+
+    return None
+
+
+def parse_date(v):
+    """Понимает dd.mm.yyyy, yyyy-mm-dd, dd/mm/yyyy, dd.mm.yy, ISO и excel-serial."""
+    if v is None or (isinstance(v, float) and pd.isna(v)) or (isinstance(v, str) and not v.strip()):
+        return None
+    if hasattr(v, "to_pydatetime"):
+        v = v.to_pydatetime()
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+
+    s = str(v).strip()
+    s_first = s.split(" ")[0] if " " in s else s
+
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%y"):
+        try:
+            return datetime.strptime(s_first, fmt).date()
+        except Exception:
+            pass
+
+    try:
+        return datetime.fromisoformat(s).date()
+    except Exception:
+        pass
+
+    try:
+        num = float(s.replace(",", "."))
+        if 20000 <= num <= 80000:
+            base = datetime(1899, 12, 30)
+            return (base + timedelta(days=num)).date()
+    except Exception:
+        pass
+
+    return None
+
+
+# ---------------- векторный разбор колонок ----------------
+
+# те же форматы и в том же порядке, что в parse_date; группы — (год, месяц, день).
+# Шаблоны повторяют ширину полей strptime (%Y — ровно 4 цифры, %y — 2),
+# поэтому строка подходит максимум под один формат.
+DATE_FORMATS = {
+    "%d.%m.%Y": (r"^([0-9]{1,2})\.([0-9]{1,2})\.([0-9]{4})$", (3, 2, 1)),
+    "%Y-%m-%d": (r"^([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})$", (1, 2, 3)),
+    "%d/%m/%Y": (r"^([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})$", (3, 2, 1)),
+    "%d.%m.%y": (r"^([0-9]{1,2})\.([0-9]{1,2})\.([0-9]{2})$", (3, 2, 1)),
+}
+DATE_SAMPLE_SIZE = 200
+DAYS_RE = r"([-+]?\d+(?:[.,]\d+)?)"
+
+
+def _nones(index) -> pd.Series:
+    return pd.Series([None] * len(index), index=index, dtype=object)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date_text(s: str):
+    return parse_date(s)
+
+
+def parse_date_cached(v):
+    """parse_date с LRU-памятью для строк: в выгрузке одни и те же даты повторяются тысячи раз."""
+    return _parse_date_text(v) if isinstance(v, str) else parse_date(v)
+
+
+def _dominant_date_format(first: pd.Series) -> Optional[str]:
+    sample = first.head(DATE_SAMPLE_SIZE)
+    hits = {fmt: int(sample.str.match(rx).sum()) for fmt, (rx, _) in DATE_FORMATS.items()}
+    fmt = max(hits, key=hits.get)
+    return fmt if hits[fmt] else None
+
+
+def _parse_date_values(values: pd.Series) -> pd.Series:
+    result = _nones(values.index)
+    is_text = values.map(lambda v: isinstance(v, str)).astype(bool)
+    text = values[is_text].astype(str).str.strip()
+    first = text.str.split(" ", n=1).str[0]
+
+    fmt = _dominant_date_format(first[first != ""]) if len(first.index) else None
+    done = pd.Series(False, index=values.index)
+    if fmt is not None:
+        rx, (yi, mi, di) = DATE_FORMATS[fmt]
+        parts = first.str.extract(rx).dropna()
+        if len(parts.index):
+            year = parts[yi - 1].astype(int)
+            if fmt == "%d.%m.%y":
+                year = year + np.where(year < 69, 2000, 1900)  # как strptime для %y
+            parsed = pd.to_datetime(
+                pd.DataFrame({"year": year, "month": parts[mi - 1].astype(int), "day": parts[di - 1].astype(int)}),
+                errors="coerce",
+            ).dropna()
+            result[parsed.index] = parsed.dt.date.astype(object)
+            done[parsed.index] = True
+
+    # пустые строки — None, остальное — построчно с памятью
+    rest = ~done & ~(is_text & (values.astype(str).str.strip() == ""))
+    result[rest] = [parse_date_cached(v) for v in values[rest]]
+    return result
+
+
+def parse_date_column(values: pd.Series) -> pd.Series:
+    """
+    Векторный parse_date для целой колонки. Разбираются только уникальные значения;
+    формат определяется один раз по выборке (самый частый из DATE_FORMATS) и
+    переводится в даты средствами pandas, а всё, что под него не подошло
+    (excel-serial, ISO со временем, мусор), идёт через parse_date_cached.
+    Результат совпадает с построчным parse_date.
+    """
+    codes, uniques = pd.factorize(values.astype(object), use_na_sentinel=True)
+    parsed = _parse_date_values(pd.Series(uniques, dtype=object)).to_numpy()
+    out = np.full(len(codes), None, dtype=object)
+    known = codes >= 0
+    out[known] = parsed[codes[known]]
+    return pd.Series(out, index=values.index, dtype=object)
+
+
+def parse_days_column(values: pd.Series, fail_dt: pd.Series, rec_dt: pd.Series) -> pd.Series:
+    """Векторный parse_days: число из текста регуляркой по колонке, иначе разница дат."""
+    text = values.where(values.notna(), "").astype(str).str.strip()
+    num = text.str.extract(DAYS_RE)[0].str.replace(",", ".").astype(float).round()
+    # inf и числа вне int64 — как в parse_days: простой по датам
+    ok = num.notna() & (num >= 0) & (num < DAYS_LIMIT)
+    result = _nones(values.index)
+    result[ok] = [int(v) for v in num[ok]]
+    rest = ~ok
+    result[rest] = [parse_days(None, fail_dt=f, rec_dt=r) for f, r in zip(fail_dt[rest], rec_dt[rest])]
+    return result
+
+
+def parse_hours(v) -> Optional[int]:
+    """Наработка, м/час: пустая ячейка — 0, иначе int(float(...)); мусор, минус или больше HOURS_LIMIT — None."""
+    s = norm_val(v)
+    if not s:
+        return 0
+    try:
+        hours = int(float(s.replace(",", ".")))
+    except (ValueError, OverflowError):
+        return None
+    return hours if 0 <= hours <= HOURS_LIMIT else None
+
+
+def norm_col(s: str) -> str:
+    s = str(s).lower()
+    s = s.replace("№", "номер")
+    s = re.sub(r"[\(\)\.,/\\\-]+", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def find_col(df: pd.DataFrame, *candidates) -> Optional[str]:
+    cols = {norm_col(c): c for c in df.columns}
+    cand_norm = [norm_col(c) for c in candidates]
+    for cn in cand_norm:
+        if cn in cols:
+            return cols[cn]
+    for cn in cand_norm:
+        keys = cn.split()
+        for norm_name, original in cols.items():
+            if all(k in norm_name for k in keys):
+                return original
+    return None
+
+
+def get_or_create_user(name, group_name: str) -> User | None:
+    """
+    Ищем пользователя по 'человеческому' имени внутри группы.
+    Если нет — создаём с username на базе slug от нормализованного имени.
+    Разовый вариант UserResolver; при импорте используется сам резолвер.
+    """
+    name = (name or "").strip()
+    if not name:
+        return None
+    pk = UserResolver().resolve(group_name, pd.Series([name], dtype=object)).iloc[0]
+    return User.objects.get(pk=pk)
+
+
+# ---------------- чтение листов ----------------
+
+HEADER_ANCHORS = ("модель техники", "зав", "машин", "вид то", "дата отказа", "дата проведения то")
+HEADER_SCAN_ROWS = 10
+
+
+def _detect_header(rows) -> int:
+    """Номер строки заголовка (0-based) по «якорям» в первых строках."""
+    for i, row in enumerate(rows[:HEADER_SCAN_ROWS]):
+        row_text = " ".join(str(x).lower() for x in row if x is not None and not pd.isna(x))
+        if any(a in row_text for a in HEADER_ANCHORS):
+            return i
+    return 0
+
+
+def read_sheet(path: str, sheet: str, header_hint: Optional[int], encoding: str = "utf-8-sig") -> pd.DataFrame:
+    """
+    Читает лист Excel. Если header_hint задан (1-based) — используем его,
+    иначе пытаемся autodetect по «якорям» в первых 10 строках.
+    """
+    if Path(path).suffix.lower() in CSV_SUFFIXES:
+        frames = list(iter_sheet_chunks(path, sheet, header_hint, encoding=encoding))
+        return pd.concat(frames) if frames else pd.DataFrame()
+
+    if header_hint:
+        hdr = int(header_hint) - 1
+    else:
+        raw = pd.read_excel(path, sheet_name=sheet, header=None, dtype=str, engine="openpyxl",
+                            nrows=HEADER_SCAN_ROWS)
+        hdr = _detect_header(raw.values.tolist())
+    df = pd.read_excel(path, sheet_name=sheet, header=hdr, dtype=str, engine="openpyxl")
+    # индекс — номер строки в файле (1-based), чтобы ссылаться на неё в отчёте об ошибках
+    df.index = pd.RangeIndex(hdr + 2, hdr + 2 + len(df.index))
+    return df
+
+
+def _cell(v):
+    """Значение ячейки как строка — так же, как pd.read_excel(dtype=str)."""
+    if v is None or v == "":
+        return None
+    return v if isinstance(v, str) else str(v)
+
+
+def _iter_xlsx_rows(path: str, sheet: str) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        for row in wb[sheet].iter_rows(values_only=True):
+            yield tuple(_cell(v) for v in row)
+    finally:
+        wb.close()
+
+
+def _iter_csv_rows(path: str, sheet: str, encoding: str) -> Iterator[tuple]:
+    """
+    CSV/TSV — это один лист; его имя — имя файла без расширения
+    (например, «машины.csv» для --machines «машины»).
+    """
+    p = Path(path)
+    if p.stem.lower() != sheet.lower():
+        raise ValueError(f"Файл {p.name} не содержит лист '{sheet}'")
+    with open(p, newline="", encoding=encoding) as fh:
+        if p.suffix.lower() == ".tsv":
+            delimiter = "\t"
+        else:
+            try:
+                delimiter = csv.Sniffer().sniff(fh.read(64 * 1024), delimiters=",;\t").delimiter
+            except csv.Error:
+                delimiter = ","
+            fh.seek(0)
+        for row in csv.reader(fh, delimiter=delimiter):
+            yield tuple(_cell(v.strip()) for v in row)
+
+
+def _header_names(row: tuple) -> list:
+    """Имена колонок как у pandas: пустые — «Unnamed: i», повторы — «имя.1»."""
+    names, seen = [], {}
+    for i, v in enumerate(row):
+        name = v if v is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_sheet_chunks(path: str, sheet: str, header_hint: Optional[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = "utf-8-sig") -> Iterator[pd.DataFrame]:
+    """
+    Потоковое чтение листа: строки читаются лениво (openpyxl read_only или csv),
+    заголовок ищется в первых 10 строках, наружу отдаются DataFrame по chunk_size строк.
+    Память не зависит от размера файла.
+    """
+    if Path(path).suffix.lower() in CSV_SUFFIXES:
+        rows = _iter_csv_rows(path, sheet, encoding)
+    else:
+        rows = _iter_xlsx_rows(path, sheet)
+
+    head = list(islice(rows, max(HEADER_SCAN_ROWS, int(header_hint or 0))))
+    hdr = int(header_hint) - 1 if header_hint else _detect_header(head)
+    if hdr >= len(head):
+        return
+    columns = _header_names(head[hdr])
+    width = len(columns)
+
+    next_row = hdr + 2  # номер первой строки данных в файле (1-based)
+
+    def frame(chunk):
+        nonlocal next_row
+        chunk = [(r + (None,) * width)[:width] for r in chunk]
+        df = pd.DataFrame.from_records(chunk, columns=columns)
+        df.index = pd.RangeIndex(next_row, next_row + len(chunk))
+        next_row += len(chunk)
+        return df
+
+    pending = []
+    for row in chain(head[hdr + 1:], rows):
+        pending.append(row)
+        if len(pending) >= chunk_size:
+            yield frame(pending)
+            pending = []
+    if pending:
+        yield frame(pending)
+
+
+# ---------------- нормализация листов (без БД) ----------------
+
+# канонические колонки -> варианты заголовков в выгрузке
+MACHINE_COLUMNS = {
+    "serial_number":        ("зав. номер машины",),
+    "model_technique":      ("модель техники",),
+    "model_engine":         ("модель двигателя",),
+    "serial_engine":        ("зав. номер двигателя",),
+    "model_transmission":   ("модель трансмиссии производитель артикул", "модель трансмиссии"),
+    "serial_transmission":  ("зав. номер трансмиссии",),
+    "model_drive_bridge":   ("модель ведущего моста",),
+    "serial_drive_bridge":  ("зав. номер ведущего моста",),
+    "model_steer_bridge":   ("модель управляемого моста",),
+    "serial_steer_bridge":  ("зав. номер управляемого моста",),
+    "shipment_date":        ("дата отгрузки с завода",),
+    "client":               ("покупатель", "клиент"),
+    "consignee":            ("грузополучатель конечный потребитель",),
+    "delivery_address":     ("адрес поставки эксплуатации",),
+    "equipment":            ("комплектация доп опции", "комплектация"),
+    "contract_number":      ("договор поставки номер дата", "договор"),
+    "service_company":      ("сервисная компания",),
+}
+
+MAINTENANCE_COLUMNS = {
+    "serial_number":      ("зав. номер машины",),
+    "kind":               ("вид то",),
+    "performed_date":     ("дата проведения то",),
+    "operating_hours":    ("наработка м час", "наработка"),
+    "work_order_number":  ("номер заказ-наряда",),
+    "work_order_date":    ("дата заказ-наряда",),
+    "organization":       ("организация проводившая то",),
+}
+
+COMPLAINT_COLUMNS = {
+    "serial_number":        ("зав. номер",),
+    "failure_date":         ("дата отказа",),
+    "operating_hours":      ("наработка",),
+    "failure_node":         ("узел отказа",),
+    "failure_description":  ("описание отказа",),
+    "recovery_method":      ("способ",),
+    "parts_used":           ("используемые",),
+    "recovery_date":        ("дата",),
+    "downtime":             ("время",),   # колонка называется именно «Время»
+}
+
+# справочники, которыми ссылаются колонки листа
+MACHINE_REFS = {
+    "model_technique":    "Модель техники",
+    "model_engine":       "Модель двигателя",
+    "model_transmission": "Модель трансмиссии",
+    "model_drive_bridge": "Модель ведущего моста",
+    "model_steer_bridge": "Модель управляемого моста",
+}
+MAINTENANCE_REFS = {"kind": "Вид ТО", "organization": "Организация ТО"}
+COMPLAINT_REFS = {"failure_node": "Узел отказа", "recovery_method": "Способ восстановления"}
+
+
+def map_columns(df: pd.DataFrame, spec: dict) -> dict:
+    """Канонические имена -> реальные заголовки листа (None, если колонки нет)."""
+    return {key: find_col(df, *cands) for key, cands in spec.items()}
+
+
+def _text(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    """Векторный norm_val по колонке; отсутствующая колонка — пустые строки."""
+    if col is None:
+        return pd.Series("", index=df.index, dtype=object)
+    s = df[col]
+    return s.where(s.notna(), "").astype(str).str.strip().astype(object)
+
+
+def _dates(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    if col is None:
+        return _nones(df.index)
+    return parse_date_column(df[col])
+
+
+def normalize_machines(df: pd.DataFrame) -> pd.DataFrame:
+    cols = map_columns(df, MACHINE_COLUMNS)
+    out = pd.DataFrame({"_row": df.index}, index=df.index)
+    for key in MACHINE_COLUMNS:
+        out[key] = _text(df, cols[key])
+    out["shipment_date"] = _dates(df, cols["shipment_date"])
+    # нет колонки сервисной компании — подставится сервис по умолчанию
+    if cols["service_company"] is None:
+        out["service_company"] = None
+    return out
+
+
+def normalize_maintenance(df: pd.DataFrame) -> pd.DataFrame:
+    cols = map_columns(df, MAINTENANCE_COLUMNS)
+    out = pd.DataFrame({"_row": df.index}, index=df.index)
+    for key in MAINTENANCE_COLUMNS:
+        out[key] = _text(df, cols[key])
+    out["performed_date"] = _dates(df, cols["performed_date"])
+    out["work_order_date"] = _dates(df, cols["work_order_date"])
+    out["operating_hours"] = _lookup(out["operating_hours"], parse_hours)
+    return out
+
+
+def normalize_complaints(df: pd.DataFrame) -> pd.DataFrame:
+    cols = map_columns(df, COMPLAINT_COLUMNS)
+    out = pd.DataFrame({"_row": df.index}, index=df.index)
+    for key in COMPLAINT_COLUMNS:
+        out[key] = _text(df, cols[key])
+    out["failure_date"] = _dates(df, cols["failure_date"])
+    out["recovery_date"] = _dates(df, cols["recovery_date"])
+    out["operating_hours"] = _lookup(out["operating_hours"], parse_hours)
+    if cols["downtime"] is None:
+        out["downtime"] = None
+    else:
+        out["downtime"] = parse_days_column(out["downtime"], out["failure_date"], out["recovery_date"])
+    return out
+
+
+# ---------------- конвейер: разбор файлов в пуле процессов ----------------
+
+# порядок важен: дочерние таблицы ссылаются на машины
+SHEET_KINDS = ("machines", "maintenance", "complaints")
+NORMALIZERS = {
+    "machines": normalize_machines,
+    "maintenance": normalize_maintenance,
+    "complaints": normalize_complaints,
+}
+SOURCE_SUFFIXES = (".xlsx", ".xlsm") + CSV_SUFFIXES
+
+
+def expand_paths(paths) -> list[str]:
+    """Файлы и каталоги -> отсортированный список выгрузок (.xlsx/.csv/.tsv)."""
+    out = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            out.extend(sorted(
+                str(f) for f in p.iterdir()
+                if f.suffix.lower() in SOURCE_SUFFIXES and not f.name.startswith("~$")
+            ))
+        else:
+            out.append(str(p))
+    return out
+
+
+def sheet_tasks(path: str, sheets: dict, header_hints: dict) -> list[tuple]:
+    """
+    Задачи разбора для одного файла: (path, kind, sheet, header_hint).
+    CSV/TSV содержит один лист — берём только тот вид, чьё имя совпало с именем файла.
+    """
+    kinds = SHEET_KINDS
+    if Path(path).suffix.lower() in CSV_SUFFIXES:
+        stem = Path(path).stem.lower()
+        kinds = [k for k in SHEET_KINDS if sheets[k].lower() == stem]
+    return [(path, k, sheets[k], header_hints.get(k)) for k in kinds]
+
+
+def parse_sheet_task(path: str, kind: str, sheet: str, header_hint: Optional[int], encoding: str = "utf-8-sig"):
+    """
+    Читает и нормализует лист; БД не трогает, поэтому безопасно в пуле процессов.
+    Возвращает (path, kind, frame | None, error | None, секунды).
+    """
+    started = time.perf_counter()
+    try:
+        frame = NORMALIZERS[kind](read_sheet(path, sheet, header_hint, encoding))
+    except Exception as e:
+        return path, kind, None, str(e), time.perf_counter() - started
+    return path, kind, frame, None, time.perf_counter() - started
+
+
+# ---------------- словари ключей (БД) ----------------
+
+class ReferenceMap:
+    """
+    (entity, name) -> id справочника. Недостающие значения создаются пачкой,
+    при dry_run — получают временные отрицательные id без записи в БД.
+    """
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self._planned = count(-1, -1)
+        self._ids = {key: ref.pk for key, ref in refcache.snapshot().by_key.items()}
+
+    def resolve(self, entity: str, names: pd.Series) -> pd.Series:
+        missing = {n for n in names.unique() if n and (entity, n) not in self._ids}
+        if missing and self.dry_run:
+            self._ids.update({(entity, n): next(self._planned) for n in missing})
+        elif missing:
+            Reference.objects.bulk_create(
+                [Reference(entity=entity, name=n) for n in missing], ignore_conflicts=True,
+            )
+            for pk, n in Reference.objects.filter(entity=entity, name__in=missing).values_list("id", "name"):
+                self._ids[(entity, n)] = pk
+            refcache.invalidate()  # bulk_create не шлёт post_save
+            versions.bump(versions.REFERENCES)
+        return _lookup(names, lambda n: self._ids.get((entity, n)))
+
+
+DEFAULT_PASSWORD = "changeme123"
+
+
+class UserResolver:
+    """
+    Имя компании -> id пользователя внутри группы (client/service).
+
+    Индекс «имя -> пользователь» и множество занятых username строятся один раз
+    на импорт, поэтому поиск — O(1) на строку, а не перебор всех пользователей группы.
+    Недостающие пользователи и их членство в группе создаются пачкой
+    (при dry_run — только получают временные отрицательные id).
+    """
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self._planned = count(-1, -1)
+        self._ids = {}      # (group, имя из выгрузки) -> id
+        self._index = {}    # group -> (first_name.lower() -> id, нормализованное имя -> id)
+        self._taken = None  # все занятые username
+        self._password = None
+
+    def _group_index(self, group_name: str):
+        if group_name not in self._index:
+            exact, norm = {}, {}
+            users = User.objects.filter(groups__name=group_name).order_by("id").values_list("id", "first_name")
+            for pk, first_name in users:
+                exact.setdefault(first_name.lower(), pk)
+                norm.setdefault(_normalize_company_name(first_name), pk)
+            self._index[group_name] = (exact, norm)
+        return self._index[group_name]
+
+    def _free_username(self, display_name: str, group_name: str) -> str:
+        if self._taken is None:
+            self._taken = set(User.objects.values_list("username", flat=True))
+        base = slugify(display_name, separator="-")[:120] or group_name
+        base = base.strip("._-") or group_name
+        username, i = base, 2
+        while username in self._taken:
+            username = f"{base}-{i}"
+            i += 1
+        self._taken.add(username)
+        return username
+
+    def _create(self, group_name: str, display_names) -> dict:
+        """Создаёт пользователей пачкой; возвращает {отображаемое имя: id}."""
+        if self.dry_run:
+            created = {name: next(self._planned) for name in display_names}
+        else:
+            created = self._insert(group_name, display_names)
+        exact, norm = self._group_index(group_name)
+        for name, pk in created.items():
+            exact.setdefault(name.lower(), pk)
+            norm.setdefault(name, pk)
+        return created
+
+    def _insert(self, group_name: str, display_names) -> dict:
+        if self._password is None:
+            # один хэш на всех: make_password на каждого — секунды PBKDF2 на пользователя
+            self._password = make_password(DEFAULT_PASSWORD)
+        group, _ = Group.objects.get_or_create(name=group_name)
+        created, pending = {}, list(display_names)
+        while pending:
+            wanted = {self._free_username(name, group_name): name for name in pending}
+            User.objects.bulk_create(
+                [User(username=u, first_name=n, password=self._password, is_active=True) for u, n in wanted.items()],
+                ignore_conflicts=True,
+            )
+            pending = []
+            for pk, username, first_name in (
+                User.objects.filter(username__in=list(wanted)).values_list("id", "username", "first_name")
+            ):
+                if first_name == wanted[username]:
+                    created[first_name] = pk
+                else:
+                    # username успел занять параллельный импорт — берём следующий слаг
+                    pending.append(wanted[username])
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=pk, group_id=group.pk) for pk in created.values()],
+            ignore_conflicts=True,
+        )
+        forget_service_companies()  # bulk-запросы не шлют сигналов
+        versions.bump(versions.USERS)
+        return created
+
+    def resolve(self, group_name: str, names: pd.Series) -> pd.Series:
+        exact, norm = self._group_index(group_name)
+        missing = {}
+        for n in names.unique():
+            if not n or pd.isna(n) or (group_name, n) in self._ids:
+                continue
+            display_name = _normalize_company_name(n)
+            pk = exact.get(display_name.lower()) or norm.get(display_name)
+            if pk:
+                self._ids[(group_name, n)] = pk
+            else:
+                missing.setdefault(display_name, []).append(n)
+        if missing:
+            created = self._create(group_name, missing)
+            for display_name, raw_names in missing.items():
+                for n in raw_names:
+                    self._ids[(group_name, n)] = created[display_name]
+        return _lookup(names, lambda n: self._ids.get((group_name, n)))
+
+
+class MachineIndex:
+    """serial_number -> (id, service_company_id) для всех машин в БД."""
+
+    def __init__(self):
+        self.reload()
+
+    def reload(self, serials=None):
+        qs = Machine.objects.all()
+        if serials is None:
+            self._rows = {}
+        else:
+            serials = list(serials)
+            for sn in serials:  # после отката пачки машины могло не остаться
+                self._rows.pop(sn, None)
+            qs = qs.filter(serial_number__in=serials)
+        for sn, pk, svc in qs.values_list("serial_number", "id", "service_company_id"):
+            self._rows[sn] = (pk, svc)
+
+    def __contains__(self, serial):
+        return serial in self._rows
+
+    def get(self, serial):
+        return self._rows.get(serial)
+
+    def put(self, serial, pk, service_company_id):
+        self._rows[serial] = (pk, service_company_id)
+
+
+def _lookup(series: pd.Series, fn) -> pd.Series:
+    """Series.map без приведения к float: None остаётся None, id — int."""
+    return pd.Series([fn(v) for v in series], index=series.index, dtype=object)
+
+
+def _batches(df: pd.DataFrame, size: int):
+    for start in range(0, len(df.index), size):
+        yield df.iloc[start:start + size]
+
+
+def _none(v):
+    """NaN/NaT из pandas -> None для ORM."""
+    return None if v is None or (not isinstance(v, str) and pd.isna(v)) else v
+
+
+# ---------------- запись ----------------
+
+MACHINE_UPDATE_FIELDS = [
+    "model_technique", "model_engine", "model_transmission", "model_drive_bridge", "model_steer_bridge",
+    "serial_engine", "serial_transmission", "serial_drive_bridge", "serial_steer_bridge",
+    "shipment_date", "consignee", "delivery_address", "equipment", "contract_number",
+    "client", "service_company",
+]
+MAINTENANCE_UPDATE_FIELDS = ["operating_hours", "work_order_number", "work_order_date", "organization"]
+COMPLAINT_UPDATE_FIELDS = [
+    "operating_hours", "failure_description", "recovery_method", "parts_used", "recovery_date", "downtime_days",
+]
+
+# естественные ключи строк листа (до разрешения справочников)
+NATURAL_KEYS = {
+    "machines": ("serial_number",),
+    "maintenance": ("serial_number", "kind", "performed_date"),
+    "complaints": ("serial_number", "failure_date", "failure_node"),
+}
+
+
+def row_fingerprints(kind: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ключ и хэш содержимого для каждой строки нормализованного листа (векторно).
+    Хэш считается по всем каноническим колонкам (служебные «_…» не в счёт),
+    поэтому меняется при любой правке строки.
+    """
+    if frame.empty:
+        return pd.DataFrame({"key": [], "digest": []}, index=frame.index, dtype=object)
+    as_text = frame[[c for c in frame.columns if not c.startswith("_")]].astype(str)
+    keys = as_text[list(NATURAL_KEYS[kind])].agg("|".join, axis=1)
+    digests = pd.util.hash_pandas_object(as_text, index=False)
+    return pd.DataFrame({"key": keys, "digest": digests.map("{:016x}".format)}, index=frame.index)
+
+
+# ---------------- проверка строк ----------------
+
+MODELS = {"machines": Machine, "maintenance": Maintenance, "complaints": Complaint}
+VERSION_TABLES = {"machines": versions.MACHINES, "maintenance": versions.MAINTENANCE, "complaints": versions.COMPLAINTS}
+SHEET_REFS = {"machines": MACHINE_REFS, "maintenance": MAINTENANCE_REFS, "complaints": COMPLAINT_REFS}
+REQUIRED = {
+    "machines": {
+        "shipment_date": "не указана дата отгрузки",
+        "model_technique": "не указана модель техники",
+        "model_engine": "не указана модель двигателя",
+        "model_transmission": "не указана модель трансмиссии",
+        "model_drive_bridge": "не указана модель ведущего моста",
+        "model_steer_bridge": "не указана модель управляемого моста",
+        "client": "не указан покупатель",
+    },
+    "maintenance": {
+        "kind": "не указан вид ТО",
+        "performed_date": "не указана дата проведения ТО",
+        "organization": "не указана организация, проводившая ТО",
+        "operating_hours": "некорректная наработка",
+        "service_company": "не определена сервисная компания",
+    },
+    "complaints": {
+        "failure_date": "не указана дата отказа",
+        "failure_node": "не указан узел отказа",
+        "recovery_method": "не указан способ восстановления",
+        "operating_hours": "некорректная наработка",
+        "service_company": "не определена сервисная компания",
+    },
+}
+
+
+def _max_lengths(kind: str) -> dict:
+    """Колонка -> max_length: CharField модели и названия справочников."""
+    out = {}
+    for f in MODELS[kind]._meta.get_fields():
+        if isinstance(f, models.CharField):
+            out[f.name] = f.max_length
+    ref_len = Reference._meta.get_field("name").max_length
+    out.update({key: ref_len for key in SHEET_REFS[kind]})
+    return out
+
+
+def validate_rows(kind: str, frame: pd.DataFrame) -> pd.Series:
+    """
+    Причина отказа для каждой строки ('' — строка в порядке).
+    Ловит то, на чём иначе упал бы bulk-запрос: пустые обязательные поля,
+    мусор в наработке, слишком длинные значения.
+    """
+    reasons = pd.Series("", index=frame.index, dtype=object)
+
+    def flag(mask, reason):
+        reasons[mask & (reasons == "")] = reason
+
+    for col, reason in REQUIRED[kind].items():
+        values = frame[col]
+        flag(values.isna() | (values.astype(str) == ""), reason)
+    for col, limit in _max_lengths(kind).items():
+        if col in frame.columns:
+            flag(frame[col].astype(str).str.len() > limit, f"«{col}» длиннее {limit} символов")
+    return reasons
+
+
+REJECT_FIELDS = ("file", "sheet", "row", "serial_number", "reason")
+
+
+class RejectFile:
+    """
+    Файл отклонённых строк: .jsonl — по JSON-объекту на строку, иначе CSV.
+    Экземпляр вызывается как reject(record) и используется как контекстный менеджер.
+    """
+
+    def __init__(self, path: str, encoding: str = "utf-8-sig"):
+        self.path = path
+        self.jsonl = Path(path).suffix.lower() in (".jsonl", ".ndjson")
+        self.count = 0
+        self._fh = open(path, "w", newline="", encoding="utf-8" if self.jsonl else encoding)
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._fh, fieldnames=REJECT_FIELDS)
+            self._csv.writeheader()
+
+    def __call__(self, record: dict):
+        if self.jsonl:
+            self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            self._csv.writerow(record)
+        self.count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._fh.close()
+
+
+def new_stats() -> Counter:
+    return Counter(created=0, updated=0, unchanged=0, skipped=0, rejected=0)
+
+
+class Importer:
+    """
+    Пакетная запись нормализованных листов.
+    Количество запросов на пачку постоянно и не зависит от числа строк в ней.
+
+    Каждая записанная строка попадает в ImportLedger; при повторном импорте
+    строки с тем же хэшем не пишутся (use_ledger=False — переписать всё).
+
+    Плохие строки не валят импорт: не прошедшие validate_rows и те, на которых
+    упала пачка в БД, уходят в reject(record), остальное пишется.
+    Пачка пишется в transaction.atomic(): внутри общей транзакции это точка
+    сохранения, без неё — отдельный COMMIT на пачку.
+
+    dry_run=True — пробный запуск: строки проходят ту же нормализацию, проверку
+    и журнал, а вместо записи пачка только сверяется с БД (создать или обновить).
+    Новые справочники, пользователи и машины получают временные отрицательные id;
+    в БД, журнал, кэши и счётчики версий ничего не пишется.
+    """
+
+    def __init__(self, default_service: Optional[User] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 use_ledger: bool = True, reject=None, dry_run: bool = False):
+        self.dry_run = dry_run
+        self._planned = count(-1, -1)
+        self.default_service_id = default_service.pk if default_service else None
+        if default_service is not None and self.default_service_id is None:
+            self.default_service_id = next(self._planned)  # пробный запуск: сервис ещё не создан
+        self.batch_size = batch_size
+        self.use_ledger = use_ledger
+        self.reject = reject or (lambda record: None)
+        self.refs = ReferenceMap(dry_run)
+        self.users = UserResolver(dry_run)
+        self.machines = MachineIndex()
+
+    def prime(self, frames: dict):
+        """
+        Первый этап конвейера: создаёт недостающие справочники и пользователей
+        сразу для всех разобранных листов (kind -> DataFrame).
+        """
+        for kind, frame in frames.items():
+            frame = frame[frame["serial_number"] != ""]
+            for key, entity in SHEET_REFS[kind].items():
+                self.refs.resolve(entity, pd.Series(frame[key].unique()))
+            if kind == "machines":
+                self.users.resolve(CLIENT_GROUP, pd.Series(frame["client"].unique()))
+                self.users.resolve(SERVICE_GROUP, pd.Series(frame["service_company"].dropna().unique()))
+
+    def _resolve_refs(self, frame: pd.DataFrame, refs: dict) -> pd.DataFrame:
+        frame = frame.copy()
+        for key, entity in refs.items():
+            frame[key] = self.refs.resolve(entity, frame[key])
+        return frame
+
+    def _reject_rows(self, kind: str, frame: pd.DataFrame, reasons, stats: Counter):
+        sources = frame["_source"] if "_source" in frame.columns else [None] * len(frame.index)
+        for source, row, serial, reason in zip(sources, frame["_row"], frame["serial_number"], reasons):
+            self.reject({"file": source, "sheet": kind, "row": int(row), "serial_number": serial, "reason": reason})
+        stats["rejected"] += len(frame.index)
+
+    def _valid(self, kind: str, frame: pd.DataFrame, stats: Counter) -> pd.DataFrame:
+        reasons = validate_rows(kind, frame)
+        bad = reasons != ""
+        if bad.any():
+            self._reject_rows(kind, frame[bad], reasons[bad], stats)
+        return frame[~bad]
+
+    def _changed(self, kind: str, frame: pd.DataFrame, stats: Counter) -> pd.DataFrame:
+        """
+        Отбрасывает строки без зав. номера (skipped) и строки, чей хэш совпал
+        с журналом (unchanged). К оставшимся добавляет колонки _key/_digest.
+        """
+        stats["skipped"] += int((frame["serial_number"] == "").sum())
+        frame = frame[frame["serial_number"] != ""]
+        prints = row_fingerprints(kind, frame)
+        frame = frame.assign(_key=prints["key"], _digest=prints["digest"])
+        if not self.use_ledger:
+            return frame
+        known = {}
+        for batch in _batches(frame, self.batch_size):
+            known.update(
+                ImportLedger.objects
+                .filter(sheet=kind, key__in=batch["_key"].tolist())
+                .values_list("key", "digest")
+            )
+        same = frame["_key"].map(known) == frame["_digest"]
+        stats["unchanged"] += int(same.sum())
+        return frame[~same]
+
+    def _record(self, kind: str, batch: pd.DataFrame):
+        ImportLedger.objects.bulk_create(
+            [ImportLedger(sheet=kind, key=k, digest=d) for k, d in zip(batch["_key"], batch["_digest"])],
+            update_conflicts=True,
+            unique_fields=["sheet", "key"],
+            update_fields=["digest", "updated_at"],
+        )
+
+    def _write(self, kind: str, frame: pd.DataFrame, stats: Counter):
+        """
+        Пишет лист пачками через _write_<kind>(batch) -> Counter.
+        Если пачка упала в БД, она откатывается к точке сохранения и повторяется
+        построчно: так отсеиваются только виновные строки.
+        При dry_run пачки только считаются через _plan_<kind>(batch).
+        """
+        if self.dry_run:
+            for batch in _batches(frame, self.batch_size):
+                stats.update(getattr(self, f"_plan_{kind}")(batch))
+            return
+        write_batch = getattr(self, f"_write_{kind}")
+        for batch in _batches(frame, self.batch_size):
+            try:
+                with transaction.atomic():
+                    stats.update(write_batch(batch))
+                continue
+            except (DatabaseError, OverflowError):
+                if kind == "machines":
+                    self.machines.reload(batch["serial_number"])
+            for i in range(len(batch.index)):
+                row = batch.iloc[i:i + 1]
+                try:
+                    with transaction.atomic():
+                        stats.update(write_batch(row))
+                except (DatabaseError, OverflowError) as e:
+                    if kind == "machines":
+                        self.machines.reload(row["serial_number"])
+                    self._reject_rows(kind, row, [f"ошибка БД: {e}"], stats)
+        if not frame.empty:
+            versions.bump(VERSION_TABLES[kind])  # bulk-запись не шлёт post_save — ETag'и API сбрасываем сами
+
+    def import_machines(self, frame: pd.DataFrame) -> Counter:
+        stats = new_stats()
+        # update_or_create построчно: при повторе серийника побеждает последняя строка
+        before = len(frame.index)
+        frame = frame.drop_duplicates("serial_number", keep="last")
+        stats["skipped"] += before - len(frame.index)
+        frame = self._changed("machines", frame, stats)
+        frame = self._valid("machines", frame, stats)
+        frame = self._resolve_refs(frame, MACHINE_REFS)
+        frame["client"] = self.users.resolve(CLIENT_GROUP, frame["client"])
+        # None — в листе нет колонки сервисной компании: берём сервис по умолчанию
+        names = frame["service_company"]
+        ids = self.users.resolve(SERVICE_GROUP, names.fillna(""))
+        frame["service_company"] = [
+            self.default_service_id if pd.isna(n) else i for n, i in zip(names, ids)
+        ]
+        orphan = frame["service_company"].isna()
+        if orphan.any():
+            self._reject_rows("machines", frame[orphan], ["не указана сервисная компания"] * int(orphan.sum()), stats)
+            frame = frame[~orphan]
+        self._write("machines", frame, stats)
+        if self.dry_run:
+            return stats
+        if not frame.empty:
+            scope.forget_all_fleets()  # прежних владельцев машин bulk-запись не сообщает
+        # модель, клиент и сервис машины — измерения свёртки рекламаций и прогноза ТО
+        ids = [self.machines.get(sn)[0] for sn in frame["serial_number"] if sn in self.machines]
+        analytics.refresh_machines(ids)
+        maintenance_due.refresh(ids)
+        return stats
+
+    def _write_machines(self, batch: pd.DataFrame) -> Counter:
+        objs = [
+            Machine(
+                serial_number=r.serial_number,
+                model_technique_id=r.model_technique,
+                model_engine_id=r.model_engine,
+                model_transmission_id=r.model_transmission,
+                model_drive_bridge_id=r.model_drive_bridge,
+                model_steer_bridge_id=r.model_steer_bridge,
+                serial_engine=r.serial_engine,
+                serial_transmission=r.serial_transmission,
+                serial_drive_bridge=r.serial_drive_bridge,
+                serial_steer_bridge=r.serial_steer_bridge,
+                shipment_date=_none(r.shipment_date),
+                consignee=r.consignee,
+                delivery_address=r.delivery_address,
+                equipment=r.equipment,
+                contract_number=r.contract_number,
+                client_id=_none(r.client),
+                service_company_id=_none(r.service_company),
+            )
+            for r in batch.itertuples(index=False)
+        ]
+        new = [o.serial_number for o in objs if o.serial_number not in self.machines]
+        Machine.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["serial_number"],
+            update_fields=MACHINE_UPDATE_FIELDS,
+        )
+        self._record("machines", batch)
+        self.machines.reload(batch["serial_number"])
+        # у новых машин заводим пустую сводку (post_save bulk-вставка не шлёт)
+        machine_stats.refresh(self.machines.get(sn)[0] for sn in new)
+        return Counter(created=len(new), updated=len(objs) - len(new))
+
+    def _plan_machines(self, batch: pd.DataFrame) -> Counter:
+        """Пробный запуск: новые машины запоминаются с временными id — к ним привяжутся ТО и рекламации."""
+        new = 0
+        for sn, svc in zip(batch["serial_number"], batch["service_company"]):
+            row = self.machines.get(sn)
+            if row is None:
+                new += 1
+            self.machines.put(sn, row[0] if row else next(self._planned), _none(svc))
+        return Counter(created=new, updated=len(batch.index) - new)
+
+    def _attach_machines(self, kind: str, frame: pd.DataFrame, stats: Counter) -> pd.DataFrame:
+        """Оставляет строки с известными машинами и проставляет machine/service_company."""
+        known = frame["serial_number"].map(lambda sn: sn in self.machines).astype(bool)
+        if not known.all():
+            unknown = frame[~known]
+            self._reject_rows(kind, unknown, ["машина с таким зав. № не найдена"] * len(unknown.index), stats)
+        frame = frame[known].copy()
+        rows = frame["serial_number"].map(self.machines.get)
+        frame["machine"] = _lookup(rows, lambda r: r[0])
+        frame["service_company"] = _lookup(rows, lambda r: r[1] or self.default_service_id)
+        return frame
+
+    def _child_frame(self, kind: str, frame: pd.DataFrame, stats: Counter) -> pd.DataFrame:
+        # get_or_create построчно: при повторе ключа остаётся первая строка
+        before = len(frame.index)
+        frame = frame.drop_duplicates(list(NATURAL_KEYS[kind]), keep="first")
+        stats["skipped"] += before - len(frame.index)
+        frame = self._changed(kind, frame, stats)
+        frame = self._attach_machines(kind, frame, stats)
+        frame = self._valid(kind, frame, stats)
+        return self._resolve_refs(frame, SHEET_REFS[kind])
+
+    def import_maintenance(self, frame: pd.DataFrame) -> Counter:
+        stats = new_stats()
+        frame = self._child_frame("maintenance", frame, stats)
+        self._write("maintenance", frame, stats)
+        if not frame.empty and not self.dry_run:
+            maintenance_due.refresh(frame["machine"].unique().tolist())
+        return stats
+
+    @staticmethod
+    def _existing_maintenance(batch: pd.DataFrame) -> dict:
+        return {
+            (m, k, d): pk
+            for pk, m, k, d in Maintenance.objects
+            .filter(machine_id__in=batch["machine"].unique().tolist())
+            .values_list("id", "machine_id", "kind_id", "performed_date")
+        }
+
+    def _plan_maintenance(self, batch: pd.DataFrame) -> Counter:
+        existing = self._existing_maintenance(batch)
+        found = sum(
+            (r.machine, _none(r.kind), _none(r.performed_date)) in existing for r in batch.itertuples(index=False)
+        )
+        return Counter(created=len(batch.index) - found, updated=found)
+
+    def _write_maintenance(self, batch: pd.DataFrame) -> Counter:
+        existing = self._existing_maintenance(batch)
+        new_objs, changed = [], []
+        for r in batch.itertuples(index=False):
+            obj = Maintenance(
+                pk=existing.get((r.machine, _none(r.kind), _none(r.performed_date))),
+                machine_id=r.machine,
+                kind_id=_none(r.kind),
+                performed_date=_none(r.performed_date),
+                operating_hours=r.operating_hours,
+                work_order_number=r.work_order_number,
+                work_order_date=_none(r.work_order_date),
+                organization_id=_none(r.organization),
+                service_company_id=_none(r.service_company),
+            )
+            (changed if obj.pk else new_objs).append(obj)
+        Maintenance.objects.bulk_create(new_objs)
+        if changed:
+            Maintenance.objects.bulk_update(changed, MAINTENANCE_UPDATE_FIELDS)
+        self._record("maintenance", batch)
+        machine_stats.refresh(batch["machine"].unique().tolist())
+        return Counter(created=len(new_objs), updated=len(changed))
+
+    def import_complaints(self, frame: pd.DataFrame) -> Counter:
+        stats = new_stats()
+        frame = self._child_frame("complaints", frame, stats)
+        self._write("complaints", frame, stats)
+        if not frame.empty and not self.dry_run:
+            analytics.refresh_machines(frame["machine"].unique().tolist())
+            maintenance_due.refresh(frame["machine"].unique().tolist())
+        return stats
+
+    @staticmethod
+    def _existing_complaints(batch: pd.DataFrame) -> dict:
+        return {
+            (m, d, n): pk
+            for pk, m, d, n in Complaint.objects
+            .filter(machine_id__in=batch["machine"].unique().tolist())
+            .values_list("id", "machine_id", "failure_date", "failure_node_id")
+        }
+
+    def _plan_complaints(self, batch: pd.DataFrame) -> Counter:
+        existing = self._existing_complaints(batch)
+        found = sum(
+            (r.machine, _none(r.failure_date), _none(r.failure_node)) in existing
+            for r in batch.itertuples(index=False)
+        )
+        return Counter(created=len(batch.index) - found, updated=found)
+
+    def _write_complaints(self, batch: pd.DataFrame) -> Counter:
+        existing = self._existing_complaints(batch)
+        new_objs, changed = [], []
+        for r in batch.itertuples(index=False):
+            fail_dt, rec_dt, days = _none(r.failure_date), _none(r.recovery_date), _none(r.downtime)
+            if days is None:
+                # то же, что делает Complaint.save() при downtime_days == 0
+                days = max(0, (rec_dt - fail_dt).days) if rec_dt and fail_dt else 0
+            obj = Complaint(
+                pk=existing.get((r.machine, fail_dt, _none(r.failure_node))),
+                machine_id=r.machine,
+                failure_date=fail_dt,
+                failure_node_id=_none(r.failure_node),
+                operating_hours=r.operating_hours,
+                failure_description=r.failure_description,
+                recovery_method_id=_none(r.recovery_method),
+                parts_used=r.parts_used,
+                recovery_date=rec_dt,
+                downtime_days=days,
+                service_company_id=_none(r.service_company),
+            )
+            (changed if obj.pk else new_objs).append(obj)
+        Complaint.objects.bulk_create(new_objs)
+        if changed:
+            Complaint.objects.bulk_update(changed, COMPLAINT_UPDATE_FIELDS)
+        fulltext.index_complaints(new_objs + changed)  # bulk-запись не шлёт post_save
+        self._record("complaints", batch)
+        machine_stats.refresh(batch["machine"].unique().tolist())
+        return Counter(created=len(new_objs), updated=len(changed))
@@ -0,0 +1,197 @@
+from django.core.exceptions import FieldDoesNotExist
+
+from .refcache import ref_name, snapshot
+
+# ---- быстрый путь списков (только чтение) ----
+# Списки машин, ТО, рекламаций и справочников собираются без сериализаторов DRF:
+# queryset.values() берёт ровно нужные колонки (зав. № машины и имена
+# пользователей — через тот же JOIN, что давал select_related), а строка
+# ответа — словарь с теми же ключами, в том же порядке и в тех же форматах,
+# что у сериализатора: даты — ISO-строкой, FK — id, названия справочников —
+# из refcache. JSON совпадает байт в байт (проверяет команда bench_lists).
+#
+# Поле описано колонками values() и функцией get(v, name) над строкой v; по
+# набору полей (всем или выбранным ?fields= / ?omit=) заранее собирается кортеж
+# пар (ключ, get), и строка — один проход по нему, а невыбранные поля не
+# попадают ни в SELECT, ни в JOIN. Запись, карточка и действия идут через сериализаторы;
+# при изменении их полей нужно поправить и описания здесь.
+
+
+# сколько разных ?fields= одного списка держать скомпилированными
+PROJECTION_CACHE = 64
+
+
+def _day(value):
+    return None if value is None else value.isoformat()
+
+
+def _user(pk, username, first_name):
+    # как UserSlimSerializer; нет пользователя — null
+    return None if pk is None else {"id": pk, "username": username, "first_name": first_name}
+
+
+def ref_names():
+    """id -> название справочника: снимок берётся один раз, промах — через ref_name."""
+    by_id = snapshot().by_id
+
+    def name(pk):
+        if pk is None:
+            return None
+        ref = by_id.get(pk)
+        return ref.name if ref is not None else ref_name(pk)
+
+    return name
+
+
+# ---- описания полей: (ключ в ответе, колонки values(), get(v, name)) ----
+
+def column(key, source=None):
+    source = source or key
+
+    def get(v, name):
+        return v[source]
+
+    return key, (source,), get
+
+
+def fk(key):
+    return column(key, f"{key}_id")
+
+
+def day(key, source=None):
+    source = source or key
+
+    def get(v, name):
+        return _day(v[source])
+
+    return key, (source,), get
+
+
+def ref(key, source):
+    def get(v, name):
+        return name(v[source])
+
+    return key, (source,), get
+
+
+def user(key):
+    pk, username, first_name = columns = (f"{key}_id", f"{key}__username", f"{key}__first_name")
+
+    def get(v, name):
+        return _user(v[pk], v[username], v[first_name])
+
+    return key, columns, get
+
+
+class Listing:
+    """Поля списка в порядке сериализатора; values() и rows() — по выбранным."""
+
+    def __init__(self, *fields):
+        self.fields = {key: (columns, get) for key, columns, get in fields}
+        self.keys = tuple(self.fields)
+        self._projections = {}
+        self.columns, self.row = self._compile(self.keys)
+
+    def _compile(self, keys):
+        columns = []
+        for key in keys:
+            columns += [c for c in self.fields[key][0] if c not in columns]
+        getters = tuple((key, self.fields[key][1]) for key in keys)
+
+        def row(v, name):
+            return {key: get(v, name) for key, get in getters}
+
+        return tuple(columns), row
+
+    def project(self, keys) -> "Listing":
+        """Тот же список только с полями keys (в порядке этого списка)."""
+        keys = tuple(key for key in self.keys if key in set(keys))
+        if keys == self.keys:
+            return self
+        projected = self._projections.get(keys)
+        if projected is None:
+            projected = Listing(*[(key, *self.fields[key]) for key in keys])
+            # наборы полей приходят из запроса — держим не больше PROJECTION_CACHE
+            if len(self._projections) < PROJECTION_CACHE:
+                self._projections[keys] = projected
+        return projected
+
+    def values(self, queryset, extra=()):
+        """queryset.values() по колонкам полей; extra — ещё колонки (ключ пагинации и т.п.)."""
+        return queryset.values(*self.columns, *[c for c in extra if c not in self.columns])
+
+    def rows(self, values) -> list:
+        row, name = self.row, ref_names()
+        return [row(v, name) for v in values]
+
+    def only(self, queryset):
+        """
+        Объекты модели только с колонками полей (для карточки): only() и
+        select_related лишь по связям, которые нужны выбранным полям.
+        Колонки-аннотации (сводка машины) пропускаются — их добавляет сам view.
+        """
+        opts = queryset.model._meta
+        related, loaded = set(), {"id"}
+        for name in self.columns:
+            head, _, rest = name.partition("__")
+            try:
+                opts.get_field(head)
+            except FieldDoesNotExist:
+                continue
+            if rest:
+                related.add(head)
+                loaded.update((head, name))
+            else:
+                loaded.add(name)
+        queryset = queryset.select_related(None)
+        if related:  # select_related() без аргументов пошёл бы по всем FK
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*sorted(loaded))
+
+
+# ---- машины (MachineSerializer) ----
+# поля сводки — аннотации machine_stats.annotate по именам API
+
+_MODELS = ("model_technique", "model_engine", "model_transmission", "model_steer_bridge", "model_drive_bridge")
+
+MACHINES = Listing(
+    column("id"), column("serial_number"),
+    *[fk(key) for key in _MODELS],
+    *[ref(f"{key}_name", f"{key}_id") for key in _MODELS],
+    column("serial_engine"), column("serial_transmission"),
+    column("serial_drive_bridge"), column("serial_steer_bridge"),
+    column("contract_number"), day("shipment_date"), column("consignee"),
+    column("delivery_address"), column("equipment"),
+    user("client"), user("service_company"),
+    column("maintenance_count"), day("last_maintenance_date"), column("current_operating_hours"),
+    column("complaint_count"), day("last_failure_date"), column("total_downtime_days"),
+)
+
+
+# ---- ТО (MaintenanceSerializer) ----
+
+MAINTENANCE = Listing(
+    column("id"), fk("machine"), column("machine_serial", "machine__serial_number"),
+    fk("kind"), ref("kind_name", "kind_id"),
+    day("performed_date"), column("operating_hours"),
+    column("work_order_number"), day("work_order_date"),
+    fk("organization"), ref("organization_name", "organization_id"),
+    user("service_company"),
+)
+
+
+# ---- рекламации (ComplaintSerializer) ----
+
+COMPLAINTS = Listing(
+    column("id"), fk("machine"), column("machine_serial", "machine__serial_number"),
+    day("failure_date"), column("operating_hours"),
+    fk("failure_node"), ref("failure_node_name", "failure_node_id"), column("failure_description"),
+    fk("recovery_method"), ref("recovery_method_name", "recovery_method_id"), column("parts_used"),
+    day("recovery_date"), column("downtime_days"),
+    user("service_company"),
+)
+
+
+# ---- справочники (ReferenceSerializer) ----
+
+REFERENCES = Listing(column("id"), column("entity"), column("name"), column("description"))
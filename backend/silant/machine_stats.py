@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+
+from .models import Complaint, Machine, MachineStats, Maintenance
+
+# ---- сводка по машине (MachineStats) ----
+# Пересчёт идёт целиком по затронутым машинам: две группировки по индексу
+# (machine, дата) и одна upsert-вставка. Так удаление или перенос ТО/рекламации
+# на другую машину не требуют отдельной логики «вычесть старое значение».
+# Наработка — показание самой поздней по дате записи ТО или рекламации (при
+# равной дате — с большим id; ТО и рекламация в один день — большее из двух),
+# а не наибольшее за всё время: ошибочно завышенное старое показание не должно
+# навсегда становиться «текущим».
+
+STAT_FIELDS = (
+    "maintenance_count", "last_maintenance_date", "operating_hours",
+    "complaint_count", "last_failure_date", "downtime_days", "updated_at",
+)
+CHUNK = 500
+
+# имя поля в API машин -> колонка MachineStats
+API_FIELDS = {
+    "maintenance_count": "maintenance_count",
+    "last_maintenance_date": "last_maintenance_date",
+    "current_operating_hours": "operating_hours",
+    "complaint_count": "complaint_count",
+    "last_failure_date": "last_failure_date",
+    "total_downtime_days": "downtime_days",
+}
+
+
+def _chunks(ids, size=CHUNK):
+    ids = sorted(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _latest(model, date_field, using):
+    """Подзапросы (дата, наработка) последней записи model по машине — по индексу (machine, дата)."""
+    rows = model.objects.using(using).filter(machine=OuterRef("pk")).order_by(f"-{date_field}", "-id")
+    return (
+        Subquery(rows.values(date_field)[:1]),
+        Subquery(rows.values("operating_hours")[:1]),
+    )
+
+
+def _current_hours(row) -> int:
+    readings = [
+        (row[f"{kind}_date"], row[f"{kind}_hours"]) for kind in ("maint", "compl")
+        if row[f"{kind}_date"] is not None
+    ]
+    return max(readings)[1] if readings else 0
+
+
+def refresh(machine_ids, using: str = "default") -> int:
+    """Пересчитывает сводки перечисленных машин; удалённые машины пропускаются."""
+    ids = {pk for pk in machine_ids if pk is not None}
+    done = 0
+    for chunk in _chunks(ids):
+        maint_date, maint_hours = _latest(Maintenance, "performed_date", using)
+        compl_date, compl_hours = _latest(Complaint, "failure_date", using)
+        latest = {
+            row["pk"]: row
+            for row in Machine.objects.using(using).filter(pk__in=chunk).order_by().annotate(
+                maint_date=maint_date, maint_hours=maint_hours, compl_date=compl_date, compl_hours=compl_hours,
+            ).values("pk", "maint_date", "maint_hours", "compl_date", "compl_hours")
+        }
+        existing = sorted(latest)
+        if not existing:
+            continue
+        maint = {
+            row["machine_id"]: row
+            for row in Maintenance.objects.using(using).filter(machine_id__in=existing)
+            .values("machine_id").order_by()
+            .annotate(count=Count("id"), last=Max("performed_date"))
+        }
+        compl = {
+            row["machine_id"]: row
+            for row in Complaint.objects.using(using).filter(machine_id__in=existing)
+            .values("machine_id").order_by()
+            .annotate(count=Count("id"), last=Max("failure_date"), downtime=Sum("downtime_days"))
+        }
+        rows = []
+        for pk in existing:
+            m, c = maint.get(pk, {}), compl.get(pk, {})
+            rows.append(MachineStats(
+                machine_id=pk,
+                maintenance_count=m.get("count", 0),
+                last_maintenance_date=m.get("last"),
+                operating_hours=_current_hours(latest[pk]),
+                complaint_count=c.get("count", 0),
+                last_failure_date=c.get("last"),
+                downtime_days=c.get("downtime") or 0,
+            ))
+        MachineStats.objects.using(using).bulk_create(
+            rows, update_conflicts=True, unique_fields=["machine"], update_fields=STAT_FIELDS,
+        )
+        done += len(rows)
+    return done
+
+
+def refresh_on_commit(machine_ids, using: str = "default"):
+    """
+    Пересчёт после фиксации транзакции (для сигналов): к этому моменту
+    каскадное удаление машины уже завершено и сводку для неё не создадим заново.
+    """
+    ids = {pk for pk in machine_ids if pk is not None}
+    if ids:
+        transaction.on_commit(lambda: refresh(ids, using), using=using)
+
+
+def rebuild(using: str = "default") -> int:
+    """Пересчитывает сводки всех машин."""
+    ids = Machine.objects.using(using).values_list("pk", flat=True)
+    return refresh(list(ids), using)
+
+
+def annotate(queryset, prefix: str = "", names=None):
+    """
+    Поля сводки как аннотации (LEFT JOIN к MachineStats) — по ним можно сортировать.
+    names — только эти поля API (пусто — queryset без JOIN); None — все.
+    """
+    return queryset.annotate(**{
+        name: F(f"{prefix}stats__{column}") for name, column in API_FIELDS.items()
+        if names is None or name in names
+    })
+
+
+def value(machine, name):
+    """Значение поля сводки: из аннотации или, если её нет, из machine.stats."""
+    if name in machine.__dict__:
+        return machine.__dict__[name]
+    try:
+        return getattr(machine.stats, API_FIELDS[name])
+    except MachineStats.DoesNotExist:
+        return None
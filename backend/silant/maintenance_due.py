@@ -0,0 +1,259 @@
+import datetime
+import math
+import re
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .models import Complaint, Machine, Maintenance, MaintenanceDue
+from .refcache import snapshot
+
+# ---- прогноз следующего ТО ----
+# Всё считается таблицами pandas сразу по всем (или по затронутым) машинам,
+# без цикла по машинам в Python:
+#   * показания наработки — ТО и рекламации (дата, м/час) плюс отгрузка с завода
+#     (0 м/час); последнее показание и интенсивность = наработка / дни с отгрузки;
+#   * периодичность вида ТО берётся из названия в справочнике: «ТО-1 (200 м/час)»;
+#   * ТО большей периодичности включает работы меньших (ТО-2 засчитывается и как
+#     ТО-1), поэтому «последнее ТО вида» — максимум по видам с периодичностью не меньше;
+#   * следующее ТО — через интервал после последнего, а если его не было —
+#     при наработке, равной интервалу; разовые виды (ТО-0, обкатка) — только если не было;
+#   * дата — последнее показание плюс (м/час до ТО) / интенсивность; прошедшая дата
+#     значит, что ТО просрочено.
+# Машинам без показаний подставляется медианная интенсивность их модели
+# (или всего парка) по сводкам MachineStats. Медианы считаются по всему парку,
+# поэтому их пересчитывает только rebuild, а refresh по сигналам берёт их из кэша.
+
+KIND_ENTITY = "Вид ТО"
+INTERVAL_RE = re.compile(r"(\d+)\s*м\s*/\s*ч", re.IGNORECASE)
+ONE_OFF_PREFIXES = ("ТО-0",)
+CHUNK = 500
+DEFAULT_WITHIN_DAYS = 14
+EPOCH = datetime.date(1970, 1, 1)
+FALLBACK_KEY = "silant:due:fallback-rates"
+
+COLUMNS = (
+    "machine_id", "kind_id", "client_id", "service_company_id", "interval_hours",
+    "last_hours", "last_date", "operating_hours", "operating_hours_date",
+    "usage_rate", "due_hours", "due_date",
+)
+
+
+def kinds() -> pd.DataFrame:
+    """Виды ТО с периодичностью в названии: kind_id, interval, one_off."""
+    rows = []
+    for item in snapshot().bundle.get(KIND_ENTITY, []):
+        found = INTERVAL_RE.search(item["name"])
+        if found and int(found.group(1)) > 0:
+            rows.append((item["id"], int(found.group(1)), item["name"].startswith(ONE_OFF_PREFIXES)))
+    return pd.DataFrame(rows, columns=["kind_id", "interval", "one_off"])
+
+
+def _values(queryset, fields, machine_ids, key="machine_id") -> pd.DataFrame:
+    """values_list в DataFrame; при заданных machine_ids — кусками по CHUNK."""
+    if machine_ids is None:
+        rows = list(queryset.values_list(*fields))
+    else:
+        rows = []
+        for i in range(0, len(machine_ids), CHUNK):
+            rows += queryset.filter(**{f"{key}__in": machine_ids[i:i + CHUNK]}).values_list(*fields)
+    return pd.DataFrame(rows, columns=list(fields))
+
+
+def _days(series) -> np.ndarray:
+    """Даты -> номер дня от 1970-01-01 (float, NaN для пустых) для векторной арифметики."""
+    values = pd.to_datetime(pd.Series(series, dtype=object)).to_numpy("datetime64[D]")
+    days = values.astype("int64").astype("float64")
+    days[np.isnat(values)] = np.nan
+    return days
+
+
+def _dates(days) -> list:
+    return [None if math.isnan(d) else EPOCH + datetime.timedelta(days=int(d)) for d in days]
+
+
+def _fallback_rates(using) -> tuple:
+    """Медианы интенсивности по моделям и по парку — из сводок машин (один запрос)."""
+    frame = pd.DataFrame(list(
+        Machine.objects.using(using).values_list(
+            "model_technique_id", "shipment_date", "stats__operating_hours",
+            "stats__last_maintenance_date", "stats__last_failure_date",
+        )
+    ), columns=["model", "shipped", "hours", "last_to", "last_failure"])
+    hours = frame["hours"].fillna(0).to_numpy(dtype="float64")
+    span = np.fmax(_days(frame["last_to"]), _days(frame["last_failure"])) - _days(frame["shipped"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["rate"] = np.where((span > 0) & (hours > 0), hours / span, np.nan)
+    fleet = frame["rate"].median()
+    return frame.groupby("model")["rate"].median().dropna().to_dict(), fleet
+
+
+def fallback_rates(using: str = "default", fresh: bool = False) -> tuple:
+    """
+    (медианы по моделям, медиана парка) из кэша; fresh или пустой кэш —
+    пересчёт по парку. Живут SILANT_DUE_FALLBACK_TIMEOUT секунд (сутки),
+    периодический rebuild обновляет их раньше.
+    """
+    key = f"{FALLBACK_KEY}:{using}"
+    rates = None if fresh else cache.get(key)
+    if rates is None:
+        rates = _fallback_rates(using)
+        cache.set(key, rates, getattr(settings, "SILANT_DUE_FALLBACK_TIMEOUT", 24 * 3600))
+    return rates
+
+
+def compute(machine_ids=None, using: str = "default") -> pd.DataFrame:
+    """Прогноз по машинам machine_ids (None — весь парк): DataFrame с колонками COLUMNS."""
+    ids = None if machine_ids is None else sorted({pk for pk in machine_ids if pk is not None})
+    plan = kinds()
+    machines = _values(
+        Machine.objects.using(using),
+        ("id", "shipment_date", "model_technique_id", "client_id", "service_company_id"), ids, key="id",
+    )
+    if machines.empty or plan.empty:
+        return pd.DataFrame(columns=list(COLUMNS))
+
+    # ---- показания наработки и интенсивность ----
+    readings = pd.concat([
+        _values(Maintenance.objects.using(using), ("machine_id", "performed_date", "operating_hours"), ids)
+        .set_axis(["machine_id", "date", "hours"], axis=1),
+        _values(Complaint.objects.using(using), ("machine_id", "failure_date", "operating_hours"), ids)
+        .set_axis(["machine_id", "date", "hours"], axis=1),
+    ], ignore_index=True)
+    readings["day"] = _days(readings["date"])
+    last = (
+        readings.sort_values(["machine_id", "day", "hours"])
+        .groupby("machine_id")[["day", "hours"]].last()
+    )
+    machines = machines.join(last, on="id")
+    machines["shipped"] = _days(machines["shipment_date"])
+    # нет показаний — последнее «показание» это отгрузка с нулевой наработкой
+    no_reading = machines["day"].isna()
+    machines.loc[no_reading, "day"] = machines.loc[no_reading, "shipped"]
+    machines["hours"] = machines["hours"].astype("float64").fillna(0)
+    hours = machines["hours"].to_numpy()
+    span = machines["day"].to_numpy(dtype="float64") - machines["shipped"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        machines["rate"] = np.where((span > 0) & (hours > 0), hours / span, np.nan)
+    if machines["rate"].isna().any():
+        by_model, fleet = fallback_rates(using)
+        fallback = machines["model_technique_id"].map(by_model).fillna(fleet)
+        machines["rate"] = machines["rate"].fillna(fallback)
+
+    # ---- последнее ТО каждого вида с учётом старших ----
+    done = _values(
+        Maintenance.objects.using(using).filter(kind_id__in=plan["kind_id"].tolist()),
+        ("machine_id", "kind_id", "performed_date", "operating_hours"), ids,
+    ).merge(plan[["kind_id", "interval"]], on="kind_id")
+    done["day"] = _days(done["performed_date"])
+    intervals = sorted(plan["interval"].unique(), reverse=True)
+
+    def covered(values) -> np.ndarray:
+        # машины x периодичность (по убыванию): максимум по этой и всем большим
+        table = done.pivot_table(index="machine_id", columns="interval", values=values, aggfunc="max") \
+            if not done.empty else pd.DataFrame()
+        table = table.reindex(index=machines["id"], columns=intervals).astype("float64")
+        return table.ffill(axis=1).cummax(axis=1).to_numpy()
+
+    covered_hours, covered_days = covered("operating_hours"), covered("day")
+
+    # ---- машина x вид ТО ----
+    n_machines, n_kinds = len(machines.index), len(plan.index)
+    rows = pd.DataFrame({
+        "m": np.repeat(np.arange(n_machines), n_kinds),
+        "kind_id": np.tile(plan["kind_id"].to_numpy(), n_machines),
+        "interval_hours": np.tile(plan["interval"].to_numpy(), n_machines),
+        "one_off": np.tile(plan["one_off"].to_numpy(), n_machines),
+    })
+    column = pd.Index(intervals).get_indexer(rows["interval_hours"])
+    rows["last_hours"] = covered_hours[rows["m"], column]
+    rows["last_day"] = covered_days[rows["m"], column]
+    rows = rows[~(rows["one_off"] & rows["last_hours"].notna())].copy()
+
+    m = machines.iloc[rows["m"].to_numpy()]
+    rows["due_hours"] = rows["last_hours"].fillna(0).to_numpy() + rows["interval_hours"].to_numpy()
+    # для просроченного ТО (наработка уже больше) дата выходит в прошлом,
+    # но не раньше последнего ТО этого вида
+    left = rows["due_hours"].to_numpy() - m["hours"].to_numpy()
+    rate = m["rate"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        due_day = np.where(rate > 0, m["day"].to_numpy() + np.ceil(left / rate), np.nan)
+    rows["due_day"] = np.where(np.isnan(due_day), np.nan, np.fmax(due_day, rows["last_day"].to_numpy()))
+
+    return pd.DataFrame({
+        "machine_id": m["id"].to_numpy(),
+        "kind_id": rows["kind_id"].to_numpy(),
+        "client_id": m["client_id"].to_numpy(),
+        "service_company_id": m["service_company_id"].to_numpy(),
+        "interval_hours": rows["interval_hours"].to_numpy(),
+        "last_hours": rows["last_hours"].to_numpy(),
+        "last_date": _dates(rows["last_day"].to_numpy()),
+        "operating_hours": m["hours"].to_numpy(),
+        "operating_hours_date": _dates(m["day"].to_numpy()),
+        "usage_rate": np.round(rate, 3),
+        "due_hours": rows["due_hours"].to_numpy(),
+        "due_date": _dates(rows["due_day"].to_numpy()),
+    })
+
+
+def _objects(frame) -> list:
+    def num(value, cast):
+        return None if value is None or (isinstance(value, float) and math.isnan(value)) else cast(value)
+
+    return [
+        MaintenanceDue(
+            machine_id=int(r.machine_id), kind_id=int(r.kind_id),
+            client_id=int(r.client_id), service_company_id=int(r.service_company_id),
+            interval_hours=int(r.interval_hours),
+            last_hours=num(r.last_hours, int), last_date=r.last_date,
+            operating_hours=int(r.operating_hours), operating_hours_date=r.operating_hours_date,
+            usage_rate=num(r.usage_rate, float),
+            due_hours=int(r.due_hours), due_date=r.due_date,
+        )
+        for r in frame.itertuples(index=False)
+    ]
+
+
+def refresh(machine_ids, using: str = "default") -> int:
+    """Пересчитывает прогноз перечисленных машин; удалённые машины просто выпадают."""
+    ids = sorted({pk for pk in machine_ids if pk is not None})
+    if not ids:
+        return 0
+    objs = _objects(compute(ids, using))
+    with transaction.atomic(using=using):
+        for i in range(0, len(ids), CHUNK):
+            MaintenanceDue.objects.using(using).filter(machine_id__in=ids[i:i + CHUNK]).delete()
+        MaintenanceDue.objects.using(using).bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def refresh_on_commit(machine_ids, using: str = "default"):
+    ids = {pk for pk in machine_ids if pk is not None}
+    if ids:
+        transaction.on_commit(lambda: refresh(ids, using), using=using)
+
+
+def rebuild(using: str = "default") -> int:
+    """
+    Пересчёт по всему парку — точка входа для периодического запуска (cron,
+    планировщик задач): прогноз устаревает при смене названий видов ТО и
+    медиан интенсивности, которые сигналы не отслеживают. Медианы здесь же
+    пересчитываются и кладутся в кэш для refresh.
+    """
+    fallback_rates(using, fresh=True)
+    objs = _objects(compute(None, using))
+    with transaction.atomic(using=using):
+        MaintenanceDue.objects.using(using).all().delete()
+        MaintenanceDue.objects.using(using).bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def ensure_plan(using="default", **kwargs):
+    """post_migrate: заполняет прогноз, если таблица пуста, а машины уже есть."""
+    if MaintenanceDue._meta.db_table not in connections[using].introspection.table_names():
+        return  # миграции откатили до появления таблицы
+    if not MaintenanceDue.objects.using(using).exists() and Machine.objects.using(using).exists():
+        rebuild(using)
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from silant import listing, machine_stats
+from silant.models import Complaint, Machine, Maintenance, Reference
+from silant.serializers import ComplaintSerializer, MachineSerializer, MaintenanceSerializer, ReferenceSerializer
+
+LISTS = {
+    # имя -> (queryset как у списка в API, сериализатор, быстрый путь)
+    "machines": (
+        lambda: machine_stats.annotate(Machine.objects.select_related("client", "service_company")),
+        MachineSerializer, listing.MACHINES,
+    ),
+    "maintenance": (
+        lambda: Maintenance.objects.select_related("machine", "service_company"),
+        MaintenanceSerializer, listing.MAINTENANCE,
+    ),
+    "complaints": (
+        lambda: Complaint.objects.select_related("machine", "service_company"),
+        ComplaintSerializer, listing.COMPLAINTS,
+    ),
+    "references": (lambda: Reference.objects.all(), ReferenceSerializer, listing.REFERENCES),
+}
+
+
+def _best(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        spent = time.perf_counter() - started
+        best = spent if best is None else min(best, spent)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает списки API: сериализатор DRF и быстрый путь через values() (silant.listing) — "
+        "время (запрос + сборка + JSON, лучшее из --repeat) и совпадение JSON байт в байт"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="строк в списке")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--only", choices=sorted(LISTS), action="append")
+
+    def handle(self, *args, **opts):
+        renderer = JSONRenderer()
+        rows, repeat = opts["rows"], max(1, opts["repeat"])
+        mismatched = []
+        for name in opts["only"] or LISTS:
+            queryset, serializer_class, lean = LISTS[name]
+
+            def slow():
+                page = list(queryset().order_by("-id")[:rows])
+                return len(page), renderer.render(serializer_class(page, many=True).data)
+
+            def fast():
+                page = list(lean.values(queryset()).order_by("-id")[:rows])
+                return len(page), renderer.render(lean.rows(page))
+
+            slow_time, (count, slow_body) = _best(slow, repeat)
+            fast_time, (_, fast_body) = _best(fast, repeat)
+            same = slow_body == fast_body
+            if not same:
+                mismatched.append(name)
+            self.stdout.write(
+                f"{name}: {count} строк; сериализатор {slow_time * 1000:.1f} мс, "
+                f"values() {fast_time * 1000:.1f} мс, быстрее в {slow_time / max(fast_time, 1e-9):.1f} раза; "
+                f"JSON {'совпадает' if same else 'РАЗЛИЧАЕТСЯ'}"
+            )
+        if mismatched:
+            raise CommandError(f"JSON быстрого пути отличается: {', '.join(mismatched)}")
@@ -1,195 +1,29 @@
 from django.core.management.base import BaseCommand, CommandParser
 from django.contrib.auth.models import User, Group
+from django.conf import settings
 from django.db import transaction
-from datetime import datetime, timedelta, date
-from pathlib import Path
-from typing import Optional
-import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from typing import Iterator, Optional
+import json
+import os
+import sys
+import time
 import pandas as pd
-from slugify import slugify
 
-from silant.models import Reference, Machine, Maintenance, Complaint
+from silant.import_worker import init_worker
+from silant.importer import (  # noqa: F401 — хелперы исторически импортировались отсюда
+    DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, SHEET_KINDS, Importer, RejectFile, new_stats, read_sheet,
+    iter_sheet_chunks,
+    expand_paths, sheet_tasks, parse_sheet_task,
+    _normalize_company_name, norm_val, parse_days, parse_date, norm_col, find_col, get_or_create_user,
+    normalize_machines, normalize_maintenance, normalize_complaints, NORMALIZERS,
+)
 
 
-def _normalize_company_name(name: str) -> str:
-    """Унифицируем отображаемое имя: убираем кавычки, лишние пробелы, типографику."""
-    s = (name or "").strip()
-    # привести разные кавычки к обычным и убрать их
-    s = s.replace("«", '"').replace("»", '"').replace("“", '"').replace("”", '"')
-    s = s.replace("'", '"')
-    s = re.sub(r'"+', "", s)
-    # схлопнуть пробелы
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-def norm_val(s):
-    if pd.isna(s):
-        return ""
-    return str(s).strip()
-
-def parse_days(value, fail_dt=None, rec_dt=None) -> Optional[int]:
-    """
-    Парсит 'время простоя, дни' из произвольной строки/числа.    
-    Если число не найдено — пытается вычислить по разнице дат.
-    """
-    s = norm_val(value)
-    if s:
-        m = re.search(r'([-+]?\d+(?:[.,]\d+)?)', s)
-        if m:
-            try:
-                val = float(m.group(1).replace(",", "."))
-                d = int(round(val))
-                if d >= 0:
-                    return d
-            except Exception:
-                pass
-
-    # считаем по датам
-    if fail_dt and rec_dt:
-        try:
-            diff = (rec_dt - fail_dt).days
-            if diff >= 0 and diff < 10000:
-                return diff
-        except Exception:
-            pass
-
-    return None
-
-
-def parse_date(v):
-    """Понимает dd.mm.yyyy, yyyy-mm-dd, dd/mm/yyyy, dd.mm.yy, ISO и excel-serial."""
-    if v is None or (isinstance(v, float) and pd.isna(v)) or (isinstance(v, str) and not v.strip()):
-        return None
-    if hasattr(v, "to_pydatetime"):
-        v = v.to_pydatetime()
-    if isinstance(v, datetime):
-        return v.date()
-    if isinstance(v, date):
-        return v
-
-    s = str(v).strip()
-    s_first = s.split(" ")[0] if " " in s else s
-
-    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%y"):
-        try:
-            return datetime.strptime(s_first, fmt).date()
-        except Exception:
-            pass
-
-    try:
-        return datetime.fromisoformat(s).date()
-    except Exception:
-        pass
-
-    try:
-        num = float(s.replace(",", "."))
-        if 20000 <= num <= 80000:
-            base = datetime(1899, 12, 30)
-            return (base + timedelta(days=num)).date()
-    except Exception:
-        pass
-
-    return None
-
-
-def norm_col(s: str) -> str:
-    s = str(s).lower()
-    s = s.replace("№", "номер")
-    s = re.sub(r"[\(\)\.,/\\\-]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
-def find_col(df: pd.DataFrame, *candidates) -> Optional[str]:
-    cols = {norm_col(c): c for c in df.columns}
-    cand_norm = [norm_col(c) for c in candidates]
-    for cn in cand_norm:
-        if cn in cols:
-            return cols[cn]
-    for cn in cand_norm:
-        keys = cn.split()
-        for norm_name, original in cols.items():
-            if all(k in norm_name for k in keys):
-                return original
-    return None
-
-
-def ref(entity: str, name):
-    name = norm_val(name)
-    if not name:
-        return None
-    return Reference.objects.get_or_create(entity=entity, name=name)[0]
-
-
-def get_or_create_user(name, group_name: str) -> User | None:
-    """
-    Ищем пользователя по 'человеческому' имени внутри группы.
-    Если нет — создаём с username на базе slug от нормализованного имени.
-    """
-    name = (name or "").strip()
-    if not name:
-        return None
-
-    display_name = _normalize_company_name(name)
-
-    # 1) точное совпадение по first_name в нужной группе (без учёта регистра)
-    user = (User.objects
-            .filter(groups__name=group_name, first_name__iexact=display_name)
-            .first())
-    if user:
-        return user
-
-    # 2) совпадение по "нормализованному" first_name
-    for u in User.objects.filter(groups__name=group_name).only("id", "first_name"):
-        if _normalize_company_name(u.first_name) == display_name:
-            return u
-
-    # 3) создаём нового
-    base = slugify(display_name, separator="-")[:120] or group_name
-    base = base.strip("._-") or group_name
-
-    username = base
-    i = 2
-    while User.objects.filter(username=username).exists():
-        # Доп. защита от дублей
-        u = (User.objects
-             .filter(username=username, groups__name=group_name)
-             .first())
-        if u and _normalize_company_name(u.first_name) == display_name:
-            return u
-        username = f"{base}-{i}"
-        i += 1
-
-    user = User.objects.create_user(
-        username=username,
-        password="changeme123",
-        is_active=True,
-        first_name=display_name,
-    )
-    grp, _ = Group.objects.get_or_create(name=group_name)
-    user.groups.add(grp)
-    user.save()
-    return user
-
-
-def read_sheet(path: str, sheet: str, header_hint: Optional[int]) -> pd.DataFrame:
-    """
-    Читает лист Excel. Если header_hint задан (1-based) — используем его,
-    иначе пытаемся autodetect по «якорям» в первых 10 строках.
-    """
-    if header_hint:
-        hdr = int(header_hint) - 1
-        return pd.read_excel(path, sheet_name=sheet, header=hdr, dtype=str, engine="openpyxl")
-
-    raw = pd.read_excel(path, sheet_name=sheet, header=None, dtype=str, engine="openpyxl")
-    anchors = ("модель техники", "зав", "машин", "вид то", "дата отказа", "дата проведения то")
-    hdr = 0
-    for i in range(min(10, len(raw.index))):
-        row_text = " ".join(str(x).lower() for x in raw.iloc[i].tolist() if pd.notna(x))
-        if any(a in row_text for a in anchors):
-            hdr = i
-            break
-    return pd.read_excel(path, sheet_name=sheet, header=hdr, dtype=str, engine="openpyxl")
+SHEET_TITLES = {"machines": "Машины", "maintenance": "ТО", "complaints": "Рекламации"}
 
 
 # ---------------- command ----------------
@@ -198,7 +32,8 @@ class Command(BaseCommand):
     help = "Импорт из Excel: машины, ТО, рекламации"
 
     def add_arguments(self, parser: CommandParser):
-        parser.add_argument("path", help="Путь к .xlsx")
+        parser.add_argument("paths", nargs="+", metavar="path",
+                            help="Путь к .xlsx (или .csv/.tsv с одним листом); можно несколько файлов или каталог")
         parser.add_argument("--machines", default="машины")
         parser.add_argument("--to", default="ТО output")
         parser.add_argument("--claims", default="рекламация output")
@@ -208,176 +43,73 @@ class Command(BaseCommand):
         parser.add_argument("--hdr-claims", type=int, default=None)
 
         parser.add_argument("--service", default=None, help="username сервисной компании по умолчанию")
-
-    @transaction.atomic
-    def handle(self, path, machines, to, claims, hdr_machines, hdr_to, hdr_claims, service, **_):
-        path = str(Path(path))
-        self.stdout.write(self.style.NOTICE(f"Читаю файл: {path}"))
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Сколько строк писать в БД за один bulk-запрос")
+        parser.add_argument("--stream", action="store_true",
+                            help="Потоковое чтение: лист не загружается в память целиком")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Размер куска (строк) в потоковом режиме")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Кодировка CSV/TSV")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Сколько процессов разбирают листы/файлы параллельно")
+        parser.add_argument("--full", action="store_true",
+                            help="Игнорировать журнал импорта и переписать все строки")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Проверить строки и посчитать изменения, ничего не записывая в БД")
+        parser.add_argument("--batch-commit", action="store_true",
+                            help="Фиксировать каждую пачку отдельно, а не весь импорт одной транзакцией")
+        parser.add_argument("--rejects", default=None, metavar="PATH",
+                            help="Куда записать отклонённые строки (.csv или .jsonl)")
+        parser.add_argument("--summary-json", default=None, metavar="PATH",
+                            help="Итог импорта в JSON ('-' — в stdout)")
+
+    def handle(self, dry_run, batch_commit, rejects, summary_json, **options):
+        self._summary = {"dry_run": dry_run, "batch_commit": batch_commit and not dry_run,
+                         "stages": [], "sheets": {}}
+        started = time.perf_counter()
+        reject_file = RejectFile(rejects, options["encoding"]) if rejects else None
+        with reject_file or nullcontext():
+            # пробный запуск ничего не пишет — транзакция ему не нужна
+            with nullcontext() if batch_commit or dry_run else transaction.atomic():
+                self._import(reject=reject_file, dry_run=dry_run, **options)
+                if dry_run:
+                    self.stdout.write(self.style.WARNING("Пробный запуск: в БД ничего не записано"))
+        if reject_file:
+            self.stdout.write(self.style.NOTICE(f"Отклонённых строк: {reject_file.count} -> {rejects}"))
+
+        self._summary["seconds"] = round(time.perf_counter() - started, 3)
+        if summary_json:
+            text = json.dumps(self._summary, ensure_ascii=False, indent=2)
+            if summary_json == "-":
+                sys.stdout.write(text + "\n")
+            else:
+                with open(summary_json, "w", encoding="utf-8") as fh:
+                    fh.write(text + "\n")
+
+    def _import(self, paths, machines, to, claims, hdr_machines, hdr_to, hdr_claims, service, batch_size,
+                stream, chunk_size, encoding, workers, full, reject=None, dry_run=False, **_):
+        files = expand_paths(paths)
+        self._stream, self._chunk_size, self._encoding = stream, chunk_size, encoding
+        self._sheets = {"machines": machines, "maintenance": to, "complaints": claims}
+        self._hints = {"machines": hdr_machines, "maintenance": hdr_to, "complaints": hdr_claims}
 
         default_service = User.objects.filter(username=service).first() if service else None
-        if service and not default_service:
+        if service and not default_service and dry_run:
+            default_service = User(username=service)  # создался бы при настоящем импорте
+        elif service and not default_service:
             default_service = User.objects.create_user(username=service, password="changeme123", is_active=True)
             g, _ = Group.objects.get_or_create(name="service")
             default_service.groups.add(g)
 
-        # ---- Машины ----
-        try:
-            df_m = read_sheet(path, machines, hdr_machines)
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"Не удалось открыть лист '{machines}': {e}"))
-            df_m = None
-
-        if df_m is not None:
-            c_serial              = find_col(df_m, "зав. номер машины")
-            c_model_technique     = find_col(df_m, "модель техники")
-            c_model_engine        = find_col(df_m, "модель двигателя")
-            c_serial_engine       = find_col(df_m, "зав. номер двигателя")
-            c_model_transmission  = find_col(df_m, "модель трансмиссии производитель артикул", "модель трансмиссии")
-            c_serial_transmission = find_col(df_m, "зав. номер трансмиссии")
-            c_model_drive_bridge  = find_col(df_m, "модель ведущего моста")
-            c_serial_drive_bridge = find_col(df_m, "зав. номер ведущего моста")
-            c_model_steer_bridge  = find_col(df_m, "модель управляемого моста")
-            c_serial_steer_bridge = find_col(df_m, "зав. номер управляемого моста")
-            c_shipment_date       = find_col(df_m, "дата отгрузки с завода")
-            c_client_name         = find_col(df_m, "покупатель", "клиент")
-            c_consignee           = find_col(df_m, "грузополучатель конечный потребитель")
-            c_delivery_address    = find_col(df_m, "адрес поставки эксплуатации")
-            c_equipment           = find_col(df_m, "комплектация доп опции", "комплектация")
-            c_contract            = find_col(df_m, "договор поставки номер дата", "договор")
-            c_service_company     = find_col(df_m, "сервисная компания")
-
-            created, updated = 0, 0
-            for _, row in df_m.iterrows():
-                sn = norm_val(row.get(c_serial))
-                if not sn:
-                    continue
-
-                mt = ref("Модель техники",            row.get(c_model_technique))
-                me = ref("Модель двигателя",          row.get(c_model_engine))
-                tr = ref("Модель трансмиссии",        row.get(c_model_transmission))
-                db = ref("Модель ведущего моста",     row.get(c_model_drive_bridge))
-                sb = ref("Модель управляемого моста", row.get(c_model_steer_bridge))
-
-                client_user  = get_or_create_user(row.get(c_client_name), "client") if c_client_name else None
-                service_user = get_or_create_user(row.get(c_service_company), "service") if c_service_company else default_service
-
-                _, was_created = Machine.objects.update_or_create(
-                    serial_number=sn,
-                    defaults=dict(
-                        model_technique=mt,
-                        model_engine=me,
-                        model_transmission=tr,
-                        model_drive_bridge=db,
-                        model_steer_bridge=sb,
-                        serial_engine=norm_val(row.get(c_serial_engine)),
-                        serial_transmission=norm_val(row.get(c_serial_transmission)),
-                        serial_drive_bridge=norm_val(row.get(c_serial_drive_bridge)),
-                        serial_steer_bridge=norm_val(row.get(c_serial_steer_bridge)),
-                        shipment_date=parse_date(row.get(c_shipment_date)),
-                        consignee=norm_val(row.get(c_consignee)),
-                        delivery_address=norm_val(row.get(c_delivery_address)),
-                        equipment=norm_val(row.get(c_equipment)),
-                        contract_number=norm_val(row.get(c_contract)) if c_contract else "",
-                        client=client_user,
-                        service_company=service_user,
-                    ),
-                )
-                created += int(was_created)
-                updated += int(not was_created)
-            self.stdout.write(self.style.SUCCESS(f"Машины: создано {created}, обновлено {updated}"))
-
-        # ---- ТО ----
-        try:
-            df_to = read_sheet(path, to, hdr_to)
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"Не удалось открыть лист '{to}': {e}"))
-            df_to = None
-
-        if df_to is not None:
-            c_sn       = find_col(df_to, "зав. номер машины")
-            c_kind     = find_col(df_to, "вид то")
-            c_date     = find_col(df_to, "дата проведения то")
-            c_hours    = find_col(df_to, "наработка м час", "наработка")
-            c_wo_no    = find_col(df_to, "номер заказ-наряда")
-            c_wo_date  = find_col(df_to, "дата заказ-наряда")
-            c_org      = find_col(df_to, "организация проводившая то")
+        importer = Importer(default_service=default_service, batch_size=batch_size, use_ledger=not full,
+                            reject=reject, dry_run=dry_run)
 
-            cnt = 0
-            for _, row in df_to.iterrows():
-                sn = norm_val(row.get(c_sn))
-                if not sn:
-                    continue
-                machine = Machine.objects.filter(serial_number=sn).first()
-                if not machine:
-                    continue
-
-                Maintenance.objects.get_or_create(
-                    machine=machine,
-                    kind=ref("Вид ТО", row.get(c_kind)),
-                    performed_date=parse_date(row.get(c_date)),
-                    defaults=dict(
-                        operating_hours=int(float(norm_val(row.get(c_hours) or "0"))),
-                        work_order_number=norm_val(row.get(c_wo_no)),
-                        work_order_date=parse_date(row.get(c_wo_date)),
-                        organization=ref("Организация ТО", row.get(c_org)),
-                        service_company=machine.service_company or default_service,
-                    ),
-                )
-                cnt += 1
-            self.stdout.write(self.style.SUCCESS(f"ТО: загружено {cnt} записей"))
-
-        # ---- Рекламации ----
-        try:
-            df_c = read_sheet(path, claims, hdr_claims)
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"Не удалось открыть лист '{claims}': {e}"))
-            df_c = None
-
-        if df_c is not None:
-            c_sn       = find_col(df_c, "зав. номер")
-            c_fail_dt  = find_col(df_c, "дата отказа")
-            c_hours    = find_col(df_c, "наработка")
-            c_node     = find_col(df_c, "узел отказа")
-            c_descr    = find_col(df_c, "описание отказа")
-            c_method   = find_col(df_c, "способ")
-            c_parts    = find_col(df_c, "используемые")
-            c_rec_dt   = find_col(df_c, "дата")
-            c_down     = find_col(df_c, "время")   # колонка называется именно «Время»
-
-            cnt = 0
-            for _, row in df_c.iterrows():
-                sn = norm_val(row.get(c_sn))
-                if not sn:
-                    continue
-                machine = Machine.objects.filter(serial_number=sn).first()
-                if not machine:
-                    continue
-
-                fail_dt = parse_date(row.get(c_fail_dt))
-                rec_dt  = parse_date(row.get(c_rec_dt))
-
-                obj, _ = Complaint.objects.get_or_create(
-                    machine=machine,
-                    failure_date=fail_dt,
-                    failure_node=ref("Узел отказа", row.get(c_node)),
-                    defaults=dict(
-                        operating_hours=int(float(norm_val(row.get(c_hours) or "0"))),
-                        failure_description=norm_val(row.get(c_descr)),
-                        recovery_method=ref("Способ восстановления", row.get(c_method)),
-                        parts_used=norm_val(row.get(c_parts)),
-                        recovery_date=rec_dt,
-                        service_company=machine.service_company or default_service,
-                    ),
-                )
-
-                # аккуратно проставляем время простоя (дни)
-                days = parse_days(row.get(c_down), fail_dt=fail_dt, rec_dt=rec_dt) if c_down else None
-                if days is not None and obj.downtime_days != days:
-                    obj.downtime_days = days
-                    obj.save(update_fields=["downtime_days"])
-
-                cnt += 1
-            self.stdout.write(self.style.SUCCESS(f"Рекламации: загружено {cnt} записей"))
+        if stream:
+            self._run_stream(files, importer, workers)
+        else:
+            self._run_pipeline(files, importer, workers)
+        if dry_run:
+            return
 
         # ---------- Менеджер ----------
         manager_username = "manager"
@@ -396,3 +128,100 @@ class Command(BaseCommand):
             ))
         else:
             self.stdout.write(self.style.NOTICE(f"Менеджер уже есть: {manager_username}"))
+
+    # ---------------- конвейер ----------------
+
+    @contextmanager
+    def _stage(self, title):
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        self._summary["stages"].append({"stage": title, "seconds": round(seconds, 3)})
+        self.stdout.write(self.style.NOTICE(f"[этап] {title}: {seconds:.2f} с"))
+
+    def _run_pipeline(self, files, importer: Importer, workers: int):
+        """
+        Разбор всех листов всех файлов (параллельно при --workers > 1), затем запись
+        в порядке зависимостей: справочники и пользователи -> машины -> ТО и рекламации.
+        """
+        tasks = [t + (self._encoding,) for path in files for t in sheet_tasks(path, self._sheets, self._hints)]
+        for path in files:
+            self.stdout.write(self.style.NOTICE(f"Читаю файл: {path}"))
+
+        parsed = {kind: [] for kind in SHEET_KINDS}
+        with self._stage(f"разбор ({len(tasks)} листов, процессов: {max(1, workers)})"):
+            if workers > 1 and len(tasks) > 1:
+                settings_module = os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(settings_module,)) as pool:
+                    results = list(pool.map(parse_sheet_task, *zip(*tasks)))
+            else:
+                results = [parse_sheet_task(*t) for t in tasks]
+
+        # результаты идут в порядке задач: «последняя строка побеждает» сохраняется между файлами
+        for path, kind, frame, error, _ in results:
+            if error is not None:
+                self.stdout.write(self.style.WARNING(f"Не удалось открыть лист '{self._sheets[kind]}' ({path}): {error}"))
+            else:
+                parsed[kind].append(frame.assign(_source=path))
+        frames = {kind: pd.concat(fs, ignore_index=True) for kind, fs in parsed.items() if fs}
+
+        with self._stage("справочники и пользователи"):
+            importer.prime(frames)
+        for kind in SHEET_KINDS:
+            if kind in frames:
+                started = time.perf_counter()
+                with self._stage(SHEET_TITLES[kind]):
+                    res = getattr(importer, f"import_{kind}")(frames[kind])
+                self._report(kind, res, time.perf_counter() - started)
+
+    def _report(self, kind, stats, seconds):
+        self.stdout.write(self.style.SUCCESS(
+            f"{SHEET_TITLES[kind]}: создано {stats['created']}, обновлено {stats['updated']}, "
+            f"без изменений {stats['unchanged']}, пропущено {stats['skipped']}, отклонено {stats['rejected']}"
+        ))
+        sheet = self._summary["sheets"].setdefault(kind, dict(new_stats(), rows=0, seconds=0.0))
+        for key, value in stats.items():
+            sheet[key] += value
+        sheet["rows"] += sum(stats.values())
+        sheet["seconds"] = round(sheet["seconds"] + seconds, 3)
+        sheet["rows_per_sec"] = round(sheet["rows"] / sheet["seconds"], 1) if sheet["seconds"] else None
+
+    # ---------------- потоковый режим ----------------
+
+    def _frames(self, path, sheet, header_hint) -> Optional[Iterator[pd.DataFrame]]:
+        """Ленивые куски листа; None, если лист не открылся."""
+        try:
+            chunks = iter_sheet_chunks(path, sheet, header_hint, self._chunk_size, self._encoding)
+            first = next(chunks, None)  # открываем файл сразу, чтобы поймать ошибку
+            return chain([first], chunks) if first is not None else iter([])
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Не удалось открыть лист '{sheet}': {e}"))
+            return None
+
+    def _run_stream(self, files, importer: Importer, workers: int):
+        """
+        Листы кусками, без загрузки целиком. Порядок тот же, что в конвейере:
+        сначала машины из всех файлов, затем ТО, затем рекламации.
+        """
+        if workers > 1:
+            self.stdout.write(self.style.WARNING("--workers в потоковом режиме не используется: листы читаются по очереди"))
+        tasks = [t for path in files for t in sheet_tasks(path, self._sheets, self._hints)]
+        for path in files:
+            self.stdout.write(self.style.NOTICE(f"Читаю файл: {path}"))
+        # сортировка устойчива: внутри вида файлы идут в порядке аргументов
+        for path, kind, sheet, hint in sorted(tasks, key=lambda t: SHEET_KINDS.index(t[1])):
+            started = time.perf_counter()
+            res = self._import_stream(path, sheet, hint, NORMALIZERS[kind], getattr(importer, f"import_{kind}"))
+            if res is not None:
+                self._report(kind, res, time.perf_counter() - started)
+
+    def _import_stream(self, path, sheet, header_hint, normalize, write) -> Optional[Counter]:
+        """Нормализует и пишет лист кусками; возвращает суммарные счётчики."""
+        frames = self._frames(path, sheet, header_hint)
+        if frames is None:
+            return None
+        total = new_stats()
+        for df in frames:
+            total.update(write(normalize(df).assign(_source=path)))
+        return total
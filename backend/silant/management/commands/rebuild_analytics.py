@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from silant import analytics
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает свёртку рекламаций для аналитики (ComplaintRollup)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        rows = analytics.rebuild(opts["database"])
+        self.stdout.write(f"Свёртка пересчитана: {rows} строк за {time.perf_counter() - started:.2f} с")
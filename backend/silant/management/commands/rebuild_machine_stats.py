@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from silant import machine_stats, versions
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводки по машинам (MachineStats) из ТО и рекламаций"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        using = opts["database"]
+        started = time.perf_counter()
+        with transaction.atomic(using=using):
+            count = machine_stats.rebuild(using)
+            versions.bump(versions.MACHINES)
+        self.stdout.write(f"Сводки пересчитаны: {count} машин за {time.perf_counter() - started:.2f} с")
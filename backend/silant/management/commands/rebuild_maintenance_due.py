@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from silant import maintenance_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает прогноз ТО (MaintenanceDue) по всему парку. "
+        "Для периодического запуска — из cron или с --every <секунд> отдельным процессом"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--every", type=int, default=0,
+                            help="повторять каждые N секунд (0 — один раз)")
+
+    def handle(self, *args, **opts):
+        while True:
+            started = time.perf_counter()
+            rows = maintenance_due.rebuild(opts["database"])
+            self.stdout.write(f"Прогноз ТО пересчитан: {rows} строк за {time.perf_counter() - started:.2f} с")
+            if opts["every"] <= 0:
+                return
+            time.sleep(opts["every"])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from silant import fulltext, search
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковые индексы (FTS5 на SQLite); на PostgreSQL индексы обновляются сами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        using = opts["database"]
+        search.ensure_index(using)
+        count = fulltext.rebuild(using)
+        kind = fulltext.backend(using)
+        self.stdout.write(f"Рекламации: {kind}, проиндексировано {count}")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet', models.CharField(max_length=20, verbose_name='Лист')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ строки')),
+                ('digest', models.CharField(max_length=32, verbose_name='Хэш содержимого')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала импорта',
+                'verbose_name_plural': 'Журнал импорта',
+                'unique_together': {('sheet', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Триграммный индекс для icontains по зав. № есть только в PostgreSQL (pg_trgm);
+# на SQLite операция ничего не делает.
+def create_serial_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS silant_machine_serial_trgm "
+        "ON silant_machine USING gin (serial_number gin_trgm_ops)"
+    )
+
+
+def drop_serial_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS silant_machine_serial_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0002_import_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['failure_date', 'id'], name='silant_compl_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['shipment_date', 'id'], name='silant_mach_ship_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['client', 'shipment_date', 'id'], name='silant_mach_client_ship_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['service_company', 'shipment_date', 'id'], name='silant_mach_svc_ship_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['performed_date', 'id'], name='silant_maint_date_id_idx'),
+        ),
+        migrations.RunPython(create_serial_trgm, drop_serial_trgm),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+FIELDS = ("serial_number", "contract_number", "consignee", "delivery_address")
+FTS_TABLE = "silant_machine_search"
+
+
+# SQLite: FTS5-таблица с триграммным токенизатором поверх silant_machine,
+# синхронизируется триггерами. Если SQLite собран без FTS5 (или без trigram,
+# он есть с 3.34) — таблицы не будет, поиск уйдёт на icontains.
+# PostgreSQL: триграммные GIN-индексы по UPPER(поле) — именно это выражение
+# строит icontains Django. Индекс по зав. № из 0003 заменяется таким же.
+def _sqlite_forward(schema_editor):
+    cols = ", ".join(FIELDS)
+    new = ", ".join(f"new.{c}" for c in FIELDS)
+    old = ", ".join(f"old.{c}" for c in FIELDS)
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({cols}, "
+            f"content='silant_machine', content_rowid='id', tokenize='trigram')"
+        )
+    except OperationalError:
+        return
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON silant_machine BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON silant_machine BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON silant_machine BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _sqlite_backward(schema_editor):
+    for suffix in ("ai", "ad", "au"):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _sqlite_forward(schema_editor)
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS silant_machine_serial_trgm")
+        for col in FIELDS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS silant_machine_{col}_utrgm "
+                f"ON silant_machine USING gin ((UPPER({col}::text)) gin_trgm_ops)"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _sqlite_backward(schema_editor)
+    elif vendor == "postgresql":
+        for col in FIELDS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS silant_machine_{col}_utrgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS silant_machine_serial_trgm "
+            "ON silant_machine USING gin (serial_number gin_trgm_ops)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0003_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+FTS_TABLE = "silant_complaint_fts"
+PG_INDEX = "silant_complaint_fts_gin"
+
+
+# SQLite: FTS5-таблица для основ слов описания отказа и запчастей
+# (наполняется из Python — см. silant/fulltext.py, post_migrate досыпает строки).
+# PostgreSQL: GIN-индекс по to_tsvector('russian', ...) — то же выражение,
+# что строит fulltext.search().
+def create_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"failure_description, parts_used, tokenize='unicode61')"
+            )
+        except OperationalError:
+            pass
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON silant_complaint USING gin ("
+            f"to_tsvector('russian'::regconfig, "
+            f"COALESCE(silant_complaint.failure_description, '') || ' ' || "
+            f"COALESCE(silant_complaint.parts_used, '')))"
+        )
+
+
+def drop_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0004_machine_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext, drop_fulltext),
+    ]
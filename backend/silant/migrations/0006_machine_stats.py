@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+# Сводки для уже загруженных машин (дальше их ведут сигналы и импорт).
+def fill_stats(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Machine = apps.get_model("silant", "Machine")
+    Maintenance = apps.get_model("silant", "Maintenance")
+    Complaint = apps.get_model("silant", "Complaint")
+    MachineStats = apps.get_model("silant", "MachineStats")
+    maint = {
+        r["machine_id"]: r for r in Maintenance.objects.using(db).values("machine_id").order_by()
+        .annotate(count=Count("id"), last=Max("performed_date"), hours=Max("operating_hours"))
+    }
+    compl = {
+        r["machine_id"]: r for r in Complaint.objects.using(db).values("machine_id").order_by()
+        .annotate(count=Count("id"), last=Max("failure_date"), hours=Max("operating_hours"),
+                  downtime=Sum("downtime_days"))
+    }
+    rows = []
+    for pk in Machine.objects.using(db).values_list("pk", flat=True).iterator():
+        m, c = maint.get(pk, {}), compl.get(pk, {})
+        rows.append(MachineStats(
+            machine_id=pk,
+            maintenance_count=m.get("count", 0),
+            last_maintenance_date=m.get("last"),
+            operating_hours=max(m.get("hours") or 0, c.get("hours") or 0),
+            complaint_count=c.get("count", 0),
+            last_failure_date=c.get("last"),
+            downtime_days=c.get("downtime") or 0,
+        ))
+    MachineStats.objects.using(db).bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0005_complaint_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineStats',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='silant.machine', verbose_name='Машина')),
+                ('maintenance_count', models.PositiveIntegerField(default=0, verbose_name='Количество ТО')),
+                ('last_maintenance_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего ТО')),
+                ('operating_hours', models.PositiveIntegerField(default=0, verbose_name='Наработка (последняя известная), м/час')),
+                ('complaint_count', models.PositiveIntegerField(default=0, verbose_name='Количество рекламаций')),
+                ('last_failure_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего отказа')),
+                ('downtime_days', models.PositiveIntegerField(default=0, verbose_name='Простой всего, дни')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Сводка по машине',
+                'verbose_name_plural': 'Сводки по машинам',
+                'indexes': [models.Index(fields=['last_maintenance_date'], name='silant_stats_last_to_idx'), models.Index(fields=['operating_hours'], name='silant_stats_hours_idx'), models.Index(fields=['complaint_count'], name='silant_stats_compl_idx'), models.Index(fields=['downtime_days'], name='silant_stats_downtime_idx')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
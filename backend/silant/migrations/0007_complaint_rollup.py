@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import Counter
+
+from django.db import migrations, models
+
+
+# Свёртка для уже загруженных рекламаций (дальше её ведут сигналы и импорт);
+# то же, что analytics.rebuild(), но на исторических моделях.
+def fill_rollup(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Complaint = apps.get_model("silant", "Complaint")
+    ComplaintRollup = apps.get_model("silant", "ComplaintRollup")
+    failures, intervals = Counter(), Counter()
+    prev_machine, prev_hours = None, 0
+    rows = (
+        Complaint.objects.using(db).order_by("machine_id", "failure_date", "id")
+        .values_list("machine_id", "failure_date", "operating_hours", "failure_node_id", "recovery_method_id",
+                     "downtime_days", "machine__model_technique_id", "machine__model_engine_id",
+                     "machine__client_id", "machine__service_company_id")
+    )
+    for machine, day, hours, node, method, downtime, model, engine, client, service in rows.iterator():
+        if machine != prev_machine:
+            prev_machine, prev_hours = machine, 0
+        key = (day.replace(day=1), model, engine, node, method, client, service, downtime)
+        failures[key] += 1
+        intervals[key] += max(0, hours - prev_hours)
+        prev_hours = hours
+    ComplaintRollup.objects.using(db).bulk_create([
+        ComplaintRollup(
+            month=month, model_technique_id=model, model_engine_id=engine, failure_node_id=node,
+            recovery_method_id=method, client_id=client, service_company_id=service,
+            downtime_days=downtime, failures=n, interval_hours=intervals[key],
+        )
+        for key, n in failures.items()
+        for month, model, engine, node, method, client, service, downtime in [key]
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0006_machine_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplaintRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('downtime_days', models.PositiveIntegerField(verbose_name='Простой, дни')),
+                ('failures', models.PositiveIntegerField(verbose_name='Отказов')),
+                ('interval_hours', models.BigIntegerField(verbose_name='Наработка между отказами, м/час (сумма)')),
+                ('client', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('failure_node', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='silant.reference', verbose_name='Узел отказа')),
+                ('model_engine', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='silant.reference', verbose_name='Модель двигателя')),
+                ('model_technique', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='silant.reference', verbose_name='Модель техники')),
+                ('recovery_method', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='silant.reference', verbose_name='Способ восстановления')),
+                ('service_company', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Сервисная компания')),
+            ],
+            options={
+                'verbose_name': 'Свёртка рекламаций',
+                'verbose_name_plural': 'Свёртки рекламаций',
+                'indexes': [models.Index(fields=['month'], name='silant_rollup_month_idx'), models.Index(fields=['client', 'month'], name='silant_rollup_client_idx'), models.Index(fields=['service_company', 'month'], name='silant_rollup_svc_idx')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('silant', '0007_complaint_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceDue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval_hours', models.PositiveIntegerField(verbose_name='Периодичность, м/час')),
+                ('last_hours', models.PositiveIntegerField(blank=True, null=True, verbose_name='Наработка при последнем таком ТО')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего такого ТО')),
+                ('operating_hours', models.PositiveIntegerField(default=0, verbose_name='Последняя известная наработка, м/час')),
+                ('operating_hours_date', models.DateField(verbose_name='Дата последней известной наработки')),
+                ('usage_rate', models.FloatField(blank=True, null=True, verbose_name='Интенсивность, м/час в день')),
+                ('due_hours', models.PositiveIntegerField(verbose_name='ТО при наработке, м/час')),
+                ('due_date', models.DateField(blank=True, null=True, verbose_name='Ожидаемая дата ТО')),
+                ('client', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('kind', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='silant.reference', verbose_name='Вид ТО')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_due', to='silant.machine', verbose_name='Машина')),
+                ('service_company', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Сервисная компания')),
+            ],
+            options={
+                'verbose_name': 'Прогноз ТО',
+                'verbose_name_plural': 'Прогнозы ТО',
+                'indexes': [models.Index(fields=['due_date', 'id'], name='silant_due_date_idx'), models.Index(fields=['client', 'due_date'], name='silant_due_client_idx'), models.Index(fields=['service_company', 'due_date'], name='silant_due_svc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('machine', 'kind'), name='silant_due_machine_kind_uniq')],
+            },
+        ),
+    ]
@@ -55,6 +55,12 @@ class Machine(models.Model):
         verbose_name = "Машина"
         verbose_name_plural = "Машины"
         ordering = ["-shipment_date"]
+        indexes = [
+            # keyset-пагинация по (-shipment_date, -id) и она же в пределах роли
+            models.Index(fields=["shipment_date", "id"], name="silant_mach_ship_id_idx"),
+            models.Index(fields=["client", "shipment_date", "id"], name="silant_mach_client_ship_idx"),
+            models.Index(fields=["service_company", "shipment_date", "id"], name="silant_mach_svc_ship_idx"),
+        ]
 
     def __str__(self):
         return f"{self.serial_number}"
@@ -121,6 +127,7 @@ class Maintenance(models.Model):
             models.Index(fields=["performed_date"]),
             models.Index(fields=["machine", "performed_date"]),
             models.Index(fields=["service_company"]),
+            models.Index(fields=["performed_date", "id"], name="silant_maint_date_id_idx"),
         ]
 
     def __str__(self):
@@ -178,6 +185,7 @@ class Complaint(models.Model):
             models.Index(fields=["failure_date"]),
             models.Index(fields=["machine", "failure_date"]),
             models.Index(fields=["service_company"]),
+            models.Index(fields=["failure_date", "id"], name="silant_compl_date_id_idx"),
         ]
 
     def clean(self):
@@ -191,10 +199,164 @@ class Complaint(models.Model):
         Если downtime_days уже установлен (импортом/ручным вводом) — не трогаем.
         Если не установлен (=0) и есть обе даты — считаем по датам.
         """
+        self.fill_downtime()
+        super().save(*args, **kwargs)
+
+    def fill_downtime(self):
+        """Простой по датам, если он не задан (то же делается перед bulk-записью)."""
         if (self.downtime_days in (None, 0)) and self.recovery_date:
             days = (self.recovery_date - self.failure_date).days
             self.downtime_days = max(0, days)
-        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.machine.serial_number} — {self.failure_node.name} — {self.failure_date:%Y-%m-%d}"
+
+
+class MachineStats(models.Model):
+    """
+    Сводка по машине из ТО и рекламаций (денормализация для списка машин).
+    Пересчитывается по машине при сохранении/удалении ТО и рекламаций
+    и импортом; целиком — командой rebuild_machine_stats.
+    """
+    machine = models.OneToOneField(
+        "Machine",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Машина",
+    )
+    maintenance_count = models.PositiveIntegerField("Количество ТО", default=0)
+    last_maintenance_date = models.DateField("Дата последнего ТО", null=True, blank=True)
+    operating_hours = models.PositiveIntegerField("Наработка (последняя известная), м/час", default=0)
+    complaint_count = models.PositiveIntegerField("Количество рекламаций", default=0)
+    last_failure_date = models.DateField("Дата последнего отказа", null=True, blank=True)
+    downtime_days = models.PositiveIntegerField("Простой всего, дни", default=0)
+    updated_at = models.DateTimeField("Пересчитано", auto_now=True)
+
+    class Meta:
+        verbose_name = "Сводка по машине"
+        verbose_name_plural = "Сводки по машинам"
+        indexes = [
+            models.Index(fields=["last_maintenance_date"], name="silant_stats_last_to_idx"),
+            models.Index(fields=["operating_hours"], name="silant_stats_hours_idx"),
+            models.Index(fields=["complaint_count"], name="silant_stats_compl_idx"),
+            models.Index(fields=["downtime_days"], name="silant_stats_downtime_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id}: ТО {self.maintenance_count}, рекламаций {self.complaint_count}"
+
+
+class ComplaintRollup(models.Model):
+    """
+    Свёртка рекламаций для аналитики: число отказов и сумма наработки между
+    отказами по месяцу, модели машины и двигателя, узлу отказа, способу
+    восстановления, клиенту и сервисной компании машины и длительности простоя.
+    Пересчитывается помесячно (analytics.py) при изменении рекламаций и машин.
+    """
+    month = models.DateField("Месяц")
+    model_technique = models.ForeignKey(
+        Reference, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Модель техники",
+    )
+    model_engine = models.ForeignKey(
+        Reference, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Модель двигателя",
+    )
+    failure_node = models.ForeignKey(
+        Reference, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Узел отказа",
+    )
+    recovery_method = models.ForeignKey(
+        Reference, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Способ восстановления",
+    )
+    client = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        null=True, blank=True, verbose_name="Клиент",
+    )
+    service_company = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        null=True, blank=True, verbose_name="Сервисная компания",
+    )
+    downtime_days = models.PositiveIntegerField("Простой, дни")
+    failures = models.PositiveIntegerField("Отказов")
+    interval_hours = models.BigIntegerField("Наработка между отказами, м/час (сумма)")
+
+    class Meta:
+        verbose_name = "Свёртка рекламаций"
+        verbose_name_plural = "Свёртки рекламаций"
+        indexes = [
+            models.Index(fields=["month"], name="silant_rollup_month_idx"),
+            models.Index(fields=["client", "month"], name="silant_rollup_client_idx"),
+            models.Index(fields=["service_company", "month"], name="silant_rollup_svc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.failures}"
+
+
+class MaintenanceDue(models.Model):
+    """
+    Прогноз следующего ТО каждого вида по машине: по какой наработке и к какой
+    дате оно понадобится при текущей интенсивности работы (м/час в день).
+    Клиент и сервисная компания машины продублированы для фильтра по роли.
+    Считается пакетно (maintenance_due.py): сигналами по затронутым машинам,
+    импортом и периодически — командой rebuild_maintenance_due.
+    """
+    machine = models.ForeignKey(
+        "Machine", on_delete=models.CASCADE, related_name="maintenance_due", verbose_name="Машина",
+    )
+    kind = models.ForeignKey(
+        Reference, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Вид ТО",
+    )
+    client = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+", verbose_name="Клиент",
+    )
+    service_company = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+",
+        verbose_name="Сервисная компания",
+    )
+    interval_hours = models.PositiveIntegerField("Периодичность, м/час")
+    last_hours = models.PositiveIntegerField("Наработка при последнем таком ТО", null=True, blank=True)
+    last_date = models.DateField("Дата последнего такого ТО", null=True, blank=True)
+    operating_hours = models.PositiveIntegerField("Последняя известная наработка, м/час", default=0)
+    operating_hours_date = models.DateField("Дата последней известной наработки")
+    usage_rate = models.FloatField("Интенсивность, м/час в день", null=True, blank=True)
+    due_hours = models.PositiveIntegerField("ТО при наработке, м/час")
+    due_date = models.DateField("Ожидаемая дата ТО", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Прогноз ТО"
+        verbose_name_plural = "Прогнозы ТО"
+        constraints = [
+            models.UniqueConstraint(fields=["machine", "kind"], name="silant_due_machine_kind_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["due_date", "id"], name="silant_due_date_idx"),
+            models.Index(fields=["client", "due_date"], name="silant_due_client_idx"),
+            models.Index(fields=["service_company", "due_date"], name="silant_due_svc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id}/{self.kind_id}: {self.due_hours} м/час, {self.due_date}"
+
+
+class ImportLedger(models.Model):
+    """
+    Журнал импорта: отпечаток (хэш) каждой загруженной строки выгрузки.
+    При повторном импорте строки с неизменённым хэшем пропускаются.
+    """
+    sheet = models.CharField("Лист", max_length=20)  # machines | maintenance | complaints
+    key = models.CharField("Ключ строки", max_length=255)  # зав. № + естественный ключ записи
+    digest = models.CharField("Хэш содержимого", max_length=32)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Запись журнала импорта"
+        verbose_name_plural = "Журнал импорта"
+        unique_together = ("sheet", "key")
+
+    def __str__(self):
+        return f"{self.sheet}: {self.key}"
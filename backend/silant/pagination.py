@@ -0,0 +1,174 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class SizedPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация, принимающая ?page_size= не больше SILANT_MAX_PAGE_SIZE."""
+    page_size_query_param = "page_size"
+
+    @property
+    def max_page_size(self):
+        # читается на каждый запрос — работает и override_settings
+        return getattr(settings, "SILANT_MAX_PAGE_SIZE", 1000)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная пагинация с count (как SizedPageNumberPagination), а по
+    ?pagination=cursor или ?cursor= — пагинация по ключу (keyset): страница
+    выбирается условием (дата, id) < (дата, id последней строки), а не OFFSET,
+    поэтому сотая страница стоит столько же, сколько первая.
+
+    Ключ — одно из полей view.keyset_fields (в любом направлении) плюс id.
+    Курсор непрозрачный: base64 от JSON со значениями ключа; ссылки next/previous
+    сохраняют ?pagination=cursor. Страница — объекты модели или строки
+    queryset.values() (с ключом и id).
+    В режиме курсора COUNT(*) по умолчанию не считается: ?count=exact — точное
+    число, ?count=approx — оценка планировщика (PostgreSQL), на других СУБД точное.
+
+    ?page=N и сортировку по другим полям и в режиме курсора обслуживает
+    постраничная пагинация; ей в конец сортировки добавляется id.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = SizedPageNumberPagination.page_size_query_param
+    max_page_size = SizedPageNumberPagination.max_page_size
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    cursor_mode = "cursor"
+    count_query_param = "count"
+    page_query_param = "page"
+    fallback_class = SizedPageNumberPagination
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        key = self._key(queryset, request, view)
+        if key is None:
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(self._stable(queryset), request, view)
+
+        self.request = request
+        self.field, self.desc = key
+        page_size = self.get_page_size(request)
+        self.count = self._count(queryset, request.query_params.get(self.count_query_param))
+
+        values, backwards = self._decode(request)
+        sign = "-" if self.desc != backwards else ""
+        qs = queryset.order_by(f"{sign}{self.field}", f"{sign}id")
+        if values is not None:
+            op = "lt" if sign else "gt"
+            value, pk = values
+            qs = qs.filter(Q(**{f"{self.field}__{op}": value}) | Q(**{self.field: value, f"id__{op}": pk}))
+
+        rows = list(qs[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+        self.has_next = has_more if not backwards else True
+        self.has_previous = values is not None and (has_more if backwards else True)
+        self.page = rows
+        return rows
+
+    get_page_size = PageNumberPagination.get_page_size
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+    # ---- курсоры ----
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], backwards=True)
+
+    def _link(self, obj, backwards):
+        model_field = self._model._meta.get_field(self.field)
+        if isinstance(obj, dict):
+            # строка queryset.values(): ключ и id под именами колонок
+            obj = self._model(**{model_field.attname: obj[model_field.attname], "id": obj["id"]})
+        payload = {"k": [model_field.value_to_string(obj), obj.pk]}
+        if backwards:
+            payload["b"] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def _decode(self, request):
+        """(значение ключа, id) и направление из ?cursor=; (None, False) — первая страница."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            raw, pk = payload["k"]
+            model_field = self._model._meta.get_field(self.field)
+            return (model_field.to_python(raw), int(pk)), bool(payload.get("b"))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # ---- выбор режима и подсчёт ----
+
+    def _key(self, queryset, request, view):
+        """(поле, по убыванию) для keyset или None, если нужна обычная пагинация."""
+        fields = getattr(view, "keyset_fields", ())
+        params = request.query_params
+        wanted = self.cursor_query_param in params or params.get(self.mode_query_param) == self.cursor_mode
+        if not fields or not wanted or self.page_query_param in params:
+            return None
+        order = [f for f in queryset.query.order_by if f.lstrip("-") not in ("id", "pk")]
+        if len(order) != 1 or order[0].lstrip("-") not in fields:
+            return None
+        self._model = queryset.model
+        return order[0].lstrip("-"), order[0].startswith("-")
+
+    @staticmethod
+    def _stable(queryset):
+        """
+        Сортировка с id последним ключом (в направлении первого): без него строки
+        с равной датой идут в произвольном порядке и переезжают между страницами.
+        """
+        query = queryset.query
+        order = list(query.order_by) or (list(query.get_meta().ordering) if query.default_ordering else [])
+        names = [f for f in order if isinstance(f, str)]
+        if not order or any(f.lstrip("-") in ("id", "pk") for f in names):
+            return queryset
+        desc = isinstance(order[0], str) and order[0].startswith("-")
+        return queryset.order_by(*order, "-id" if desc else "id")
+
+    def _count(self, queryset, mode):
+        if mode == "exact":
+            return queryset.count()
+        if mode == "approx":
+            if connections[queryset.db].vendor == "postgresql":
+                plan = json.loads(queryset.order_by().explain(format="json"))
+                return int(plan[0]["Plan"]["Plan Rows"])
+            return queryset.count()
+        return None
@@ -1,27 +1,29 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .roles import CLIENT_GROUP, SERVICE_GROUP, group_names, has_role, is_manager
+
 class IsManager(BasePermission):
     def has_permission(self, request, view):
         u = request.user
-        return u and u.is_authenticated and (u.is_staff or u.is_superuser or u.groups.filter(name="manager").exists())
+        return bool(u and is_manager(u))
 
 class CanWriteMaintenance(BasePermission):
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS: return True
         u = request.user
         if not u.is_authenticated: return False
-        if u.is_staff or u.is_superuser or u.groups.filter(name="manager").exists(): return True
+        if is_manager(u): return True
         # service: может писать по своим; client: только по своим и только maintenance
-        return u.groups.filter(name__in=["service","client"]).exists()
+        return bool(group_names(u) & {SERVICE_GROUP, CLIENT_GROUP})
 
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS: return True
         u = request.user
-        if u.is_staff or u.is_superuser or u.groups.filter(name="manager").exists(): return True
+        if is_manager(u): return True
         m = obj.machine if hasattr(obj, "machine") else obj
-        if u.groups.filter(name="service").exists():
+        if has_role(u, SERVICE_GROUP):
             return m.client_id == u.id or m.service_company_id == u.id
-        if u.groups.filter(name="client").exists():
+        if has_role(u, CLIENT_GROUP):
             return m.client_id == u.id or m.service_company_id == u.id
         return False
 
@@ -31,5 +33,5 @@ class CanWriteComplaint(CanWriteMaintenance):
         if request.method in SAFE_METHODS: return True
         u = request.user
         if not u.is_authenticated: return False
-        if u.is_staff or u.is_superuser or u.groups.filter(name="manager").exists(): return True
-        return u.groups.filter(name="service").exists()
+        if is_manager(u): return True
+        return has_role(u, SERVICE_GROUP)
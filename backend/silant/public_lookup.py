@@ -0,0 +1,76 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import versions
+from .models import Machine
+from .serializers import MachinePublicSerializer
+
+# ---- кэш публичного поиска по зав. № ----
+# Поля 1–10 машины (MachinePublicSerializer) кэшируются по нормализованному
+# номеру при первом чтении; отсутствующие номера — тоже, но ненадолго.
+# В ключ входят счётчики изменений машин и справочников (versions), поэтому
+# любое сохранение Machine или импорт делают старые записи недостижимыми.
+
+NOT_FOUND = "-"  # маркер отрицательного кэша
+MAX_BATCH = 50
+
+
+def _timeout(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_serial(value) -> str:
+    return (value or "").strip()
+
+
+def parse_serials(raw) -> list:
+    """'a, b,,a' -> ['a', 'b']: нормализованные номера без пустых и повторов."""
+    seen = {}
+    for part in (raw or "").split(","):
+        serial = normalize_serial(part)
+        if serial:
+            seen.setdefault(serial, None)
+    return list(seen)
+
+
+def state() -> tuple:
+    """Версии данных, от которых зависит публичный ответ (для ключей кэша и ETag)."""
+    return versions.current(versions.MACHINES, versions.REFERENCES)
+
+
+def _key(data_state, serial) -> str:
+    digest = hashlib.md5(serial.encode()).hexdigest()
+    return f"silant:public:{data_state[0]}:{data_state[1]}:{digest}"
+
+
+def lookup(serials, data_state=None) -> dict:
+    """
+    {номер: поля 1–10 или None}. Попадания берутся из кэша одним get_many,
+    промахи — одним запросом к БД.
+    """
+    data_state = data_state or state()
+    keys = {serial: _key(data_state, serial) for serial in serials}
+    cached = cache.get_many(list(keys.values()))
+    result, missing = {}, []
+    for serial, key in keys.items():
+        if key in cached:
+            value = cached[key]
+            result[serial] = None if value == NOT_FOUND else value
+        else:
+            missing.append(serial)
+    if missing:
+        found = {
+            m.serial_number: MachinePublicSerializer(m).data
+            for m in Machine.objects.filter(serial_number__in=missing)
+        }
+        positive = {keys[s]: dict(data) for s, data in found.items()}
+        negative = {keys[s]: NOT_FOUND for s in missing if s not in found}
+        if positive:
+            cache.set_many(positive, _timeout("SILANT_PUBLIC_CACHE_TIMEOUT", 24 * 3600))
+        if negative:
+            cache.set_many(negative, _timeout("SILANT_PUBLIC_NEGATIVE_TIMEOUT", 60))
+        for serial in missing:
+            result[serial] = dict(found[serial]) if serial in found else None
+    return result
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Reference
+
+# ---- кэш справочников в памяти процесса ----
+# Все строки Reference загружаются одним запросом в снимок: id -> объект и
+# (entity, name) -> объект. Снимок сверяется со счётчиком версии, который
+# увеличивается сигналами post_save/post_delete (и импортом после bulk-вставки).
+# Если SILANT_REFERENCE_CACHE задаёт алиас из CACHES, счётчик хранится там,
+# и правка справочника в одном процессе сбрасывает снимки во всех остальных
+# (общий счётчик читается не чаще раза в SHARED_CHECK_INTERVAL секунд).
+# Незнакомый id (строка из другого процесса, ещё не дошедшая версия) читается
+# точечно и дописывается только в локальный снимок; промах запоминается на
+# MISS_TTL секунд, чтобы битый id не ходил в БД на каждой строке.
+
+VERSION_KEY = "silant:references:version"
+SHARED_CHECK_INTERVAL = 1.0
+MISS_TTL = 60.0
+
+_lock = threading.Lock()
+_local_version = 0
+_shared_seen = (None, 0.0)  # (версия из общего кэша, когда прочитана)
+_snapshot = None
+
+
+class Snapshot:
+    def __init__(self, version, refs):
+        self.version = version
+        self.by_id = {r.pk: r for r in refs}
+        self.by_key = {(r.entity, r.name): r for r in refs}
+        self.misses = {}  # id -> когда не нашли в БД
+        self.bundle = {}
+        for r in sorted(refs, key=lambda r: (r.entity, r.name)):
+            self.bundle.setdefault(r.entity, []).append(
+                {"id": r.pk, "name": r.name, "description": r.description}
+            )
+        body = json.dumps(self.bundle, ensure_ascii=False, sort_keys=True).encode()
+        self.etag = f'"refs-{hashlib.md5(body).hexdigest()}"'
+
+
+def _shared_cache():
+    alias = getattr(settings, "SILANT_REFERENCE_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _version():
+    global _shared_seen
+    shared = _shared_cache()
+    if shared is None:
+        return _local_version
+    seen, at = _shared_seen
+    now = time.monotonic()
+    if seen is None or now - at > SHARED_CHECK_INTERVAL:
+        seen = shared.get(VERSION_KEY)
+        if seen is None:
+            shared.add(VERSION_KEY, 0, None)
+            seen = shared.get(VERSION_KEY, 0)
+        _shared_seen = (seen, now)
+    return (seen, _local_version)
+
+
+def snapshot() -> Snapshot:
+    """Текущий снимок справочников; перечитывает БД, только если версия сменилась."""
+    global _snapshot
+    version = _version()
+    snap = _snapshot
+    if snap is None or snap.version != version:
+        with _lock:
+            snap = _snapshot
+            if snap is None or snap.version != version:
+                snap = _snapshot = Snapshot(version, list(Reference.objects.all()))
+    return snap
+
+
+def _bump():
+    global _local_version, _shared_seen, _snapshot
+    with _lock:
+        _local_version += 1
+        _shared_seen = (None, 0.0)
+        _snapshot = None
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.incr(VERSION_KEY)
+        except ValueError:
+            shared.set(VERSION_KEY, 1, None)
+
+
+def invalidate():
+    """Помечает снимок устаревшим (сейчас и после фиксации транзакции)."""
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def ref_name(pk) -> Optional[str]:
+    """Название справочника по id; неизвестный id дочитывается в локальный снимок без сброса версии."""
+    if pk is None:
+        return None
+    snap = snapshot()
+    ref = snap.by_id.get(pk)
+    if ref is None:
+        now = time.monotonic()
+        missed = snap.misses.get(pk)
+        if missed is not None and now - missed < MISS_TTL:
+            return None
+        ref = Reference.objects.filter(pk=pk).first()
+        if ref is None:
+            snap.misses[pk] = now
+            return None
+        snap.by_id[pk] = ref
+        snap.by_key.setdefault((ref.entity, ref.name), ref)
+    return ref.name
+
+
+def ref_by_name(entity: str, name: str) -> Optional[Reference]:
+    return snapshot().by_key.get((entity, name))
+
+
+def ref_choices(entity: str):
+    """choices для фильтров: [(id, name)] по алфавиту."""
+    return [(item["id"], item["name"]) for item in snapshot().bundle.get(entity, [])]
@@ -1,3 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
 CLIENT_GROUP = "client"
 SERVICE_GROUP = "service"
 MANAGER_GROUP = "manager"
+
+VALID_GROUPS = {CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP}
+
+# ---- определение ролей пользователя ----
+# Группы читаются из БД один раз и запоминаются на объекте пользователя
+# (он живёт ровно один запрос). При SILANT_ROLE_CACHE_TIMEOUT > 0 набор групп
+# дополнительно кладётся в общий кэш Django; ключ сбрасывается сигналами
+# при изменении состава групп (см. signals.py).
+
+_MEMO_ATTR = "_silant_group_names"
+
+
+def _cache_key(user_id) -> str:
+    return f"silant:roles:{user_id}"
+
+
+def _cache_timeout() -> int:
+    return getattr(settings, "SILANT_ROLE_CACHE_TIMEOUT", 0)
+
+
+def group_names(user) -> frozenset:
+    """Имена групп пользователя (не больше одного запроса на объект user)."""
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, _MEMO_ATTR, None)
+    if names is not None:
+        return names
+    timeout = _cache_timeout()
+    if timeout:
+        names = cache.get(_cache_key(user.pk))
+    if names is None:
+        names = frozenset(user.groups.values_list("name", flat=True))
+        if timeout:
+            cache.set(_cache_key(user.pk), names, timeout)
+    setattr(user, _MEMO_ATTR, names)
+    return names
+
+
+def forget_roles(*user_ids):
+    """Сбрасывает общий кэш групп для перечисленных пользователей."""
+    if user_ids and _cache_timeout():
+        cache.delete_many([_cache_key(pk) for pk in user_ids])
+
+
+def has_role(user, group_name) -> bool:
+    return group_name in group_names(user)
+
+
+def is_manager(user) -> bool:
+    """Менеджер: группа manager, staff или superuser."""
+    if not user or not user.is_authenticated:
+        return False
+    return user.is_staff or user.is_superuser or has_role(user, MANAGER_GROUP)
+
+
+def active_role(request, user):
+    """
+    Читает X-Active-Role и валидирует, что пользователь состоит в этой группе.
+    Возвращает 'manager' | 'service' | 'client' | None
+    """
+    role = (request.headers.get("X-Active-Role") or "").strip().lower()
+    if role in VALID_GROUPS and has_role(user, role):
+        return role
+    return None
@@ -0,0 +1,137 @@
+from array import array
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Machine
+from .roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP, active_role
+
+# ---- область видимости по роли ----
+# Общий для API (limited_qs_for) и HTML (RoleQuerysetMixin) разбор:
+# пользователь и активная роль -> условие фильтра без OR через JOIN и без DISTINCT.
+#   * staff, superuser, менеджер — без условия;
+#   * одна роль — равенство по индексированному полю машины (client / service_company),
+#     для ТО и рекламаций — machine_id IN (машины по этому полю);
+#   * роль не выбрана (клиент ИЛИ сервис) — IN по UNION ALL двух подзапросов,
+#     каждый идёт по своему индексу.
+# Все условия — полусоединения (IN), строки не размножаются, DISTINCT не нужен.
+#
+# Для ТО и рекламаций вместо подзапроса к машинам берётся готовый набор id машин
+# пользователя («парк» по полям роли): отсортированный array('q') в общем кэше
+# Django, на запрос — не больше одного чтения кэша. Тогда условие — machine_id IN
+# (список) без обращения к таблице машин. Набор сбрасывается сигналами при смене
+# клиента или сервиса машины (и импортом машин); при SILANT_FLEET_CACHE_TIMEOUT = 0
+# или слишком большом парке остаётся подзапрос.
+
+ROLE_FIELDS = {
+    CLIENT_GROUP: ("client",),
+    SERVICE_GROUP: ("service_company",),
+}
+ANY_ROLE_FIELDS = ("client", "service_company")
+FLEET_KEYS = (("client",), ("service_company",), ANY_ROLE_FIELDS)
+# больше id в IN (...) не подставляем: сборка длинного SQL обходится дороже подзапроса
+FLEET_MAX_IDS = 1000
+
+_MEMO_ATTR = "_silant_fleets"
+
+
+def scope_fields(user, request):
+    """Поля машины, по которым видит пользователь: None — видно всё, () — ничего."""
+    if not user.is_authenticated:
+        return ()
+    if user.is_staff or user.is_superuser:
+        return None
+    active = active_role(request, user)
+    if active == MANAGER_GROUP:
+        return None
+    if not active:
+        return ANY_ROLE_FIELDS
+    return ROLE_FIELDS.get(active, ())
+
+
+def _ids(model, fields, user):
+    """Подзапрос pk строк model, где любое из fields равно user (UNION ALL по полям)."""
+    arms = [model._default_manager.filter(**{field: user}).order_by().values("pk") for field in fields]
+    return arms[0].union(*arms[1:], all=True) if len(arms) > 1 else arms[0]
+
+
+# ---- парк пользователя (набор id машин) ----
+
+def _fleet_key(user_id, fields) -> str:
+    return f"silant:fleet:{user_id}:{'+'.join(fields)}"
+
+
+def _fleet_timeout() -> int:
+    return getattr(settings, "SILANT_FLEET_CACHE_TIMEOUT", 0)
+
+
+def fleet(user, fields):
+    """
+    Отсортированный array('q') id машин, где пользователь — одно из fields;
+    None, если кэш парков выключен или машин больше FLEET_MAX_IDS.
+    """
+    timeout = _fleet_timeout()
+    if not timeout:
+        return None
+    memo = user.__dict__.setdefault(_MEMO_ATTR, {})
+    if fields in memo:
+        return memo[fields]
+    key = _fleet_key(user.pk, fields)
+    packed = cache.get(key)
+    if packed is None:
+        ids = sorted(set(_ids(Machine, fields, user).values_list("pk", flat=True)))
+        # False — «парк слишком велик»: запоминаем, чтобы не пересчитывать на каждом запросе
+        packed = array("q", ids).tobytes() if len(ids) <= FLEET_MAX_IDS else False
+        cache.set(key, packed, timeout)
+    ids = array("q", packed) if packed is not False else None
+    memo[fields] = ids
+    return ids
+
+
+def _forget(user_ids):
+    cache.delete_many([_fleet_key(pk, fields) for pk in user_ids for fields in FLEET_KEYS])
+
+
+def forget_fleets(*user_ids):
+    """Сбрасывает парки пользователей — сейчас и после фиксации транзакции."""
+    ids = {pk for pk in user_ids if pk is not None}
+    if ids and _fleet_timeout():
+        _forget(ids)
+        transaction.on_commit(lambda: _forget(ids))
+
+
+def forget_all_fleets():
+    """Сброс парков всех пользователей (после bulk-записи машин импортом)."""
+    forget_fleets(*User.objects.values_list("pk", flat=True))
+
+
+def condition(user, request, model, via=None) -> Q:
+    """
+    Условие видимости для queryset модели model. via — FK на машину ("machine"
+    для ТО и рекламаций); None — у модели свои поля client / service_company
+    (Machine, ComplaintRollup, MaintenanceDue).
+    """
+    fields = scope_fields(user, request)
+    if fields is None:
+        return Q()
+    if not fields:
+        return Q(pk__in=[])
+    if via is not None:
+        ids = fleet(user, fields)
+        return Q(**{f"{via}_id__in": ids if ids is not None else _ids(Machine, fields, user)})
+    if len(fields) == 1:
+        return Q(**{fields[0]: user})
+    return Q(pk__in=_ids(model, fields, user))
+
+
+def restrict(queryset, user, request, via=None):
+    """queryset, ограниченный видимостью пользователя (см. condition)."""
+    fields = scope_fields(user, request)
+    if fields is None:
+        return queryset
+    if not fields:
+        return queryset.none()
+    return queryset.filter(condition(user, request, queryset.model, via))
@@ -0,0 +1,203 @@
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Machine
+
+# ---- поиск машин по зав. № и текстовым полям ----
+# Подстрочный поиск (icontains) по серийному номеру, договору, грузополучателю
+# и адресу без полного просмотра таблицы:
+#   * SQLite — FTS5-таблица silant_machine_search с триграммным токенизатором
+#     (external content над silant_machine, синхронизируется триггерами,
+#     поэтому bulk-запись импорта тоже попадает в индекс);
+#   * PostgreSQL — GIN-индексы gin_trgm_ops по UPPER(поле), их использует
+#     обычный icontains Django;
+#   * иначе (или если FTS5 недоступен) — просто icontains.
+# Слова короче трёх символов триграммный индекс не ищет — для них icontains
+# по уже отобранным индексом строкам.
+# Ранжирование: точное совпадение зав. № → начало зав. № → остальное;
+# внутри группы — bm25 (SQLite) или триграммная похожесть зав. № (PostgreSQL).
+
+FIELDS = ("serial_number", "contract_number", "consignee", "delivery_address")
+FTS_TABLE = "silant_machine_search"
+# веса колонок для bm25 в порядке FIELDS
+FTS_WEIGHTS = (10.0, 2.0, 1.0, 1.0)
+MIN_NGRAM = 3
+MAX_TERMS = 8
+
+SEARCH_PARAM = "search"
+
+_fts_ready = {}
+
+
+def backend(using: str = "default") -> str:
+    """'fts5' | 'trigram' | 'like' — чем обслуживается поиск в этой БД."""
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        return "trigram"
+    if connection.vendor == "sqlite":
+        if using not in _fts_ready:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                _fts_ready[using] = cursor.fetchone() is not None
+        if _fts_ready[using]:
+            return "fts5"
+    return "like"
+
+
+def _trigger_sql():
+    cols = ", ".join(FIELDS)
+    new = ", ".join(f"new.{c}" for c in FIELDS)
+    old = ", ".join(f"old.{c}" for c in FIELDS)
+    delete = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new});"
+    return {
+        f"{FTS_TABLE}_ai": f"AFTER INSERT ON silant_machine BEGIN {insert} END",
+        f"{FTS_TABLE}_ad": f"AFTER DELETE ON silant_machine BEGIN {delete} END",
+        f"{FTS_TABLE}_au": f"AFTER UPDATE ON silant_machine BEGIN {delete} {insert} END",
+    }
+
+
+def ensure_index(using="default", **kwargs):
+    """
+    post_migrate: SQLite пересоздаёт таблицу при изменении её полей
+    и теряет триггеры — восстанавливаем их и перестраиваем индекс.
+    """
+    _fts_ready.clear()
+    connection = connections[using]
+    if backend(using) != "fts5":
+        return
+    triggers = _trigger_sql()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'silant_machine'")
+        present = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in triggers if name not in present]
+        for name in missing:
+            cursor.execute(f"CREATE TRIGGER {name} {triggers[name]}")
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def terms(text) -> list:
+    """Слова запроса без повторов, не больше MAX_TERMS."""
+    words = {}
+    for word in (text or "").split():
+        words.setdefault(word.casefold(), word)
+    return list(words.values())[:MAX_TERMS]
+
+
+def _fts_query(words, columns) -> str:
+    """Строка MATCH: каждое слово — фраза в кавычках, слова через AND."""
+    scope = "" if tuple(columns) == FIELDS else "{%s} : " % " ".join(columns)
+    return " AND ".join(scope + '"%s"' % w.replace('"', '""') for w in words)
+
+
+def _like(words, prefix, columns) -> Q:
+    return reduce(and_, (
+        reduce(or_, (Q(**{f"{prefix}{col}__icontains": w}) for col in columns))
+        for w in words
+    ))
+
+
+def match(text, prefix: str = "", columns=FIELDS, using: str = "default") -> Q:
+    """
+    Условие «все слова запроса встречаются в columns машины».
+    prefix — путь к машине от модели запроса ("" или "machine__").
+    """
+    words = terms(text)
+    if not words:
+        return Q()
+    if backend(using) != "fts5":
+        return _like(words, prefix, columns)
+    long_words = [w for w in words if len(w) >= MIN_NGRAM]
+    short_words = [w for w in words if len(w) < MIN_NGRAM]
+    cond = Q()
+    if long_words:
+        ids = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts_query(long_words, columns)],
+        )
+        cond &= Q(**{f"{prefix}pk__in": ids})
+    if short_words:
+        cond &= _like(short_words, prefix, columns)
+    return cond
+
+
+def matching(queryset, text, prefix: str = "", columns=FIELDS):
+    """queryset, отфильтрованный по поисковой строке."""
+    return queryset.filter(match(text, prefix, columns, queryset.db))
+
+
+def rank(queryset, text, prefix: str = ""):
+    """
+    Добавляет search_rank (0 — точный зав. №, 1 — начало, 2 — прочее) и
+    search_score (меньше — лучше) и сортирует по ним перед прежней сортировкой.
+    """
+    words = terms(text)
+    if not words:
+        return queryset
+    order = queryset.query.order_by
+    serial = f"{prefix}serial_number"
+    whole = " ".join(words)
+    queryset = _with_score(queryset, words, prefix).annotate(search_rank=Case(
+        When(**{f"{serial}__iexact": whole}, then=Value(0)),
+        When(**{f"{serial}__istartswith": whole}, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    ))
+    return queryset.order_by("search_rank", "search_score", *order)
+
+
+def _with_score(queryset, words, prefix):
+    kind = backend(queryset.db)
+    long_words = [w for w in words if len(w) >= MIN_NGRAM]
+    if kind == "fts5" and long_words:
+        # соединение с FTS-таблицей: bm25 считается за один проход, а не подзапросом на строку
+        model = queryset.model
+        column = "id" if model is Machine else model._meta.get_field(prefix.rstrip("_")).column
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{model._meta.db_table}"."{column}"', f"{FTS_TABLE} MATCH %s"],
+            params=[_fts_query(long_words, FIELDS)],
+            select={"search_score": f"bm25({FTS_TABLE}, {weights})"},
+        )
+    if kind == "trigram":
+        from django.contrib.postgres.search import TrigramSimilarity
+        score = TrigramSimilarity(f"{prefix}serial_number", " ".join(words)) * Value(-1.0)
+    else:
+        score = Value(0.0, output_field=FloatField())
+    return queryset.annotate(search_score=score)
+
+
+class IndexedSearchFilter(BaseFilterBackend):
+    """
+    ?search=<строка> по машине (зав. №, договор, грузополучатель, адрес).
+    view.search_machine_prefix — путь к машине ("" для самих машин).
+    Без явного ?ordering= результат упорядочен по релевантности.
+    Ставится после OrderingFilter, чтобы релевантность шла первой.
+    """
+    search_param = SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "")
+        if not terms(text):
+            return queryset
+        prefix = getattr(view, "search_machine_prefix", "")
+        queryset = matching(queryset, text, prefix)
+        if "ordering" in request.query_params:
+            return queryset
+        return rank(queryset, text, prefix)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            "name": self.search_param,
+            "required": False,
+            "in": "query",
+            "description": "Поиск по зав. №, договору, грузополучателю и адресу машины",
+            "schema": {"type": "string"},
+        }]
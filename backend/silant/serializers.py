@@ -1,6 +1,77 @@
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Machine, Maintenance, Complaint, Reference
+from .models import Machine, Maintenance, MaintenanceDue, Complaint, Reference
+from .machine_stats import value as stat_value
+from .refcache import ref_name, snapshot as ref_snapshot
+
+
+class RefNameField(serializers.ReadOnlyField):
+    """Название справочника по id из кэша в памяти — без JOIN к Reference."""
+    def to_representation(self, value):
+        return ref_name(value)
+
+
+class MachineStatField(serializers.ReadOnlyField):
+    """
+    Поле сводки по машине (MachineStats): в списке — аннотация queryset
+    (по её имени работает ?ordering=), у только что сохранённой машины — machine.stats.
+    """
+    def get_attribute(self, machine):
+        return stat_value(machine, self.field_name)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при пакетной записи берёт объект из словаря,
+    заранее загруженного BulkListSerializer; иначе — обычный запрос к БД.
+    """
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        try:
+            obj = self.prefetched.get(self.get_queryset().model._meta.pk.to_python(data))
+        except (TypeError, ValueError, DjangoValidationError):
+            obj = None
+        return obj if obj is not None else super().to_internal_value(data)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Проверка пачки записей для .../bulk/: связанные объекты загружаются заранее
+    (по запросу на поле, справочники — из refcache), ошибки — по каждой записи,
+    неверная запись не мешает остальным.
+    """
+    def prefetch(self, items):
+        for name, field in self.child.fields.items():
+            if not isinstance(field, PrefetchedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            model = field.get_queryset().model
+            if model is Reference:
+                field.prefetched = ref_snapshot().by_id
+                continue
+            pks = set()
+            for item in items:
+                try:
+                    pks.add(model._meta.pk.to_python(item.get(name)))
+                except (AttributeError, TypeError, ValueError, DjangoValidationError):
+                    pass
+            pks.discard(None)
+            field.prefetched = field.get_queryset().in_bulk(pks)
+
+    def validate_items(self, items) -> list:
+        """[(validated_data, None) | (None, errors)] в порядке items."""
+        self.prefetch(items)
+        results = []
+        for item in items:
+            try:
+                results.append((self.child.run_validation(item), None))
+            except serializers.ValidationError as exc:
+                results.append((None, exc.detail))
+        return results
 
 
 class UserSlimSerializer(serializers.ModelSerializer):
@@ -16,11 +87,17 @@ class ReferenceSerializer(serializers.ModelSerializer):
 class MachineSerializer(serializers.ModelSerializer):
     client = UserSlimSerializer(read_only=True)
     service_company = UserSlimSerializer(read_only=True)
-    model_technique_name   = serializers.CharField(source="model_technique.name", read_only=True)
-    model_engine_name      = serializers.CharField(source="model_engine.name", read_only=True)
-    model_transmission_name= serializers.CharField(source="model_transmission.name", read_only=True)
-    model_steer_bridge_name= serializers.CharField(source="model_steer_bridge.name", read_only=True)
-    model_drive_bridge_name= serializers.CharField(source="model_drive_bridge.name", read_only=True)
+    model_technique_name   = RefNameField(source="model_technique_id")
+    model_engine_name      = RefNameField(source="model_engine_id")
+    model_transmission_name= RefNameField(source="model_transmission_id")
+    model_steer_bridge_name= RefNameField(source="model_steer_bridge_id")
+    model_drive_bridge_name= RefNameField(source="model_drive_bridge_id")
+    maintenance_count      = MachineStatField()
+    last_maintenance_date  = MachineStatField()
+    current_operating_hours= MachineStatField()
+    complaint_count        = MachineStatField()
+    last_failure_date      = MachineStatField()
+    total_downtime_days    = MachineStatField()
 
     class Meta:
         model = Machine
@@ -31,14 +108,16 @@ class MachineSerializer(serializers.ModelSerializer):
             "serial_engine","serial_transmission","serial_drive_bridge","serial_steer_bridge",
             "contract_number","shipment_date","consignee","delivery_address","equipment",
             "client","service_company",
+            "maintenance_count","last_maintenance_date","current_operating_hours",
+            "complaint_count","last_failure_date","total_downtime_days",
         ]
 
 class MachinePublicSerializer(serializers.ModelSerializer):
-    model_technique_name   = serializers.CharField(source="model_technique.name", read_only=True)
-    model_engine_name      = serializers.CharField(source="model_engine.name", read_only=True)
-    model_transmission_name= serializers.CharField(source="model_transmission.name", read_only=True)
-    model_steer_bridge_name= serializers.CharField(source="model_steer_bridge.name", read_only=True)
-    model_drive_bridge_name= serializers.CharField(source="model_drive_bridge.name", read_only=True)
+    model_technique_name   = RefNameField(source="model_technique_id")
+    model_engine_name      = RefNameField(source="model_engine_id")
+    model_transmission_name= RefNameField(source="model_transmission_id")
+    model_steer_bridge_name= RefNameField(source="model_steer_bridge_id")
+    model_drive_bridge_name= RefNameField(source="model_drive_bridge_id")
 
     class Meta:
         model = Machine
@@ -51,29 +130,57 @@ class MachinePublicSerializer(serializers.ModelSerializer):
         ]
 
 class MaintenanceSerializer(serializers.ModelSerializer):
-    kind_name = serializers.CharField(source="kind.name", read_only=True)
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    kind_name = RefNameField(source="kind_id")
     machine_serial = serializers.CharField(source="machine.serial_number", read_only=True)
     service_company = UserSlimSerializer(read_only=True)
-    organization_name = serializers.CharField(source="organization.name", read_only=True)
+    organization_name = RefNameField(source="organization_id")
 
     class Meta:
         model = Maintenance
+        list_serializer_class = BulkListSerializer
         fields = [
             "id","machine","machine_serial","kind","kind_name","performed_date","operating_hours",
             "work_order_number","work_order_date","organization", "organization_name", "service_company",
         ]
 
 class ComplaintSerializer(serializers.ModelSerializer):
-    failure_node_name = serializers.CharField(source="failure_node.name", read_only=True)
-    recovery_method_name = serializers.CharField(source="recovery_method.name", read_only=True)
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    failure_node_name = RefNameField(source="failure_node_id")
+    recovery_method_name = RefNameField(source="recovery_method_id")
     machine_serial = serializers.CharField(source="machine.serial_number", read_only=True)
     service_company = UserSlimSerializer(read_only=True)
     
     class Meta:
         model = Complaint
+        list_serializer_class = BulkListSerializer
         fields = [
             "id","machine","machine_serial","failure_date","operating_hours",
             "failure_node","failure_node_name","failure_description",
             "recovery_method","recovery_method_name","parts_used","recovery_date",
             "downtime_days","service_company",
         ]
+
+class MaintenanceDueSerializer(serializers.ModelSerializer):
+    kind_name = RefNameField(source="kind_id")
+    machine_serial = serializers.CharField(source="machine.serial_number", read_only=True)
+    estimated_hours = serializers.SerializerMethodField()
+    days_left = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MaintenanceDue
+        fields = [
+            "machine","machine_serial","kind","kind_name","interval_hours",
+            "last_hours","last_date","operating_hours","operating_hours_date","usage_rate",
+            "estimated_hours","due_hours","due_date","days_left",
+        ]
+
+    def get_estimated_hours(self, obj):
+        # наработка на сегодня при той же интенсивности
+        if obj.usage_rate is None:
+            return obj.operating_hours
+        days = (timezone.localdate() - obj.operating_hours_date).days
+        return obj.operating_hours + max(0, round(obj.usage_rate * days))
+
+    def get_days_left(self, obj):
+        return None if obj.due_date is None else (obj.due_date - timezone.localdate()).days
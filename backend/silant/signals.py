@@ -1,10 +1,13 @@
-from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.models import Group, Permission, User
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from django.db.models.signals import post_migrate
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .roles import CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP
+from . import analytics, fulltext, machine_stats, maintenance_due, scope, versions
+from .directory import forget_service_companies
+from .refcache import invalidate as invalidate_references
+from .roles import CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP, forget_roles
 from .models import Machine, Maintenance, Complaint, Reference
 
 
@@ -46,3 +49,169 @@ def ensure_groups_and_perms(**kwargs):
 @receiver(post_migrate, dispatch_uid="silant_ensure_groups_and_perms")
 def _ensure_groups_and_perms_receiver(**kwargs):
     ensure_groups_and_perms(**kwargs)
+
+
+# ---- сброс кэша ролей (и справочника сервисных компаний) при изменении состава групп ----
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid="silant_forget_roles_on_groups_change")
+def _forget_roles_on_groups_change(instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    forget_service_companies()
+    versions.bump(versions.USERS)
+    if not reverse:
+        # user.groups.add(...) — изменился один пользователь
+        forget_roles(instance.pk)
+    elif action == "pre_clear":
+        # group.user_set.clear() — pk_set в post_clear пуст, собираем заранее
+        forget_roles(*instance.user_set.values_list("pk", flat=True))
+    elif pk_set:
+        forget_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group, dispatch_uid="silant_forget_roles_on_group_save")
+@receiver(pre_delete, sender=Group, dispatch_uid="silant_forget_roles_on_group_delete")
+def _forget_roles_on_group_change(instance, **kwargs):
+    # переименование или удаление группы меняет роли всех её участников
+    forget_roles(*instance.user_set.values_list("pk", flat=True))
+    forget_service_companies()
+    versions.bump(versions.USERS)
+
+
+# ---- сброс справочника сервисных компаний ----
+@receiver(post_save, sender=User, dispatch_uid="silant_forget_service_companies_on_user_save")
+@receiver(post_delete, sender=User, dispatch_uid="silant_forget_service_companies_on_user_delete")
+def _forget_service_companies_on_user_change(update_fields=None, **kwargs):
+    # вход в систему сохраняет только last_login — список от этого не меняется
+    if update_fields and not {"first_name", "username"} & set(update_fields):
+        return
+    forget_service_companies()
+    versions.bump(versions.USERS)
+
+
+# ---- сброс кэша справочников ----
+@receiver(post_save, sender=Reference, dispatch_uid="silant_invalidate_references_on_save")
+@receiver(post_delete, sender=Reference, dispatch_uid="silant_invalidate_references_on_delete")
+def _invalidate_references(**kwargs):
+    invalidate_references()
+
+
+# ---- счётчики изменений для ETag ----
+VERSIONED = {
+    Machine: versions.MACHINES,
+    Maintenance: versions.MAINTENANCE,
+    Complaint: versions.COMPLAINTS,
+    Reference: versions.REFERENCES,
+}
+
+
+def _bump_version(sender, **kwargs):
+    versions.bump(VERSIONED[sender])
+
+
+for _model in VERSIONED:
+    post_save.connect(_bump_version, sender=_model, dispatch_uid=f"silant_bump_version_save_{_model.__name__}")
+    post_delete.connect(_bump_version, sender=_model, dispatch_uid=f"silant_bump_version_delete_{_model.__name__}")
+
+
+# ---- полнотекстовый индекс рекламаций (SQLite FTS5) ----
+@receiver(post_save, sender=Complaint, dispatch_uid="silant_fulltext_index_complaint")
+def _index_complaint(instance, using, **kwargs):
+    fulltext.index_complaints([instance], using)
+
+
+@receiver(post_delete, sender=Complaint, dispatch_uid="silant_fulltext_unindex_complaint")
+def _unindex_complaint(instance, using, **kwargs):
+    fulltext.unindex_complaints([instance.pk], using)
+
+
+# ---- сводка по машине (MachineStats) ----
+@receiver(post_save, sender=Machine, dispatch_uid="silant_machine_stats_new_machine")
+def _create_machine_stats(instance, created, raw, using, **kwargs):
+    if created and not raw:
+        machine_stats.refresh_on_commit([instance.pk], using)
+
+
+PREVIOUS_FIELDS = {
+    Machine: ("client_id", "service_company_id"),
+    Maintenance: ("machine_id",),
+    Complaint: ("machine_id", "failure_date"),
+}
+
+
+@receiver(pre_save, sender=Machine, dispatch_uid="silant_remember_previous_machine")
+@receiver(pre_save, sender=Maintenance, dispatch_uid="silant_remember_previous_maintenance")
+@receiver(pre_save, sender=Complaint, dispatch_uid="silant_remember_previous_complaint")
+def _remember_previous(sender, instance, raw, using, **kwargs):
+    # при переносе записи на другую машину (или дату, или машины к другому владельцу)
+    # пересчитать нужно и старое место
+    if instance.pk and not raw:
+        fields = PREVIOUS_FIELDS[sender]
+        instance._silant_previous = sender.objects.using(using).filter(pk=instance.pk).values(*fields).first()
+
+
+def _previous(instance) -> dict:
+    return getattr(instance, "_silant_previous", None) or {}
+
+
+@receiver(post_save, sender=Maintenance, dispatch_uid="silant_machine_stats_maintenance_save")
+@receiver(post_save, sender=Complaint, dispatch_uid="silant_machine_stats_complaint_save")
+@receiver(post_delete, sender=Maintenance, dispatch_uid="silant_machine_stats_maintenance_delete")
+@receiver(post_delete, sender=Complaint, dispatch_uid="silant_machine_stats_complaint_delete")
+def _refresh_machine_stats(instance, using, **kwargs):
+    if kwargs.get("raw"):
+        return
+    machine_stats.refresh_on_commit([instance.machine_id, _previous(instance).get("machine_id")], using)
+
+
+# ---- свёртка рекламаций для аналитики ----
+@receiver(post_save, sender=Complaint, dispatch_uid="silant_analytics_complaint_save")
+@receiver(post_delete, sender=Complaint, dispatch_uid="silant_analytics_complaint_delete")
+def _refresh_rollup(instance, using, **kwargs):
+    if kwargs.get("raw"):
+        return
+    previous = _previous(instance)
+    analytics.refresh_changes_on_commit([
+        (instance.machine_id, instance.failure_date),
+        (previous.get("machine_id"), previous.get("failure_date")),
+    ], using)
+
+
+@receiver(post_save, sender=Machine, dispatch_uid="silant_analytics_machine_save")
+def _refresh_rollup_for_machine(instance, created, raw, using, **kwargs):
+    # модель, клиент и сервис машины — измерения свёртки
+    if not created and not raw:
+        analytics.refresh_machines_on_commit([instance.pk], using)
+
+
+# ---- прогноз ТО ----
+@receiver(post_save, sender=Maintenance, dispatch_uid="silant_maintenance_due_maintenance_save")
+@receiver(post_save, sender=Complaint, dispatch_uid="silant_maintenance_due_complaint_save")
+@receiver(post_delete, sender=Maintenance, dispatch_uid="silant_maintenance_due_maintenance_delete")
+@receiver(post_delete, sender=Complaint, dispatch_uid="silant_maintenance_due_complaint_delete")
+def _refresh_maintenance_due(instance, using, **kwargs):
+    # рекламации тоже дают показание наработки
+    if kwargs.get("raw"):
+        return
+    maintenance_due.refresh_on_commit([instance.machine_id, _previous(instance).get("machine_id")], using)
+
+
+@receiver(post_save, sender=Machine, dispatch_uid="silant_maintenance_due_machine_save")
+def _refresh_maintenance_due_for_machine(instance, raw, using, **kwargs):
+    # дата отгрузки, клиент и сервис машины входят в прогноз
+    if not raw:
+        maintenance_due.refresh_on_commit([instance.pk], using)
+
+
+# ---- парки пользователей (scope.fleet) ----
+@receiver(post_save, sender=Machine, dispatch_uid="silant_forget_fleets_machine_save")
+def _forget_fleets_on_machine_save(instance, created, **kwargs):
+    owners = {instance.client_id, instance.service_company_id}
+    previous = _previous(instance)
+    was = {previous.get("client_id"), previous.get("service_company_id")} if previous else set()
+    if created or owners != was:
+        scope.forget_fleets(*(owners | was))
+
+
+@receiver(post_delete, sender=Machine, dispatch_uid="silant_forget_fleets_machine_delete")
+def _forget_fleets_on_machine_delete(instance, **kwargs):
+    scope.forget_fleets(instance.client_id, instance.service_company_id)
@@ -0,0 +1,126 @@
+import re
+from functools import lru_cache
+
+# ---- стеммер для русского языка ----
+# Алгоритм Snowball (Портер) для русского: отрезает окончания и суффиксы,
+# чтобы «гидронасоса», «гидронасосом» и «гидронасосы» давали одну основу.
+# Латиница и числа (номера деталей) не меняются, только приводятся к нижнему регистру.
+
+VOWELS = "аеиоуыэюя"
+
+PERFECTIVE_GERUND = (("в", "вши", "вшись"), ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"))
+ADJECTIVE = ("ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+             "ом", "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею")
+PARTICIPLE = (("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+REFLEXIVE = ("ся", "сь")
+VERB = (("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны",
+         "ть", "ешь", "нно"),
+        ("ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им",
+         "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть",
+         "ишь", "ую", "ю"))
+NOUN = ("а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей",
+        "ой", "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы",
+        "ь", "ию", "ью", "ю", "ия", "ья", "я")
+SUPERLATIVE = ("ейше", "ейш")
+DERIVATIONAL = ("ость", "ост")
+
+WORD_RE = re.compile(r"[^\W_]+")
+CYRILLIC_RE = re.compile(r"^[а-я]+$")
+
+
+def _regions(word):
+    """(RV, R2) — индексы начала областей, в которых можно отрезать окончания."""
+    rv = r1 = r2 = len(word)
+    for i, ch in enumerate(word):
+        if ch in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _longest(word, suffixes):
+    found = ""
+    for s in suffixes:
+        if len(s) > len(found) and word.endswith(s):
+            found = s
+    return found
+
+
+def _cut(word, start, groups):
+    """
+    Отрезает самое длинное окончание из groups = (после «а/я», обычные),
+    если оно целиком в области start. Возвращает новое слово или None.
+    """
+    if isinstance(groups[0], str):
+        groups = ((), groups)
+    after_a, plain = groups
+    suffix = _longest(word, after_a + plain)
+    if not suffix or len(word) - len(suffix) < start:
+        return None
+    stem = word[:-len(suffix)]
+    if suffix in plain:
+        return stem
+    if stem[-1:] in ("а", "я") and len(stem) - 1 >= start:
+        return stem
+    return None
+
+
+@lru_cache(maxsize=50000)
+def stem(word: str) -> str:
+    word = word.lower().replace("ё", "е")
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv, r2 = _regions(word)
+
+    # шаг 1
+    cut = _cut(word, rv, PERFECTIVE_GERUND)
+    if cut is not None:
+        word = cut
+    else:
+        word = _cut(word, rv, REFLEXIVE) or word
+        cut = _cut(word, rv, ADJECTIVE)
+        if cut is not None:
+            word = _cut(cut, rv, PARTICIPLE) or cut
+        else:
+            cut = _cut(word, rv, VERB)
+            if cut is None:
+                cut = _cut(word, rv, NOUN)
+            if cut is not None:
+                word = cut
+
+    # шаг 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # шаг 3
+    cut = _cut(word, r2, DERIVATIONAL)
+    if cut is not None:
+        word = cut
+
+    # шаг 4
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        cut = _cut(word, rv, SUPERLATIVE)
+        if cut is not None:
+            word = cut[:-1] if cut.endswith("нн") else cut
+        elif word.endswith("ь") and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def words(text: str) -> list:
+    """Слова текста в исходном виде (буквы и цифры)."""
+    return WORD_RE.findall(text or "")
+
+
+def stems(text: str) -> list:
+    return [stem(w) for w in words(text)]
@@ -0,0 +1,77 @@
+import datetime
+
+from django.contrib.auth.models import Group, User
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from silant import refcache
+from silant.models import Complaint, Machine, Maintenance, Reference
+
+# ---- общие фабрики тестов ----
+
+MODEL_ENTITIES = {
+    "model_technique": "Модель техники",
+    "model_engine": "Модель двигателя",
+    "model_transmission": "Модель трансмиссии",
+    "model_drive_bridge": "Модель ведущего моста",
+    "model_steer_bridge": "Модель управляемого моста",
+}
+TO_1 = "ТО-1 (200 м/час)"
+
+
+def make_user(username, *groups, **fields) -> User:
+    user = User.objects.create_user(username=username, password="pass", **fields)
+    for name in groups:
+        user.groups.add(Group.objects.get_or_create(name=name)[0])
+    return user
+
+
+def make_ref(entity, name) -> Reference:
+    return Reference.objects.get_or_create(entity=entity, name=name)[0]
+
+
+def make_machine(serial, client, service, shipment_date=datetime.date(2023, 1, 10), model="ПД1,5", **fields):
+    refs = {key: make_ref(entity, model) for key, entity in MODEL_ENTITIES.items()}
+    return Machine.objects.create(
+        serial_number=serial, client=client, service_company=service, shipment_date=shipment_date,
+        **refs, **fields,
+    )
+
+
+def make_maintenance(machine, performed_date, operating_hours=0, kind=TO_1, **fields) -> Maintenance:
+    fields.setdefault("organization", make_ref("Организация ТО", "самостоятельно"))
+    fields.setdefault("service_company", machine.service_company)
+    return Maintenance.objects.create(
+        machine=machine, performed_date=performed_date, operating_hours=operating_hours,
+        kind=make_ref("Вид ТО", kind), **fields,
+    )
+
+
+def make_complaint(machine, failure_date, operating_hours=0, node="Двигатель", method="Ремонт узла",
+                   **fields) -> Complaint:
+    fields.setdefault("service_company", machine.service_company)
+    return Complaint.objects.create(
+        machine=machine, failure_date=failure_date, operating_hours=operating_hours,
+        failure_node=make_ref("Узел отказа", node), recovery_method=make_ref("Способ восстановления", method),
+        **fields,
+    )
+
+
+class SilantTestCase(TestCase):
+    """Перед каждым тестом сбрасываются кэши Django и снимок справочников (они живут вне транзакции теста)."""
+
+    def setUp(self):
+        super().setUp()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        refcache.invalidate()
+
+    def api(self, user=None, role=None) -> APIClient:
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        if role:
+            client.credentials(HTTP_X_ACTIVE_ROLE=role)
+        return client
@@ -0,0 +1,88 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+
+from silant.models import ComplaintRollup
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_complaint, make_machine, make_user
+
+D = datetime.date
+ROLLUP_FIELDS = (
+    "month", "model_technique_id", "model_engine_id", "failure_node_id", "recovery_method_id",
+    "client_id", "service_company_id", "downtime_days", "failures", "interval_hours",
+)
+
+
+def rollup() -> list:
+    return sorted(ComplaintRollup.objects.values_list(*ROLLUP_FIELDS), key=repr)
+
+
+class AnalyticsTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_a, self.client_b = make_user("a", CLIENT_GROUP), make_user("b", CLIENT_GROUP)
+        service = make_user("svc", SERVICE_GROUP, first_name="Сервис")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = make_machine("0001", self.client_a, service, model="ПД1,5")
+            self.second = make_machine("0002", self.client_b, service, model="ПД2")
+            self.claims = [
+                make_complaint(self.first, D(2023, 1, 10), 100, downtime_days=2),
+                make_complaint(self.first, D(2023, 3, 5), 250, downtime_days=4),
+                make_complaint(self.first, D(2023, 3, 20), 400, downtime_days=10, method="Замена узла"),
+                make_complaint(self.second, D(2023, 2, 1), 50, downtime_days=1),
+            ]
+        self.manager = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+
+    def get(self, url, api=None, **params):
+        response = (api or self.manager).get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_total(self):
+        total = self.get("/api/analytics/")["total"]
+        self.assertEqual(total["failures"], 4)
+        self.assertEqual(total["mtbf_hours"], 112.5)  # (100 + 150 + 150 + 50) / 4
+        self.assertEqual((total["downtime_total"], total["downtime_mean"]), (17, 4.25))
+        self.assertEqual((total["downtime_p50"], total["downtime_p90"], total["downtime_p95"]), (2.0, 10.0, 10.0))
+        self.assertEqual([(m["name"], m["failures"], m["share"]) for m in total["recovery_mix"]],
+                         [("Ремонт узла", 3, 0.75), ("Замена узла", 1, 0.25)])
+
+    def test_dimensions(self):
+        rows = self.get("/api/analytics/model/")
+        self.assertEqual([(r["name"], r["failures"], r["mtbf_hours"]) for r in rows],
+                         [("ПД1,5", 3, 133.3), ("ПД2", 1, 50.0)])
+        rows = self.get("/api/analytics/month/")
+        self.assertEqual([(r["key"], r["name"], r["failures"]) for r in rows],
+                         [("2023-01-01", "2023-01", 1), ("2023-02-01", "2023-02", 1), ("2023-03-01", "2023-03", 2)])
+        rows = self.get("/api/analytics/service-company/")
+        self.assertEqual([(r["name"], r["failures"]) for r in rows], [("Сервис", 4)])
+
+    def test_scope_and_filters(self):
+        total = self.get("/api/analytics/", self.api(self.client_b, role=CLIENT_GROUP))["total"]
+        self.assertEqual((total["failures"], total["mtbf_hours"]), (1, 50.0))
+        self.assertEqual(self.get("/api/analytics/", date_from="2023-02", date_to="2023-02-15")["total"]["failures"], 1)
+        self.assertIsNone(self.get("/api/analytics/", date_from="2024-01")["total"])
+        self.assertEqual(self.manager.get("/api/analytics/", {"date_from": "вчера"}).status_code, 400)
+        self.assertEqual(self.manager.get("/api/analytics/colour/").status_code, 404)
+
+    def test_incremental_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = self.claims[1]
+            moved.failure_date = D(2023, 4, 2)  # интервал следующей рекламации тоже меняется
+            moved.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.claims[0].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.claims[3].machine = self.first
+            self.claims[3].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.client = self.client_a
+            self.second.save()
+        incremental = rollup()
+        self.assertTrue(incremental)
+
+        call_command("rebuild_analytics", stdout=StringIO())
+        self.assertEqual(rollup(), incremental)
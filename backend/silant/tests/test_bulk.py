@@ -0,0 +1,131 @@
+import datetime
+
+from django.test import override_settings
+
+from silant import fulltext
+from silant.models import Complaint, Maintenance, MachineStats
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import TO_1, SilantTestCase, make_complaint, make_machine, make_maintenance, make_ref, make_user
+
+D = datetime.date
+
+
+class BulkWriteTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service, self.other_service = make_user("svc", SERVICE_GROUP), make_user("svc2", SERVICE_GROUP)
+        client = make_user("client", CLIENT_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.own = make_machine("0001", client, self.service)
+            self.foreign = make_machine("0002", client, self.other_service)
+        self.kind = make_ref("Вид ТО", TO_1)
+        self.org = make_ref("Организация ТО", "самостоятельно")
+        self.node, self.method = make_ref("Узел отказа", "Двигатель"), make_ref("Способ восстановления", "Ремонт узла")
+        self.api_client = self.api(self.service, role=SERVICE_GROUP)
+
+    def maintenance(self, machine, day, hours=100, **fields):
+        return {"machine": machine.pk, "kind": self.kind.pk, "performed_date": day.isoformat(),
+                "operating_hours": hours, "work_order_number": "ЗН-1", "work_order_date": day.isoformat(),
+                "organization": self.org.pk, **fields}
+
+    def post(self, url, items):
+        return self.api_client.post(url, items, format="json")
+
+    def test_all_created(self):
+        response = self.post("/api/maintenance/bulk/", [self.maintenance(self.own, D(2023, 3, 1)),
+                                                         self.maintenance(self.own, D(2023, 6, 1), 300)])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["created"], 2)
+        ids = [r["id"] for r in response.json()["results"]]
+        self.assertEqual(set(Maintenance.objects.values_list("pk", flat=True)), set(ids))
+        # сервисная компания — из машины
+        self.assertEqual({m.service_company_id for m in Maintenance.objects.all()}, {self.service.pk})
+
+    def test_mixed_result_is_207(self):
+        response = self.post("/api/maintenance/bulk/", [
+            self.maintenance(self.own, D(2023, 3, 1)),
+            self.maintenance(self.own, D(2023, 3, 2), kind=10 ** 6),
+            self.maintenance(self.foreign, D(2023, 3, 3)),
+        ])
+        self.assertEqual(response.status_code, 207, response.content)
+        data = response.json()
+        self.assertEqual((data["created"], data["errors"]), (1, 2))
+        statuses = [(r["index"], r["status"]) for r in data["results"]]
+        self.assertEqual(statuses, [(0, "created"), (1, "error"), (2, "error")])
+        self.assertIn("kind", data["results"][1]["errors"])
+        self.assertIn("non_field_errors", data["results"][2]["errors"])
+        self.assertEqual(Maintenance.objects.count(), 1)
+
+    def test_only_errors_is_400(self):
+        response = self.post("/api/maintenance/bulk/", [self.maintenance(self.foreign, D(2023, 3, 3))])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Maintenance.objects.count(), 0)
+        self.assertEqual(self.post("/api/maintenance/bulk/", {"machine": 1}).status_code, 400)
+        with override_settings(SILANT_BULK_MAX_ITEMS=1):
+            items = [self.maintenance(self.own, D(2023, 3, 1))] * 2
+            self.assertEqual(self.post("/api/maintenance/bulk/", items).status_code, 400)
+
+    def test_client_cannot_bulk_create_complaints(self):
+        client = self.api(self.own.client, role=CLIENT_GROUP)
+        item = {"machine": self.own.pk, "failure_date": "2023-03-01", "operating_hours": 10,
+                "failure_node": self.node.pk, "recovery_method": self.method.pk}
+        response = client.post("/api/complaints/bulk/", [item], format="json")
+        self.assertEqual(response.status_code, 403)  # CanWriteComplaint: клиент рекламации не пишет
+        self.assertEqual(Complaint.objects.count(), 0)
+
+    def test_patch_by_id(self):
+        own = make_maintenance(self.own, D(2023, 3, 1), 100)
+        foreign = make_maintenance(self.foreign, D(2023, 3, 1), 100)
+        response = self.api_client.patch("/api/maintenance/bulk/", [
+            {"id": own.pk, "operating_hours": 150},
+            {"id": foreign.pk, "operating_hours": 150},
+            {"id": 10 ** 6, "operating_hours": 150},
+            {"id": own.pk, "machine": self.foreign.pk},
+        ], format="json")
+        self.assertEqual(response.status_code, 207, response.content)
+        data = response.json()
+        self.assertEqual([r["status"] for r in data["results"]], ["updated", "error", "error", "error"])
+        self.assertEqual(data["results"][2]["errors"], {"id": ["Запись не найдена."]})
+        own.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual((own.operating_hours, own.machine_id), (150, self.own.pk))
+        self.assertEqual(foreign.operating_hours, 100)
+
+        response = self.api_client.patch("/api/maintenance/bulk/", [{"id": own.pk, "operating_hours": 160}],
+                                         format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats_and_etag_follow_bulk_write(self):
+        etag = self.api_client.get("/api/maintenance/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("/api/maintenance/bulk/", [self.maintenance(self.own, D(2023, 3, 1), 100),
+                                                 self.maintenance(self.own, D(2023, 6, 1), 250)])
+        stats = MachineStats.objects.get(machine=self.own)
+        self.assertEqual((stats.maintenance_count, stats.operating_hours), (2, 250))
+        self.assertEqual(self.api_client.get("/api/maintenance/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        record = Maintenance.objects.get(operating_hours=250)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_client.patch("/api/maintenance/bulk/", [{"id": record.pk, "machine": self.own.pk,
+                                                              "operating_hours": 260}], format="json")
+        self.assertEqual(MachineStats.objects.get(machine=self.own).operating_hours, 260)
+
+    def test_complaints_indexed_and_rolled_up(self):
+        item = {"machine": self.own.pk, "failure_date": "2023-03-01", "operating_hours": 120,
+                "failure_node": self.node.pk, "recovery_method": self.method.pk,
+                "failure_description": "Течь гидронасоса", "recovery_date": "2023-03-05"}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post("/api/complaints/bulk/", [item])
+        self.assertEqual(response.status_code, 201, response.content)
+        complaint = Complaint.objects.get()
+        self.assertEqual(complaint.downtime_days, 4)
+        self.assertEqual([c.pk for c in fulltext.search(Complaint.objects.all(), "гидронасос")], [complaint.pk])
+        self.assertEqual(MachineStats.objects.get(machine=self.own).complaint_count, 1)
+        manager = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+        self.assertEqual(manager.get("/api/analytics/").json()["total"]["failures"], 1)
+
+    def test_base_hook_is_noop(self):
+        from silant.api_views import BulkWriteMixin
+        self.assertIsNone(BulkWriteMixin().bulk_written([make_complaint(self.own, D(2023, 1, 1))], []))
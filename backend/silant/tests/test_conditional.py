@@ -0,0 +1,93 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from silant import versions
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_maintenance, make_user
+
+
+class ConditionalGetTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = make_user("client", CLIENT_GROUP)
+        self.service = make_user("svc", SERVICE_GROUP)
+        self.machine = make_machine("0017", self.client_user, self.service)
+        self.api_client = self.api(self.client_user, role=CLIENT_GROUP)
+
+    def test_not_modified_without_data_queries(self):
+        first = self.api_client.get("/api/machines/")
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"].startswith('W/"'))
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.api_client.get("/api/machines/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertFalse([q for q in ctx.captured_queries if '"silant_machine"' in q["sql"]])
+
+        # сильная форма того же тега и список тегов тоже подходят
+        strong = first["ETag"].removeprefix("W/")
+        response = self.api_client.get("/api/machines/", HTTP_IF_NONE_MATCH=f'"other", {strong}')
+        self.assertEqual(response.status_code, 304)
+
+    def test_vary_headers(self):
+        for url in ("/api/machines/", f"/api/machines/{self.machine.pk}/"):
+            vary = {v.strip() for v in self.api_client.get(url)["Vary"].split(",")}
+            self.assertLessEqual({"Authorization", "X-Active-Role", "Cookie"}, vary)
+
+    def test_tag_depends_on_user_role_and_query(self):
+        tag = self.api_client.get("/api/machines/")["ETag"]
+        self.assertNotEqual(self.api(self.service, role=SERVICE_GROUP).get("/api/machines/")["ETag"], tag)
+        self.assertNotEqual(self.api(self.client_user).get("/api/machines/")["ETag"], tag)
+        self.assertNotEqual(self.api_client.get("/api/machines/", {"ordering": "serial_number"})["ETag"], tag)
+
+    def test_write_invalidates(self):
+        machines = self.api_client.get("/api/machines/")["ETag"]
+        detail = self.api_client.get(f"/api/machines/{self.machine.pk}/")["ETag"]
+        maintenance = self.api_client.get("/api/maintenance/")["ETag"]
+
+        manager = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = manager.patch(f"/api/machines/{self.machine.pk}/", {"consignee": "ООО Север"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.api_client.get("/api/machines/", HTTP_IF_NONE_MATCH=machines)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], machines)
+        response = self.api_client.get(f"/api/machines/{self.machine.pk}/", HTTP_IF_NONE_MATCH=detail)
+        self.assertEqual(response.json()["consignee"], "ООО Север")
+        # список ТО показывает поля машины — его тег тоже меняется
+        self.assertNotEqual(self.api_client.get("/api/maintenance/")["ETag"], maintenance)
+
+        # запись в таблицу, от которой ответ не зависит, тег не трогает
+        make_maintenance(self.machine, datetime.date(2023, 3, 1), 200)  # заодно заводит справочники ТО
+        references = self.api_client.get("/api/references/")["ETag"]
+        make_maintenance(self.machine, datetime.date(2023, 6, 1), 400)
+        self.assertEqual(self.api_client.get("/api/references/", HTTP_IF_NONE_MATCH=references).status_code, 304)
+
+    def test_lost_counter_is_reseeded(self):
+        tag = self.api_client.get("/api/machines/")["ETag"]
+        versions.cache.delete(versions._key(versions.MACHINES))
+        self.assertEqual(self.api_client.get("/api/machines/", HTTP_IF_NONE_MATCH=tag).status_code, 200)
+
+
+class PublicLookupEtagTests(SilantTestCase):
+
+    def test_public_etag_and_invalidation(self):
+        machine = make_machine("0017", make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP))
+        url = "/api/public/machine-by-serial/"
+        first = self.api().get(url, {"serial": "0017"})
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["Cache-Control"].startswith("public, max-age="))
+        self.assertEqual(self.api().get(url, {"serial": "0017"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        machine.consignee = "ООО Север"
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.save()
+        response = self.api().get(url, {"serial": "0017"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
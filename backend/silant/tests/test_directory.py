@@ -0,0 +1,53 @@
+from django.contrib.auth.models import Group
+
+from silant.directory import service_companies, service_company_choices
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_user
+
+
+class ServiceCompanyDirectoryTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alpha = make_user("alpha", SERVICE_GROUP, first_name="Альфа")
+        self.beta = make_user("beta", SERVICE_GROUP)  # без имени — показывается логин
+        self.client_user = make_user("client", CLIENT_GROUP)
+        make_machine("0017", self.client_user, self.alpha)
+
+    def test_sorted_names_cached_in_one_query(self):
+        with self.assertNumQueries(1):
+            # сортировка по name.lower(): латиница раньше кириллицы
+            expected = [{"id": self.beta.pk, "name": "beta"}, {"id": self.alpha.pk, "name": "Альфа"}]
+            self.assertEqual(service_companies(), expected)
+            self.assertEqual(service_companies(), expected)
+
+    def test_cache_reset_on_user_and_group_changes(self):
+        service_companies()
+        self.beta.first_name = "Бета"
+        self.beta.save()
+        self.assertEqual([i["name"] for i in service_companies()], ["Альфа", "Бета"])
+
+        gamma = make_user("gamma", first_name="Гамма")
+        gamma.groups.add(Group.objects.get(name=SERVICE_GROUP))
+        self.assertEqual([i["name"] for i in service_companies()], ["Альфа", "Бета", "Гамма"])
+
+        self.alpha.groups.clear()
+        self.assertEqual([i["name"] for i in service_companies()], ["Бета", "Гамма"])
+
+    def test_login_does_not_reset_cache(self):
+        service_companies()
+        self.alpha.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            service_companies()
+
+    def test_endpoint_scoped_like_machines(self):
+        response = self.api(self.client_user, role=CLIENT_GROUP).get("/api/service-companies/")
+        self.assertEqual(response.json(), [{"id": self.alpha.pk, "name": "Альфа"}])
+        manager = make_user("manager", MANAGER_GROUP)
+        response = self.api(manager, role=MANAGER_GROUP).get("/api/service-companies/")
+        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(self.api().get("/api/service-companies/").status_code, 401)
+
+    def test_filter_choices_follow_directory(self):
+        self.assertEqual(service_company_choices(), [(self.beta.pk, "beta"), (self.alpha.pk, "Альфа")])
@@ -0,0 +1,92 @@
+import datetime
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from silant.roles import MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_maintenance, make_user
+
+DAY = datetime.date(2023, 1, 1)
+
+
+class SparseFieldsetTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = make_user("manager", MANAGER_GROUP)
+        client, service = make_user("client"), make_user("svc", SERVICE_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.machines = [
+                make_machine(f"{i:04d}", client, service, shipment_date=DAY + datetime.timedelta(days=i))
+                for i in range(5)
+            ]
+            for i, machine in enumerate(self.machines):
+                make_maintenance(machine, DAY + datetime.timedelta(days=30 + i), 100 * i)
+        self.api_client = self.api(self.manager, role=MANAGER_GROUP)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api_client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), " ".join(q["sql"] for q in ctx.captured_queries)
+
+    def test_fields_in_serializer_order(self):
+        data, sql = self.get("/api/machines/", fields="serial_number,id")
+        self.assertEqual(list(data["results"][0]), ["id", "serial_number"])
+        self.assertNotIn('"auth_user"', sql)
+        self.assertNotIn('"silant_machinestats"', sql)
+        self.assertNotIn('"consignee"', sql)
+
+    def test_omit(self):
+        full, _ = self.get("/api/machines/")
+        data, sql = self.get("/api/machines/", omit="client,service_company,maintenance_count")
+        keys = [k for k in full["results"][0] if k not in ("client", "service_company", "maintenance_count")]
+        self.assertEqual(list(data["results"][0]), keys)
+        self.assertNotIn('"auth_user"', sql)
+
+    def test_stats_join_only_when_needed(self):
+        data, sql = self.get("/api/machines/", fields="id,current_operating_hours")
+        self.assertIn('"silant_machinestats"', sql)
+        self.assertEqual(data["results"][0]["current_operating_hours"], 400)
+
+        # сортировка по полю сводки работает и без него в ответе
+        data, sql = self.get("/api/machines/", fields="serial_number", ordering="-current_operating_hours")
+        self.assertEqual([r["serial_number"] for r in data["results"]], ["0004", "0003", "0002", "0001", "0000"])
+
+    def test_unknown_field_is_400(self):
+        for url in ("/api/machines/", f"/api/machines/{self.machines[0].pk}/", "/api/maintenance/all/"):
+            with self.subTest(url=url):
+                response = self.api_client.get(url, {"fields": "id,colour"})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("fields", response.json())
+        self.assertEqual(self.api_client.get("/api/machines/", {"omit": "colour"}).status_code, 400)
+
+    def test_detail_loads_only_selected(self):
+        machine = self.machines[0]
+        data, sql = self.get(f"/api/machines/{machine.pk}/", fields="id,serial_number,client")
+        self.assertEqual(data, {"id": machine.pk, "serial_number": "0000",
+                                "client": {"id": machine.client_id, "username": "client", "first_name": ""}})
+        self.assertNotIn('"consignee"', sql)
+
+        data, sql = self.get(f"/api/maintenance/{machine.maintenances.get().pk}/", fields="machine_serial")
+        self.assertEqual(data, {"machine_serial": "0000"})
+
+    def test_all_rows_and_cursor_with_fields(self):
+        response = self.api_client.get("/api/maintenance/all/", {"fields": "machine_serial,operating_hours"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0], {"machine_serial": "0004", "operating_hours": 400})
+
+        # курсору нужен ключ сортировки, даже если его нет в ответе
+        data, _ = self.get("/api/maintenance/", fields="operating_hours", pagination="cursor", page_size=2)
+        self.assertEqual(data["results"], [{"operating_hours": 400}, {"operating_hours": 300}])
+        response = self.api_client.get(data["next"])
+        self.assertEqual(response.json()["results"], [{"operating_hours": 200}, {"operating_hours": 100}])
+
+    def test_etag_depends_on_fields(self):
+        full = self.api_client.get("/api/machines/")["ETag"]
+        sparse = self.api_client.get("/api/machines/", {"fields": "id"})
+        self.assertNotEqual(sparse["ETag"], full)
+        self.assertEqual(self.api_client.get("/api/machines/", {"fields": "id"},
+                                             HTTP_IF_NONE_MATCH=sparse["ETag"]).status_code, 304)
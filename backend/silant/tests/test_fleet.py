@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+
+from silant import scope
+from silant.models import Maintenance
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_user
+
+
+class FleetCacheTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user, self.service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        self.other = make_user("other", CLIENT_GROUP)
+        self.first = make_machine("0001", self.client_user, self.service)
+        self.second = make_machine("0002", self.other, self.service)
+
+    def fleet(self, user, fields=("client",)):
+        return scope.fleet(User.objects.get(pk=user.pk), fields)
+
+    def test_read_once_and_shared(self):
+        user = User.objects.get(pk=self.service.pk)
+        with self.assertNumQueries(1):
+            ids = scope.fleet(user, scope.ANY_ROLE_FIELDS)
+            self.assertIs(scope.fleet(user, scope.ANY_ROLE_FIELDS), ids)  # запомнено на объекте
+        self.assertEqual(list(ids), sorted([self.first.pk, self.second.pk]))
+        with self.assertNumQueries(0):
+            self.assertEqual(scope.fleet(User(pk=self.service.pk), scope.ANY_ROLE_FIELDS), ids)
+
+    def test_child_filter_skips_machine_table(self):
+        request = RequestFactory().get("/", HTTP_X_ACTIVE_ROLE=CLIENT_GROUP)
+        queryset = scope.restrict(Maintenance.objects.all(), self.client_user, request, via="machine")
+        sql = str(queryset.query)
+        self.assertNotIn("silant_machine", sql.replace("silant_maintenance", ""))
+        self.assertIn(f"IN ({self.first.pk})", sql)
+
+    def test_owner_change_resets_old_and_new_owner(self):
+        self.assertEqual(list(self.fleet(self.client_user)), [self.first.pk])
+        self.assertEqual(list(self.fleet(self.other)), [self.second.pk])
+        self.first.client = self.other
+        self.first.save()
+        self.assertEqual(list(self.fleet(self.client_user)), [])
+        self.assertEqual(list(self.fleet(self.other)), sorted([self.first.pk, self.second.pk]))
+
+    def test_create_and_delete_reset(self):
+        self.fleet(self.client_user)
+        third = make_machine("0003", self.client_user, self.service)
+        self.assertEqual(list(self.fleet(self.client_user)), sorted([self.first.pk, third.pk]))
+        third.delete()
+        self.assertEqual(list(self.fleet(self.client_user)), [self.first.pk])
+
+    def test_unrelated_save_keeps_cache(self):
+        self.fleet(self.client_user)
+        self.first.consignee = "ООО Север"
+        self.first.save()
+        with self.assertNumQueries(1):  # только чтение пользователя
+            self.fleet(self.client_user)
+
+    def test_forget_all_fleets(self):
+        self.fleet(self.client_user)
+        scope.forget_all_fleets()
+        self.assertIsNone(cache.get(scope._fleet_key(self.client_user.pk, ("client",))))
+
+    def test_large_fleet_falls_back_to_subquery(self):
+        with mock.patch.object(scope, "FLEET_MAX_IDS", 1):
+            self.assertIsNone(self.fleet(self.service, ("service_company",)))
+            # «слишком велик» тоже запоминается
+            self.assertIs(cache.get(scope._fleet_key(self.service.pk, ("service_company",))), False)
+
+    @override_settings(SILANT_FLEET_CACHE_TIMEOUT=0)
+    def test_disabled_cache(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.fleet(self.client_user))
@@ -0,0 +1,109 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from silant import fulltext
+from silant.models import Complaint
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+from silant.stemmer import stem
+
+from .base import SilantTestCase, make_complaint, make_machine, make_user
+
+DAY = datetime.date(2023, 5, 1)
+
+
+class StemmerTests(SimpleTestCase):
+
+    def test_word_forms_share_stem(self):
+        self.assertEqual({stem(w) for w in ("насос", "насоса", "насосы")}, {"насос"})
+        self.assertEqual(stem("шлангов"), stem("шланг"))
+        self.assertEqual(stem("двигателя"), stem("двигатель"))
+
+    def test_highlight_marks_forms_and_escapes(self):
+        phrases = fulltext.parse("насосы")
+        self.assertEqual(
+            fulltext.highlight("Отказ <b>насоса</b> & шланга", phrases),
+            "Отказ &lt;b&gt;<mark>насоса</mark>&lt;/b&gt; &amp; шланга",
+        )
+        self.assertEqual(fulltext.highlight("Течь шланга", phrases), "")
+
+    def test_long_text_is_cut_around_match(self):
+        text = "слово " * 100 + "насос " + "слово " * 100
+        snippet = fulltext.highlight(text, fulltext.parse("насос"), limit=40)
+        self.assertTrue(snippet.startswith("…") and snippet.endswith("…"))
+        self.assertIn("<mark>насос</mark>", snippet)
+
+
+class ComplaintSearchTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user, self.service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        machine = make_machine("0017", self.client_user, self.service)
+        self.pump = make_complaint(machine, DAY, failure_description="Отказ гидравлического насоса",
+                                   parts_used="Насос НШ-32, прокладка")
+        self.hose = make_complaint(machine, DAY, failure_description="Течь шлангов гидросистемы",
+                                   parts_used="Шланг высокого давления")
+        self.engine = make_complaint(machine, DAY, failure_description="Не запускается двигатель")
+
+    def found(self, text):
+        return [c.pk for c in fulltext.search(Complaint.objects.all(), text)]
+
+    def test_backend_per_vendor(self):
+        expected = {"sqlite": "fts5", "postgresql": "tsvector"}.get(connection.vendor, "like")
+        self.assertEqual(fulltext.backend(), expected)
+
+    def test_word_forms_and_prefixes(self):
+        self.assertEqual(self.found("насосы"), [self.pump.pk])
+        self.assertEqual(self.found("шланг"), [self.hose.pk])
+        self.assertEqual(self.found("двигателя"), [self.engine.pk])
+        self.assertEqual(set(self.found("гидр")), {self.pump.pk, self.hose.pk})
+
+    def test_all_words_and_phrases(self):
+        self.assertEqual(self.found("насос прокладка"), [self.pump.pk])
+        self.assertEqual(self.found("насос двигатель"), [])
+        self.assertEqual(self.found("НШ-32"), [self.pump.pk])
+        self.assertEqual(self.found("НШ-50"), [])
+        self.assertEqual(self.found("   "), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.engine.failure_description = "Заклинило насос"
+        self.engine.save()
+        self.assertEqual(set(self.found("насос")), {self.pump.pk, self.engine.pk})
+        self.assertEqual(self.found("двигатель"), [])
+        self.pump.delete()
+        self.assertEqual(self.found("насос"), [self.engine.pk])
+
+    def test_rebuild_restores_index(self):
+        if fulltext.backend() != "fts5":
+            self.assertEqual(fulltext.rebuild(), 0)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {fulltext.FTS_TABLE}")
+        self.assertEqual(self.found("насос"), [])
+        self.assertEqual(fulltext.rebuild(), 3)
+        self.assertEqual(self.found("насос"), [self.pump.pk])
+
+    def test_api_search_with_scope_and_highlight(self):
+        api = self.api(self.client_user, role=CLIENT_GROUP)
+        data = api.get("/api/complaints/search/", {"q": "насосы"}).json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.pump.pk])
+        self.assertEqual(data["results"][0]["highlight"]["failure_description"],
+                         "Отказ гидравлического <mark>насоса</mark>")
+        self.assertIn("search_score", data["results"][0])
+
+        stranger = self.api(make_user("stranger", CLIENT_GROUP), role=CLIENT_GROUP)
+        self.assertEqual(stranger.get("/api/complaints/search/", {"q": "насосы"}).json()["results"], [])
+        self.assertEqual(api.get("/api/complaints/search/").status_code, 400)
+
+
+@skipUnless(connection.vendor == "postgresql", "только PostgreSQL")
+class PostgresFulltextTests(SilantTestCase):
+
+    def test_tsvector_query_uses_gin_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = fulltext.search(Complaint.objects.all(), "насос").order_by().explain()
+        self.assertIn("silant_complaint_fts_gin", plan)
@@ -0,0 +1,454 @@
+import csv
+import datetime
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from silant import directory, refcache, versions
+from silant.importer import (
+    Importer, UserResolver, get_or_create_user, iter_sheet_chunks, normalize_machines, parse_date, parse_date_column,
+    parse_days, parse_days_column, read_sheet, row_fingerprints, validate_rows,
+)
+from silant.models import Complaint, ImportLedger, Machine, MachineStats, Maintenance, Reference
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_user
+
+MACHINE_HEADER = [
+    "Зав. № машины", "Модель техники", "Модель двигателя", "Зав. № двигателя", "Модель трансмиссии",
+    "Модель ведущего моста", "Модель управляемого моста", "Дата отгрузки с завода", "Покупатель",
+    "Грузополучатель (конечный потребитель)", "Сервисная компания",
+]
+TO_HEADER = ["Зав. № машины", "Вид ТО", "Дата проведения ТО", "Наработка, м/час", "№ заказ-наряда",
+             "Организация, проводившая ТО"]
+CLAIM_HEADER = ["Зав. № машины", "Дата восстановления", "Дата отказа", "Наработка, м/час", "Узел отказа",
+                "Описание отказа", "Способ восстановления", "Используемые запасные части", "Время простоя"]
+
+
+def machine_row(serial, client="ООО «Ромашка»", service="ООО Сервис", shipped="10.01.2023", consignee=""):
+    return [serial, "ПД1,5", "Д-245", f"E-{serial}", "10VA", "20VB", "30VC", shipped, client, consignee, service]
+
+
+class ImportCase(SilantTestCase):
+    """Импорт CSV-выгрузок из временного каталога командой parsing_excel."""
+
+    def setUp(self):
+        super().setUp()
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, header, rows, title_rows=()):
+        path = self.dir / name
+        with open(path, "w", newline="", encoding="utf-8-sig") as fh:
+            writer = csv.writer(fh, delimiter=";")
+            # строки над заголовком Excel дополняет пустыми ячейками до ширины листа
+            titles = [(list(t) + [""] * len(header))[:len(header)] for t in title_rows]
+            writer.writerows([*titles, header, *rows])
+        return path
+
+    def run_import(self, *paths, **options):
+        out = StringIO()
+        args = [str(p) for p in paths or [self.dir]]
+        call_command("parsing_excel", *args, to="то", claims="рекламации", stdout=out, **options)
+        return out.getvalue()
+
+
+# ---- пакетный импорт (user-001) ----
+
+class BulkImportTests(ImportCase):
+
+    def test_imports_machines_maintenance_and_complaints(self):
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017"), machine_row("0018", client="ИП Иванов")])
+        self.write("то.csv", TO_HEADER, [
+            ["0017", "ТО-1 (200 м/час)", "01.03.2023", "210", "№12", "самостоятельно"],
+            ["0018", "ТО-1 (200 м/час)", "05.03.2023", "190", "№13", "ООО Сервис"],
+        ])
+        self.write("рекламации.csv", CLAIM_HEADER, [
+            ["0017", "20.04.2023", "15.04.2023", "300", "Двигатель", "не заводится", "Ремонт узла", "стартер", ""],
+        ])
+        self.run_import()
+
+        m = Machine.objects.select_related("client", "service_company", "model_engine").get(serial_number="0017")
+        self.assertEqual(m.shipment_date, datetime.date(2023, 1, 10))
+        self.assertEqual(m.model_engine.name, "Д-245")
+        self.assertEqual(m.client.first_name, "ООО Ромашка")
+        self.assertTrue(m.client.groups.filter(name=CLIENT_GROUP).exists())
+        self.assertTrue(m.service_company.groups.filter(name=SERVICE_GROUP).exists())
+        self.assertEqual(Machine.objects.count(), 2)
+
+        to = Maintenance.objects.get(machine=m)
+        self.assertEqual((to.operating_hours, to.kind.name, to.service_company_id),
+                         (210, "ТО-1 (200 м/час)", m.service_company_id))
+        complaint = Complaint.objects.get(machine=m)
+        self.assertEqual(complaint.downtime_days, 5)  # пустая колонка — по датам
+        self.assertEqual(Reference.objects.filter(entity="Организация ТО").count(), 2)
+
+        stats = MachineStats.objects.get(machine=m)
+        self.assertEqual((stats.maintenance_count, stats.complaint_count), (1, 1))
+
+    def test_reimport_updates_in_place(self):
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017", consignee="старый")])
+        self.run_import()
+        self.write("машины.csv", MACHINE_HEADER, [
+            machine_row("0017", consignee="новый"), machine_row("0017", consignee="последний"),
+        ])
+        self.run_import()
+        self.assertEqual(list(Machine.objects.values_list("consignee", flat=True)), ["последний"])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def queries(first, count):
+            self.write("машины.csv", MACHINE_HEADER, [machine_row(f"{first + i:05d}") for i in range(count)])
+            with CaptureQueriesContext(connection) as ctx:
+                self.run_import(batch_size=1000)
+            return len(ctx.captured_queries)
+
+        queries(0, 1)  # справочники и пользователи уже есть
+        # 40 строк — одна INSERT и на SQLite (не больше 999 параметров в запросе)
+        self.assertEqual(queries(100, 5), queries(200, 40))
+
+
+# ---- потоковое чтение (user-002) ----
+
+class StreamingReaderTests(ImportCase):
+
+    def test_chunks_keep_file_row_numbers(self):
+        path = self.write("машины.csv", MACHINE_HEADER, [machine_row(f"{i:04d}") for i in range(7)],
+                          title_rows=[["Выгрузка от 01.02.2024"], []])
+        chunks = list(iter_sheet_chunks(str(path), "машины", chunk_size=3))
+        self.assertEqual([len(c.index) for c in chunks], [3, 3, 1])
+        # заголовок найден в третьей строке, данные — с четвёртой
+        self.assertEqual(list(chunks[0].index), [4, 5, 6])
+        self.assertEqual(chunks[2].iloc[0]["Зав. № машины"], "0006")
+
+    def test_xlsx_chunks_match_read_sheet(self):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "машины"
+        ws.append(["Выгрузка от 01.02.2024"])
+        ws.append(MACHINE_HEADER)
+        for i in range(5):
+            ws.append(machine_row(f"{i:04d}"))
+        path = self.dir / "export.xlsx"
+        wb.save(path)
+
+        # пустые ячейки: None у openpyxl и NaN у read_excel — после нормализации одинаковы
+        streamed = normalize_machines(pd.concat(iter_sheet_chunks(str(path), "машины", chunk_size=2)))
+        whole = normalize_machines(read_sheet(str(path), "машины", None))
+        pd.testing.assert_frame_equal(streamed, whole, check_dtype=False)
+        self.assertEqual(list(whole.index), [3, 4, 5, 6, 7])
+
+    def test_stream_import_matches_full_read(self):
+        rows = [machine_row(f"{i:04d}", client=f"Клиент {i % 3}") for i in range(12)]
+        self.write("машины.csv", MACHINE_HEADER, rows)
+        self.run_import(stream=True, chunk_size=5)
+        streamed = list(Machine.objects.order_by("serial_number").values_list("serial_number", "client__first_name"))
+        self.assertEqual(len(streamed), 12)
+
+        Machine.objects.all().delete()
+        self.run_import(full=True)
+        whole = list(Machine.objects.order_by("serial_number").values_list("serial_number", "client__first_name"))
+        self.assertEqual(streamed, whole)
+
+
+# ---- конвейер по нескольким файлам (user-003) ----
+
+class PipelineTests(ImportCase):
+
+    def xlsx(self, name, sheets):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.remove(wb.active)
+        for title, (header, rows) in sheets.items():
+            ws = wb.create_sheet(title)
+            ws.append(header)
+            for row in rows:
+                ws.append(row)
+        wb.save(self.dir / name)
+
+    def test_children_written_after_machines_from_later_file(self):
+        # файл с ТО идёт раньше файла с машинами, но пишется после них
+        self.xlsx("a.xlsx", {"то": (TO_HEADER, [["0017", "ТО-1 (200 м/час)", "01.03.2023", "210", "", "сами"]])})
+        self.xlsx("b.xlsx", {"машины": (MACHINE_HEADER, [machine_row("0017")])})
+        summary = self.dir / "summary.json"
+        self.run_import(summary_json=str(summary))
+
+        self.assertEqual(Maintenance.objects.get().machine.serial_number, "0017")
+        stages = [s["stage"] for s in json.loads(summary.read_text(encoding="utf-8"))["stages"]]
+        self.assertEqual(stages[1:], ["справочники и пользователи", "Машины", "ТО"])
+
+    def test_stream_writes_children_after_machines_from_later_file(self):
+        self.write("то.csv", TO_HEADER, [["0017", "ТО-1 (200 м/час)", "01.03.2023", "210", "", "сами"]])
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017")])
+        out = self.run_import(self.dir / "то.csv", self.dir / "машины.csv", stream=True, workers=2)
+
+        self.assertEqual(Maintenance.objects.get().machine.serial_number, "0017")
+        self.assertIn("--workers в потоковом режиме не используется", out)
+        self.assertLess(out.index("Машины:"), out.index("ТО:"))
+
+    def test_last_file_wins(self):
+        self.xlsx("a.xlsx", {"машины": (MACHINE_HEADER, [machine_row("0017", consignee="из a")])})
+        self.xlsx("b.xlsx", {"машины": (MACHINE_HEADER, [machine_row("0017", consignee="из b")])})
+        self.run_import()
+        self.assertEqual(Machine.objects.get().consignee, "из b")
+
+    def test_workers_give_same_result(self):
+        for i in range(3):
+            self.xlsx(f"part-{i}.xlsx", {"машины": (MACHINE_HEADER, [machine_row(f"{i}{j:03d}") for j in range(4)])})
+        self.run_import(workers=2)
+        self.assertEqual(Machine.objects.count(), 12)
+
+
+# ---- журнал импорта и отпечатки строк (user-004) ----
+
+class LedgerTests(ImportCase):
+
+    def sheet_stats(self, **options):
+        summary = self.dir / "summary.json"
+        self.run_import(self.dir / "машины.csv", summary_json=str(summary), **options)
+        return json.loads(summary.read_text(encoding="utf-8"))["sheets"]["machines"]
+
+    def test_fingerprint_follows_content_not_service_columns(self):
+        frame = normalize_machines(pd.DataFrame([machine_row("0017")], columns=MACHINE_HEADER))
+        before = row_fingerprints("machines", frame).iloc[0]
+        moved = row_fingerprints("machines", frame.assign(_row=99, _source="other.xlsx")).iloc[0]
+        edited = row_fingerprints("machines", frame.assign(consignee="новый")).iloc[0]
+        self.assertEqual(before["key"], "0017")
+        self.assertEqual(before["digest"], moved["digest"])
+        self.assertEqual(before["key"], edited["key"])
+        self.assertNotEqual(before["digest"], edited["digest"])
+
+    def test_reimport_writes_only_changed_rows(self):
+        rows = [machine_row(f"{i:04d}") for i in range(5)]
+        self.write("машины.csv", MACHINE_HEADER, rows)
+        self.assertEqual(self.sheet_stats()["created"], 5)
+
+        with CaptureQueriesContext(connection) as ctx:
+            stats = self.sheet_stats()
+        self.assertEqual((stats["unchanged"], stats["created"], stats["updated"]), (5, 0, 0))
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "silant_machine"')])
+
+        rows[2] = machine_row("0002", consignee="новый")
+        self.write("машины.csv", MACHINE_HEADER, rows)
+        stats = self.sheet_stats()
+        self.assertEqual((stats["unchanged"], stats["updated"]), (4, 1))
+        self.assertEqual(Machine.objects.get(serial_number="0002").consignee, "новый")
+
+    def test_full_ignores_ledger(self):
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017"), machine_row("0018")])
+        self.sheet_stats()
+        stats = self.sheet_stats(full=True)
+        self.assertEqual((stats["unchanged"], stats["updated"]), (0, 2))
+
+
+# ---- векторный разбор дат и простоя (user-005) ----
+
+class ColumnParsingTests(SimpleTestCase):
+    """parse_date_column / parse_days_column совпадают с построчными parse_date / parse_days."""
+
+    ODD = ["", None, float("nan"), "мусор", "31.02.2023", "45000", 45000.0, "2023-03-01T08:30:00", "1.2.3.4"]
+
+    def assertSameDates(self, values):
+        series = pd.Series(values, dtype=object)
+        self.assertEqual(list(parse_date_column(series)), [parse_date(v) for v in values])
+
+    def test_each_dominant_format(self):
+        samples = {
+            "%d.%m.%Y": ["01.02.2023", "1.2.2023", "31.12.2023 10:15"],
+            "%Y-%m-%d": ["2023-02-01", "2023-2-1", "2023-12-31 10:15"],
+            "%d/%m/%Y": ["01/02/2023", "1/2/2023", "31/12/2023"],
+            "%d.%m.%y": ["01.02.23", "1.2.68", "31.12.69"],
+        }
+        for fmt, values in samples.items():
+            with self.subTest(fmt):
+                # формат выбирается по большинству, остальные строки — построчно
+                others = [v for f, vs in samples.items() if f != fmt for v in vs[:1]]
+                self.assertSameDates(values * 3 + others + self.ODD)
+
+    def test_garbage_and_excel_serials(self):
+        self.assertSameDates(self.ODD + ["20000", "80000", "80001", "19999,5", datetime.date(2023, 5, 1)])
+        self.assertEqual(parse_date_column(pd.Series(["45000"])).iloc[0], datetime.date(2023, 3, 15))
+
+    def assertSameDays(self, values, fail=datetime.date(2023, 4, 10), rec=datetime.date(2023, 4, 15)):
+        series = pd.Series(values, dtype=object)
+        fails, recs = pd.Series([fail] * len(values), dtype=object), pd.Series([rec] * len(values), dtype=object)
+        expected = [parse_days(v, fail_dt=fail, rec_dt=rec) for v in values]
+        self.assertEqual(list(parse_days_column(series, fails, recs)), expected)
+
+    def test_downtime_numbers_and_fallback(self):
+        values = ["3", "2,5", "3.5", " 7 дней", "-1", "нет", "", None, float("nan"), 4.0, "+2"]
+        self.assertSameDays(values)
+        self.assertSameDays(values, rec=None)
+
+    def test_oversized_downtime_falls_back_to_dates(self):
+        values = ["9" * 400, "1" + "0" * 20, str(2 ** 63), str(2 ** 63 - 2 ** 10), "12"]
+        self.assertSameDays(values)
+        self.assertEqual(list(parse_days_column(pd.Series(values[:3]), *[pd.Series([None] * 3)] * 2)),
+                         [None] * 3)
+        fallback = parse_days_column(pd.Series(values), pd.Series([datetime.date(2023, 4, 10)] * 5),
+                                     pd.Series([datetime.date(2023, 4, 15)] * 5))
+        self.assertEqual(list(fallback), [5, 5, 5, 2 ** 63 - 2 ** 10, 12])
+
+
+# ---- разрешение компаний в пользователей (user-006) ----
+
+class UserResolverTests(SilantTestCase):
+
+    def test_spellings_of_one_company_map_to_one_user(self):
+        ids = UserResolver().resolve(CLIENT_GROUP, pd.Series(['ООО «Ромашка»', 'ООО "Ромашка"', "ООО  Ромашка"]))
+        self.assertEqual(len(set(ids)), 1)
+        user = User.objects.get(pk=ids.iloc[0])
+        self.assertEqual(user.first_name, "ООО Ромашка")
+        self.assertTrue(user.groups.filter(name=CLIENT_GROUP).exists())
+
+    def test_existing_user_is_matched_within_group_only(self):
+        client = make_user("romashka", CLIENT_GROUP, first_name="ООО Ромашка")
+        service = make_user("romashka-svc", SERVICE_GROUP, first_name="ООО Ромашка")
+        resolver = UserResolver()
+        self.assertEqual(resolver.resolve(CLIENT_GROUP, pd.Series(["ооо ромашка"])).iloc[0], client.pk)
+        self.assertEqual(resolver.resolve(SERVICE_GROUP, pd.Series(["ООО «Ромашка»"])).iloc[0], service.pk)
+
+    def test_taken_username_gets_suffix(self):
+        make_user("ooo-romashka")  # не в группе — не совпадение, но логин занят
+        pk = UserResolver().resolve(SERVICE_GROUP, pd.Series(["ООО Ромашка"])).iloc[0]
+        self.assertEqual(User.objects.get(pk=pk).username, "ooo-romashka-2")
+        self.assertEqual(get_or_create_user("ООО Ромашка", SERVICE_GROUP).pk, pk)
+
+    def test_query_count_does_not_grow_with_names(self):
+        def queries(names):
+            with CaptureQueriesContext(connection) as ctx:
+                UserResolver().resolve(CLIENT_GROUP, pd.Series(names))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries([f"Клиент {i}" for i in range(3)]), queries([f"Фирма {i}" for i in range(40)]))
+
+
+# ---- проверка строк, отклонённые строки, пробный запуск, фиксация пачками (user-007) ----
+
+class RejectsAndDryRunTests(ImportCase):
+
+    def mixed_export(self):
+        self.write("машины.csv", MACHINE_HEADER, [
+            machine_row("0017"),
+            machine_row("0018", shipped=""),  # нет даты отгрузки
+            machine_row("0019", client="Новый клиент"),
+            machine_row("0020", consignee="x" * 300),
+        ])
+        self.write("то.csv", TO_HEADER, [
+            ["0017", "ТО-1 (200 м/час)", "01.03.2023", "210", "", "Новая организация"],
+            ["0017", "ТО-2 (400 м/час)", "01.06.2023", "много", "", "сами"],
+            ["9999", "ТО-1 (200 м/час)", "01.03.2023", "10", "", "сами"],
+        ])
+
+    def test_validate_rows_reasons(self):
+        frame = normalize_machines(pd.DataFrame([
+            machine_row("1"), machine_row("2", shipped="мусор"), machine_row("3", client=""),
+            machine_row("4", consignee="x" * 300),
+        ], columns=MACHINE_HEADER))
+        reasons = list(validate_rows("machines", frame))
+        self.assertEqual(reasons[:3], ["", "не указана дата отгрузки", "не указан покупатель"])
+        self.assertIn("длиннее 255", reasons[3])
+
+    def test_rejects_file_lists_bad_rows(self):
+        self.mixed_export()
+        rejects = self.dir / "rejects.jsonl"
+        self.run_import(rejects=str(rejects))
+        records = [json.loads(line) for line in rejects.read_text(encoding="utf-8").splitlines()]
+        got = {(r["sheet"], r["row"], r["serial_number"]): r["reason"] for r in records}
+        self.assertEqual(got[("machines", 3, "0018")], "не указана дата отгрузки")
+        self.assertEqual(got[("maintenance", 3, "0017")], "некорректная наработка")
+        self.assertEqual(got[("maintenance", 4, "9999")], "машина с таким зав. № не найдена")
+        self.assertEqual(len(records), 4)
+        # хорошие строки записаны
+        self.assertEqual(set(Machine.objects.values_list("serial_number", flat=True)), {"0017", "0019"})
+        self.assertEqual(Maintenance.objects.count(), 1)
+
+    def test_dry_run_reports_real_counts_without_writing(self):
+        make_user("old-client", CLIENT_GROUP, first_name="ООО Ромашка")
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017")])
+        self.run_import()
+        self.mixed_export()
+
+        tables = (versions.MACHINES, versions.MAINTENANCE, versions.REFERENCES, versions.USERS)
+        before = versions.current(*tables)
+        cache.set(directory.CACHE_KEY, ["кэш"], None)
+        counts = [Machine.objects.count(), Maintenance.objects.count(), Reference.objects.count(),
+                  User.objects.count(), ImportLedger.objects.count()]
+        summary = self.dir / "dry.json"
+        with CaptureQueriesContext(connection) as ctx:
+            out = self.run_import(dry_run=True, summary_json=str(summary), service="новый-сервис")
+        self.assertIn("ничего не записано", out)
+        writes = [q["sql"] for q in ctx.captured_queries
+                  if q["sql"].split(" ", 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+        self.assertEqual(writes, [])
+        self.assertEqual(counts, [Machine.objects.count(), Maintenance.objects.count(), Reference.objects.count(),
+                                  User.objects.count(), ImportLedger.objects.count()])
+        self.assertEqual(versions.current(*tables), before)
+        self.assertEqual(cache.get(directory.CACHE_KEY), ["кэш"])
+
+        dry = json.loads(summary.read_text(encoding="utf-8"))["sheets"]
+        summary = self.dir / "real.json"
+        self.run_import(summary_json=str(summary), service="новый-сервис")
+        real = json.loads(summary.read_text(encoding="utf-8"))["sheets"]
+        for sheet in real.values():
+            sheet.pop("seconds"), sheet.pop("rows_per_sec")
+        for sheet in dry.values():
+            sheet.pop("seconds"), sheet.pop("rows_per_sec")
+        self.assertEqual(dry, real)
+        self.assertEqual([real["machines"][k] for k in ("created", "unchanged", "rejected")], [1, 1, 2])
+        self.assertEqual(real["maintenance"]["created"], 1)
+
+    def test_oversized_hours_rejected_in_dry_run_and_real_run(self):
+        self.write("машины.csv", MACHINE_HEADER, [machine_row("0017")])
+        self.write("то.csv", TO_HEADER, [
+            ["0017", "ТО-1 (200 м/час)", "01.03.2023", "210", "", "сами"],
+            ["0017", "ТО-2 (400 м/час)", "01.06.2023", "1e30", "", "сами"],
+        ])
+        summary = self.dir / "dry.json"
+        self.run_import(dry_run=True, summary_json=str(summary))
+        dry = json.loads(summary.read_text(encoding="utf-8"))["sheets"]["maintenance"]
+        self.assertEqual((dry["created"], dry["rejected"]), (1, 1))
+
+        rejects = self.dir / "rejects.jsonl"
+        self.run_import(batch_commit=True, rejects=str(rejects))
+        records = [json.loads(line) for line in rejects.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual([(r["sheet"], r["reason"]) for r in records], [("maintenance", "некорректная наработка")])
+        self.assertEqual(list(Maintenance.objects.values_list("operating_hours", flat=True)), [210])
+
+
+class BatchCommitTests(TransactionTestCase):
+    """Без --batch-commit импорт — одна транзакция; с ним записанные пачки остаются после сбоя."""
+
+    def setUp(self):
+        cache.clear()
+        refcache.invalidate()
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        ImportCase.write(self, "машины.csv", MACHINE_HEADER, [machine_row(f"{i:04d}") for i in range(4)])
+        ImportCase.write(self, "то.csv", TO_HEADER, [["0001", "ТО-1 (200 м/час)", "01.03.2023", "1", "", "сами"]])
+
+    def crash(self, **options):
+        with mock.patch.object(Importer, "import_maintenance", side_effect=RuntimeError("сбой")):
+            with self.assertRaises(RuntimeError):
+                ImportCase.run_import(self, batch_size=2, **options)
+
+    def test_single_transaction_rolls_back_everything(self):
+        self.crash()
+        self.assertEqual(Machine.objects.count(), 0)
+
+    def test_batch_commit_keeps_written_batches(self):
+        self.crash(batch_commit=True)
+        self.assertEqual(Machine.objects.count(), 4)
@@ -0,0 +1,54 @@
+from unittest import skipUnless
+
+from django.db import connection
+
+from silant.models import Machine
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_user
+
+on_postgres = skipUnless(connection.vendor == "postgresql", "только PostgreSQL")
+
+
+def index_names(table) -> set:
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, table))
+
+
+class AccessPathIndexTests(SilantTestCase):
+
+    def test_keyset_and_role_indexes_exist(self):
+        self.assertLessEqual(
+            {"silant_mach_ship_id_idx", "silant_mach_client_ship_idx", "silant_mach_svc_ship_idx"},
+            index_names("silant_machine"),
+        )
+        self.assertIn("silant_maint_date_id_idx", index_names("silant_maintenance"))
+        self.assertIn("silant_compl_date_id_idx", index_names("silant_complaint"))
+
+
+@on_postgres
+class PostgresIndexTests(SilantTestCase):
+    """Ветка PostgreSQL: pg_trgm и планы по индексам (последовательный просмотр запрещён — таблицы крошечные)."""
+
+    def setUp(self):
+        super().setUp()
+        client, service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        self.client_user = client
+        for i in range(20):
+            make_machine(f"SN-{i:04d}", client, service)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def test_pg_trgm_installed(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.assertIsNotNone(cursor.fetchone())
+
+    def test_icontains_uses_trigram_index(self):
+        # без сортировки по умолчанию: иначе планировщик может пойти по индексу даты отгрузки
+        plan = Machine.objects.order_by().filter(serial_number__icontains="0017").explain()
+        self.assertIn("silant_machine_serial_number_utrgm", plan)
+
+    def test_role_keyset_uses_composite_index(self):
+        queryset = Machine.objects.filter(client=self.client_user).order_by("-shipment_date", "-id")[:10]
+        self.assertIn("silant_mach_client_ship_idx", queryset.explain())
@@ -0,0 +1,82 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+
+from silant import listing
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_complaint, make_machine, make_maintenance, make_ref, make_user
+
+D = datetime.date
+LISTS = ("machines", "maintenance", "complaints", "references")
+
+
+class LeanListTests(SilantTestCase):
+    """Быстрый путь списков отдаёт те же байты, что сериализатор карточки, в каждой роли."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = make_user("client", CLIENT_GROUP, first_name="Клиент")
+        self.service = make_user("svc", SERVICE_GROUP)
+        self.manager = make_user("manager", MANAGER_GROUP)
+        other = make_user("other", CLIENT_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            own = make_machine("0001", self.client_user, self.service, consignee="ООО «Север»",
+                               equipment='Стандарт, "кабина"')
+            foreign = make_machine("0002", other, self.service, model="ПД2")
+            make_maintenance(own, D(2023, 3, 1), 100, work_order_number="ЗН-1", work_order_date=D(2023, 3, 1))
+            make_maintenance(foreign, D(2023, 4, 1), 50)
+            make_complaint(own, D(2023, 5, 1), 150, failure_description="Течь\nмасла", parts_used="",
+                           recovery_date=D(2023, 5, 4))
+            make_complaint(foreign, D(2023, 6, 1), 80)
+        make_ref("Модель двигателя", "Без описания")
+
+    def assert_rows_match_detail(self, api, name):
+        renderer = JSONRenderer()
+        response = api.get(f"/api/{name}/", {"page_size": 1000})
+        self.assertEqual(response.status_code, 200, response.content)
+        rows = response.data["results"]
+        self.assertTrue(rows)
+        for row in rows:
+            detail = api.get(f"/api/{name}/{row['id']}/")  # карточка — через сериализатор
+            self.assertEqual(renderer.render(row), detail.content, name)
+        return rows
+
+    def test_byte_identical_per_role(self):
+        for user, role in ((self.client_user, CLIENT_GROUP), (self.service, SERVICE_GROUP),
+                           (self.manager, MANAGER_GROUP)):
+            api = self.api(user, role=role)
+            for name in LISTS:
+                with self.subTest(role=role, list=name):
+                    self.assert_rows_match_detail(api, name)
+
+    def test_client_sees_only_own_rows(self):
+        rows = self.assert_rows_match_detail(self.api(self.client_user, role=CLIENT_GROUP), "machines")
+        self.assertEqual([r["serial_number"] for r in rows], ["0001"])
+        self.assertEqual(rows[0]["client"], {"id": self.client_user.pk, "username": "client", "first_name": "Клиент"})
+
+    def test_all_rows_stream_same_rows(self):
+        api = self.api(self.manager, role=MANAGER_GROUP)
+        renderer = JSONRenderer()
+        for name in ("maintenance", "complaints"):
+            listed = api.get(f"/api/{name}/", {"page_size": 1000}).data["results"]
+            streamed = b"".join(api.get(f"/api/{name}/all/").streaming_content).decode().splitlines()
+            self.assertEqual([renderer.render(row).decode() for row in listed],
+                             [renderer.render(json.loads(line)).decode() for line in streamed])
+
+    def test_row_function_is_closure(self):
+        # строка собирается без eval: функция — замыкание над (ключ, get)
+        self.assertIsNotNone(listing.MACHINES.row.__closure__)
+        projected = listing.MACHINES.project(["serial_number", "client"])
+        self.assertEqual(projected.columns, ("serial_number", "client_id", "client__username", "client__first_name"))
+        row = projected.row({"serial_number": "0001", "client_id": None, "client__username": None,
+                             "client__first_name": None}, None)
+        self.assertEqual(row, {"serial_number": "0001", "client": None})
+
+    def test_bench_command_reports_identical_json(self):
+        out = StringIO()
+        call_command("bench_lists", rows=10, repeat=1, stdout=out)
+        self.assertEqual(out.getvalue().count("JSON совпадает"), len(LISTS))
@@ -0,0 +1,97 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+
+from silant import machine_stats
+from silant.models import MachineStats
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_complaint, make_machine, make_maintenance, make_user
+
+D = datetime.date
+
+
+def stats_rows() -> dict:
+    return {
+        row["machine_id"]: row
+        for row in MachineStats.objects.values("machine_id", *machine_stats.STAT_FIELDS[:-1])
+    }
+
+
+class MachineStatsTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        client, service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = make_machine("0001", client, service)
+            self.second = make_machine("0002", client, service)
+
+    def stats(self, machine):
+        return MachineStats.objects.get(machine=machine)
+
+    def test_new_machine_gets_empty_stats(self):
+        stats = self.stats(self.first)
+        self.assertEqual((stats.maintenance_count, stats.complaint_count, stats.operating_hours), (0, 0, 0))
+        self.assertIsNone(stats.last_maintenance_date)
+
+    def test_hours_come_from_latest_reading(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.first, D(2023, 3, 1), 9000)  # опечатка в старом ТО
+            make_maintenance(self.first, D(2023, 6, 1), 400)
+            make_complaint(self.first, D(2023, 5, 1), 350)
+        self.assertEqual(self.stats(self.first).operating_hours, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_complaint(self.first, D(2023, 7, 1), 420, downtime_days=3)
+        self.assertEqual(self.stats(self.first).operating_hours, 420)
+
+    def test_same_day_readings(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.first, D(2023, 6, 1), 410)
+            make_maintenance(self.first, D(2023, 6, 1), 405)  # та же дата — решает id
+        self.assertEqual(self.stats(self.first).operating_hours, 405)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_complaint(self.first, D(2023, 6, 1), 407)
+        self.assertEqual(self.stats(self.first).operating_hours, 407)
+
+    def test_incremental_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            to1 = make_maintenance(self.first, D(2023, 3, 1), 200)
+            to2 = make_maintenance(self.first, D(2023, 6, 1), 400)
+            claim = make_complaint(self.first, D(2023, 5, 1), 300, downtime_days=4)
+            make_complaint(self.second, D(2023, 4, 1), 150, downtime_days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            to2.operating_hours = 380
+            to2.save()
+            claim.machine = self.second  # перенос на другую машину
+            claim.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            to1.delete()
+        incremental = stats_rows()
+        self.assertEqual(incremental[self.first.pk]["maintenance_count"], 1)
+        self.assertEqual(incremental[self.first.pk]["complaint_count"], 0)
+        self.assertEqual(incremental[self.second.pk]["downtime_days"], 6)
+        self.assertEqual(incremental[self.second.pk]["operating_hours"], 300)
+
+        MachineStats.objects.all().delete()
+        call_command("rebuild_machine_stats", stdout=StringIO())
+        self.assertEqual(stats_rows(), incremental)
+
+    def test_deleted_machine_has_no_stats(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.second, D(2023, 3, 1), 200)
+            self.second.delete()
+        self.assertEqual(set(stats_rows()), {self.first.pk})
+
+    def test_api_fields_and_ordering(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.first, D(2023, 3, 1), 200)
+            make_maintenance(self.second, D(2023, 3, 1), 500)
+        api = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+        rows = api.get("/api/machines/", {"ordering": "-current_operating_hours"}).json()["results"]
+        self.assertEqual([(r["serial_number"], r["current_operating_hours"]) for r in rows],
+                         [("0002", 500), ("0001", 200)])
+        rows = api.get("/api/machines/", {"stats__operating_hours__gte": 300}).json()["results"]
+        self.assertEqual([r["serial_number"] for r in rows], ["0002"])
@@ -0,0 +1,102 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from silant import maintenance_due
+from silant.models import MaintenanceDue
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+
+from .base import TO_1, SilantTestCase, make_machine, make_maintenance, make_ref, make_user
+
+D = datetime.date
+TO_2 = "ТО-2 (1000 м/час)"
+SHIPPED = D(2023, 1, 10)
+
+
+def due_rows() -> dict:
+    return {
+        (row["machine_id"], row["kind_id"]): row
+        for row in MaintenanceDue.objects.values(
+            "machine_id", "kind_id", "last_hours", "operating_hours", "usage_rate", "due_hours", "due_date",
+        )
+    }
+
+
+class MaintenanceDueTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.to1, self.to2 = make_ref("Вид ТО", TO_1), make_ref("Вид ТО", TO_2)
+        self.client_user, self.service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worked = make_machine("0001", self.client_user, self.service, shipment_date=SHIPPED)
+            self.idle = make_machine("0002", make_user("other", CLIENT_GROUP), self.service, shipment_date=SHIPPED)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.worked, SHIPPED + datetime.timedelta(days=60), 120)  # 2 м/час в день
+        maintenance_due.rebuild()
+
+    def due(self, machine, kind):
+        return MaintenanceDue.objects.get(machine=machine, kind=kind)
+
+    def test_forecast_from_usage_rate(self):
+        due = self.due(self.worked, self.to1)
+        self.assertEqual((due.last_hours, due.operating_hours, due.usage_rate), (120, 120, 2.0))
+        self.assertEqual((due.due_hours, due.due_date), (320, D(2023, 6, 19)))  # 200 м/час за 100 дней
+        due = self.due(self.worked, self.to2)
+        self.assertIsNone(due.last_hours)
+        self.assertEqual(due.due_hours, 1000)
+
+    def test_higher_kind_covers_lower(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.worked, D(2023, 4, 10), 180, kind=TO_2)
+        self.assertEqual(self.due(self.worked, self.to1).due_hours, 380)
+        self.assertEqual(self.due(self.worked, self.to2).due_hours, 1180)
+
+    def test_machine_without_readings_uses_fleet_median(self):
+        due = self.due(self.idle, self.to1)
+        self.assertEqual((due.usage_rate, due.due_hours, due.due_date), (2.0, 200, SHIPPED + datetime.timedelta(days=100)))
+
+    def test_refresh_reads_cached_medians(self):
+        with mock.patch.object(maintenance_due, "_fallback_rates", wraps=maintenance_due._fallback_rates) as rates:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.idle.consignee = "ООО Север"
+                self.idle.save()
+            maintenance_due.refresh([self.idle.pk])
+            self.assertEqual(rates.call_count, 0)
+
+            maintenance_due.rebuild()
+            self.assertEqual(rates.call_count, 1)
+
+    def test_rebuild_updates_medians(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_maintenance(self.worked, SHIPPED + datetime.timedelta(days=90), 360)  # теперь 4 м/час в день
+        self.assertEqual(self.due(self.idle, self.to1).usage_rate, 2.0)  # медианы из кэша
+        call_command("rebuild_maintenance_due", stdout=StringIO())
+        self.assertEqual(self.due(self.idle, self.to1).usage_rate, 4.0)
+
+    def test_missing_cache_is_filled(self):
+        maintenance_due.cache.delete(f"{maintenance_due.FALLBACK_KEY}:default")
+        maintenance_due.refresh([self.idle.pk])
+        self.assertEqual(self.due(self.idle, self.to1).usage_rate, 2.0)
+        self.assertIsNotNone(maintenance_due.cache.get(f"{maintenance_due.FALLBACK_KEY}:default"))
+
+    def test_incremental_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = make_maintenance(self.idle, D(2023, 2, 9), 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            record.operating_hours = 90
+            record.save()
+        incremental = due_rows()
+        maintenance_due.rebuild()
+        self.assertEqual(due_rows(), incremental)
+
+    def test_due_endpoint_scope_and_params(self):
+        api = self.api(self.client_user, role=CLIENT_GROUP)
+        rows = api.get("/api/maintenance/due/", {"kind": self.to1.pk}).json()["results"]
+        self.assertEqual([(r["machine"], r["due_hours"]) for r in rows], [(self.worked.pk, 320)])
+        rows = api.get("/api/maintenance/due/").json()["results"]
+        self.assertEqual([r["due_date"] for r in rows], sorted(r["due_date"] for r in rows))
+        self.assertEqual(api.get("/api/maintenance/due/", {"within_days": "-1"}).status_code, 400)
+        self.assertEqual(api.get("/api/maintenance/due/", {"kind": "x"}).status_code, 400)
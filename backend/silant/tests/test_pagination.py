@@ -0,0 +1,140 @@
+import datetime
+import json
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_complaint, make_machine, make_user
+
+DAY = datetime.date(2023, 1, 1)
+
+
+class KeysetPaginationTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = make_user("manager", MANAGER_GROUP)
+        client, service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        # по три машины на дату: порядок внутри даты решает id
+        self.machines = [
+            make_machine(f"{i:04d}", client, service, shipment_date=DAY + datetime.timedelta(days=i // 3))
+            for i in range(10)
+        ]
+        self.api_client = self.api(self.manager, role=MANAGER_GROUP)
+
+    def get(self, url, **params):
+        response = self.api_client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, url, **params):
+        """Все страницы по ссылкам next: [(id, ...) страницы]."""
+        pages, data = [], self.get(url, **params)
+        while True:
+            pages.append([row["id"] for row in data["results"]])
+            if not data["next"]:
+                return pages, data
+            data = self.get(data["next"])
+
+    def expected(self, reverse=True):
+        ordered = sorted(self.machines, key=lambda m: (m.shipment_date, m.pk), reverse=reverse)
+        return [m.pk for m in ordered]
+
+    def test_page_number_with_count_is_default(self):
+        data = self.get("/api/machines/", page_size=4)
+        self.assertEqual(data["count"], 10)
+        self.assertIn("page=2", data["next"])
+        self.assertEqual([row["id"] for row in data["results"]], self.expected()[:4])
+
+    def test_cursor_round_trip_with_ties(self):
+        pages, last = self.walk("/api/machines/", pagination="cursor", page_size=4)
+        self.assertEqual(pages, [self.expected()[:4], self.expected()[4:8], self.expected()[8:]])
+        self.assertIsNone(last["count"])
+        self.assertIn("pagination=cursor", last["previous"])
+
+        # назад по previous — те же страницы в обратном порядке
+        back, data = [], last
+        while data["previous"]:
+            data = self.get(data["previous"])
+            back.append([row["id"] for row in data["results"]])
+        self.assertEqual(back, [self.expected()[4:8], self.expected()[:4]])
+        self.assertIsNone(data["previous"])
+
+    def test_cursor_ascending_order_and_exact_count(self):
+        pages, last = self.walk("/api/machines/", pagination="cursor", page_size=3, ordering="shipment_date",
+                                count="exact")
+        self.assertEqual(sum(pages, []), self.expected(reverse=False))
+        self.assertEqual(last["count"], 10)
+
+    def test_cursor_param_alone_selects_keyset(self):
+        first = self.get("/api/machines/", pagination="cursor", page_size=4)
+        cursor = parse_qs(urlparse(first["next"]).query)["cursor"][0]
+        data = self.get("/api/machines/", cursor=cursor, page_size=4)
+        self.assertIsNone(data["count"])
+        self.assertEqual([row["id"] for row in data["results"]], self.expected()[4:8])
+
+    def test_fallback_to_page_number(self):
+        # ?page= и сортировка не по ключу — постранично даже в режиме курсора
+        data = self.get("/api/machines/", pagination="cursor", page=2, page_size=4)
+        self.assertEqual((data["count"], [row["id"] for row in data["results"]]), (10, self.expected()[4:8]))
+        data = self.get("/api/machines/", pagination="cursor", ordering="serial_number", page_size=4)
+        self.assertEqual(data["count"], 10)
+        self.assertIn("page=2", data["next"])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.api_client.get("/api/machines/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_child_lists_tie_break_on_equal_dates(self):
+        machine = self.machines[0]
+        complaints = [make_complaint(machine, DAY, node=f"Узел {i}") for i in range(5)]
+        pages, _ = self.walk("/api/complaints/", pagination="cursor", page_size=2)
+        self.assertEqual(sum(pages, []), sorted(c.pk for c in complaints)[::-1])
+
+    def test_no_offset_in_cursor_query(self):
+        first = self.get("/api/machines/", pagination="cursor", page_size=4)
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(first["next"])
+        selects = [q["sql"] for q in ctx.captured_queries if '"silant_machine"' in q["sql"]]
+        self.assertTrue(selects)
+        self.assertFalse([sql for sql in selects if "OFFSET" in sql or "COUNT(" in sql])
+
+
+class PageSizeAndAllRowsTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user, self.service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        other = make_user("other", CLIENT_GROUP)
+        for i in range(6):
+            make_machine(f"{i:04d}", self.client_user if i < 4 else other, self.service, model="ПД1,5" if i % 2 else "ПД2")
+
+    @override_settings(SILANT_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        client = self.api(self.service, role=SERVICE_GROUP)
+        self.assertEqual(len(client.get("/api/machines/", {"page_size": 2}).json()["results"]), 2)
+        self.assertEqual(len(client.get("/api/machines/", {"page_size": 5000}).json()["results"]), 3)
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_all_rows_stream_with_filters_and_scope(self):
+        rows = self.lines(self.api(self.client_user, role=CLIENT_GROUP).get("/api/machines/all/"))
+        self.assertEqual(sorted(r["serial_number"] for r in rows), ["0000", "0001", "0002", "0003"])
+
+        model = make_machine("x", self.client_user, self.service, model="ПД2").model_technique_id
+        rows = self.lines(self.api(self.service, role=SERVICE_GROUP).get(
+            "/api/machines/all/", {"model_technique": model, "ordering": "serial_number"},
+        ))
+        self.assertEqual([r["serial_number"] for r in rows], ["0000", "0002", "0004", "x"])
+
+        # та же строка, что в списке
+        listed = self.api(self.service, role=SERVICE_GROUP).get("/api/machines/", {"ordering": "serial_number"})
+        self.assertEqual(listed.json()["results"][0], self.lines(self.api(self.service, role=SERVICE_GROUP).get(
+            "/api/machines/all/", {"ordering": "serial_number"}))[0])
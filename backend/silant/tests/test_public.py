@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import RequestFactory, override_settings
+
+from silant import public_lookup, refcache, throttling
+from silant.roles import CLIENT_GROUP, SERVICE_GROUP
+from silant.views import PublicMachineLookupView
+
+from .base import SilantTestCase, make_machine, make_user
+
+URL = "/api/public/machine-by-serial/"
+
+
+class PublicLookupTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.machine = make_machine("0017", make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP))
+
+    def test_hits_and_misses_are_cached(self):
+        refcache.snapshot()
+        with self.assertNumQueries(1):
+            found = public_lookup.lookup(["0017", "nope"])
+        self.assertEqual(found["0017"]["serial_number"], "0017")
+        self.assertIsNone(found["nope"])
+        with self.assertNumQueries(0):
+            self.assertEqual(public_lookup.lookup(["0017", "nope"]), found)
+
+    def test_machine_save_makes_cache_stale(self):
+        public_lookup.lookup(["0017"])
+        self.machine.serial_number = "0018"
+        self.machine.save()
+        found = public_lookup.lookup(["0017", "0018"])
+        self.assertIsNone(found["0017"])
+        self.assertEqual(found["0018"]["serial_number"], "0018")
+
+    def test_batch_size_limit(self):
+        too_many = ",".join(str(i) for i in range(public_lookup.MAX_BATCH + 1))
+        self.assertEqual(self.api().get(URL, {"serial": too_many}).status_code, 400)
+
+    def test_single_and_batch_responses(self):
+        response = self.api().get(URL, {"serial": " 0017 "})
+        self.assertEqual(response.json()["serial_number"], "0017")
+        self.assertEqual(self.api().get(URL, {"serial": "nope"}).status_code, 404)
+        self.assertEqual(self.api().get(URL).status_code, 400)
+
+        data = self.api().get(URL, {"serial": "nope,0017,,nope"}).json()
+        self.assertEqual(data[0], {"serial_number": "nope", "detail": "not_found"})
+        self.assertEqual(data[1]["serial_number"], "0017")
+        self.assertEqual(len(data), 2)
+
+
+@override_settings(SILANT_PUBLIC_THROTTLE={"rate": 0.001, "burst": 3})
+class PublicThrottleTests(SilantTestCase):
+
+    def test_bucket_runs_dry(self):
+        for _ in range(3):
+            self.assertEqual(self.api().get(URL, {"serial": "x"}).status_code, 404)
+        response = self.api().get(URL, {"serial": "x"})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_batch_costs_a_token_per_serial(self):
+        self.assertEqual(self.api().get(URL, {"serial": "a,b"}).status_code, 200)
+        self.assertEqual(self.api().get(URL, {"serial": "c,d"}).status_code, 429)
+        self.assertEqual(self.api().get(URL, {"serial": "c"}).status_code, 404)
+
+    def test_parallel_requests_do_not_share_tokens(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: throttling.take("1.2.3.4"), range(20)))
+        self.assertEqual(results.count(None), 3)
+
+    def test_refusal_spends_nothing_and_window_slides(self):
+        window = 3 / 0.001
+        with mock.patch.object(throttling, "time") as clock:
+            clock.time.return_value = 10 * window
+            for _ in range(3):
+                self.assertIsNone(throttling.take("1.2.3.4"))
+            self.assertAlmostEqual(throttling.take("1.2.3.4"), 1000)
+            self.assertEqual(caches["throttle"].get("silant:bucket:1.2.3.4:10"), 3)
+
+            # треть следующего окна: из прошлого «вытек» один токен
+            clock.time.return_value = 11 * window + window / 3
+            self.assertIsNone(throttling.take("1.2.3.4"))
+            self.assertIsNotNone(throttling.take("1.2.3.4"))
+
+            clock.time.return_value = 12 * window + window / 2
+            self.assertIsNone(throttling.take("1.2.3.4", cost=2))
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_api_and_html_share_ident_behind_proxy(self):
+        headers = {"HTTP_X_FORWARDED_FOR": "10.0.0.7, 192.168.0.1"}
+        for _ in range(3):
+            self.assertEqual(self.api().get(URL, {"serial": "x"}, **headers).status_code, 404)
+        # другой клиент за тем же прокси не страдает
+        self.assertEqual(self.api().get(URL, {"serial": "x"}, HTTP_X_FORWARDED_FOR="10.0.0.8").status_code, 404)
+
+        request = RequestFactory().get("/lookup/", {"serial": "x"}, **headers)
+        self.assertEqual(throttling.client_ident(request), "192.168.0.1")
+        response = PublicMachineLookupView.as_view()(request)
+        self.assertEqual(response.status_code, 429)
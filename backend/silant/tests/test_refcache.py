@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from silant import refcache
+from silant.models import Reference
+from silant.refcache import VERSION_KEY, ref_by_name, ref_choices, ref_name
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP
+
+from .base import SilantTestCase, make_ref, make_user
+
+
+class ReferenceCacheTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.engine = make_ref("Модель двигателя", "Д-245")
+        make_ref("Модель двигателя", "Д-240")
+
+    def test_snapshot_read_once(self):
+        refcache.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(ref_name(self.engine.pk), "Д-245")
+            self.assertEqual(ref_by_name("Модель двигателя", "Д-245"), self.engine)
+            self.assertEqual([name for _, name in ref_choices("Модель двигателя")], ["Д-240", "Д-245"])
+
+    def test_edit_resets_snapshot(self):
+        refcache.snapshot()
+        self.engine.name = "Д-245.12"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engine.save()
+        self.assertEqual(ref_name(self.engine.pk), "Д-245.12")
+
+    def test_unknown_id_fetched_without_version_bump(self):
+        snap = refcache.snapshot()
+        # bulk_create не шлёт сигналов: снимок о строке не знает
+        Reference.objects.bulk_create([Reference(entity="Модель двигателя", name="Д-260")])
+        fresh = Reference.objects.get(entity="Модель двигателя", name="Д-260")
+        with self.assertNumQueries(1):
+            self.assertEqual(ref_name(fresh.pk), "Д-260")
+            self.assertEqual(ref_name(fresh.pk), "Д-260")
+        self.assertIs(refcache.snapshot(), snap)
+
+    def test_misses_are_negative_cached(self):
+        snap = refcache.snapshot()
+        with self.assertNumQueries(1):
+            self.assertIsNone(ref_name(10 ** 6))
+            self.assertIsNone(ref_name(10 ** 6))
+        self.assertIs(refcache.snapshot(), snap)
+
+        snap.misses[10 ** 6] -= refcache.MISS_TTL  # срок промаха истёк — снова спрашиваем БД
+        with self.assertNumQueries(1):
+            self.assertIsNone(ref_name(10 ** 6))
+
+    @override_settings(SILANT_REFERENCE_CACHE="default")
+    def test_miss_does_not_touch_shared_version(self):
+        refcache.snapshot()
+        version = cache.get(VERSION_KEY)
+        self.assertIsNone(ref_name(10 ** 6))
+        self.assertEqual(cache.get(VERSION_KEY), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engine.save()
+        self.assertEqual(cache.get(VERSION_KEY), version + 2)  # сейчас и после фиксации
+
+
+class ReferenceBundleTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        make_ref("Модель двигателя", "Д-245")
+        self.client_api = self.api(make_user("client", CLIENT_GROUP), role=CLIENT_GROUP)
+
+    def test_etag_and_not_modified(self):
+        response = self.client_api.get("/api/references/bundle/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["Модель двигателя"][0]["name"], "Д-245")
+        etag = response["ETag"]
+
+        response = self.client_api.get("/api/references/bundle/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        # списки, слабые теги и * — как у остальных ETag API
+        for header in (f'"other", W/{etag}', "*"):
+            response = self.client_api.get("/api/references/bundle/", HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+
+    def test_etag_changes_after_edit(self):
+        etag = self.client_api.get("/api/references/bundle/")["ETag"]
+        manager = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = manager.post("/api/references/", {"entity": "Модель двигателя", "name": "Д-260"})
+        self.assertEqual(response.status_code, 201, response.content)
+
+        response = self.client_api.get("/api/references/bundle/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP, active_role, group_names, is_manager
+
+from .base import SilantTestCase, make_machine, make_user
+
+
+def group_queries(ctx) -> int:
+    return sum('"auth_user_groups"' in q["sql"] for q in ctx.captured_queries)
+
+
+class RoleResolutionTests(SilantTestCase):
+
+    def test_groups_read_once_per_user_object(self):
+        user = make_user("svc", SERVICE_GROUP, CLIENT_GROUP)
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(group_names(user), {SERVICE_GROUP, CLIENT_GROUP})
+            self.assertFalse(is_manager(user))
+            group_names(user)
+
+    def test_active_role_must_be_a_member_group(self):
+        user = make_user("client", CLIENT_GROUP)
+        request = RequestFactory().get("/", HTTP_X_ACTIVE_ROLE=" Client ")
+        self.assertEqual(active_role(request, user), CLIENT_GROUP)
+        request = RequestFactory().get("/", HTTP_X_ACTIVE_ROLE=MANAGER_GROUP)
+        self.assertIsNone(active_role(request, user))
+
+    def test_api_request_resolves_groups_once(self):
+        service = make_user("svc", SERVICE_GROUP)
+        make_machine("0017", make_user("client", CLIENT_GROUP), service)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api(service, role=SERVICE_GROUP).get("/api/machines/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(group_queries(ctx), 1)
+
+
+@override_settings(SILANT_ROLE_CACHE_TIMEOUT=60)
+class SharedRoleCacheTests(SilantTestCase):
+
+    def fresh(self, user):
+        return User.objects.get(pk=user.pk)
+
+    def test_shared_cache_skips_query(self):
+        user = make_user("svc", SERVICE_GROUP)
+        group_names(self.fresh(user))
+        with self.assertNumQueries(0):
+            self.assertEqual(group_names(User(pk=user.pk, username="svc")), {SERVICE_GROUP})
+
+    def test_membership_changes_reset_cache(self):
+        user = make_user("svc", SERVICE_GROUP)
+        group_names(self.fresh(user))
+
+        user.groups.add(Group.objects.get(name=MANAGER_GROUP))
+        self.assertEqual(group_names(self.fresh(user)), {SERVICE_GROUP, MANAGER_GROUP})
+
+        user.groups.remove(Group.objects.get(name=SERVICE_GROUP))
+        self.assertEqual(group_names(self.fresh(user)), {MANAGER_GROUP})
+
+        Group.objects.get(name=MANAGER_GROUP).user_set.clear()
+        self.assertEqual(group_names(self.fresh(user)), frozenset())
+
+    def test_group_delete_resets_cache(self):
+        user = make_user("svc", "temporary")
+        self.assertEqual(group_names(self.fresh(user)), {"temporary"})
+        Group.objects.get(name="temporary").delete()
+        self.assertEqual(group_names(self.fresh(user)), frozenset())
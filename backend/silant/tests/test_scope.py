@@ -0,0 +1,122 @@
+import datetime
+import re
+from itertools import product
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from silant import scope
+from silant.models import Complaint, Machine, Maintenance
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_complaint, make_machine, make_maintenance, make_user
+
+ROLES = (None, CLIENT_GROUP, SERVICE_GROUP, MANAGER_GROUP)
+
+
+def legacy_machines(user, role):
+    """Прежняя семантика: OR по полям машины, роль сужает до одного поля, менеджер видит всё."""
+    if user.is_staff or user.is_superuser or role == MANAGER_GROUP:
+        return Machine.objects.all()
+    if role == CLIENT_GROUP:
+        return Machine.objects.filter(client=user)
+    if role == SERVICE_GROUP:
+        return Machine.objects.filter(service_company=user)
+    return Machine.objects.filter(Q(client=user) | Q(service_company=user)).distinct()
+
+
+class ScopeTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = make_user("client", CLIENT_GROUP)
+        self.service = make_user("svc", SERVICE_GROUP)
+        self.both = make_user("both", CLIENT_GROUP, SERVICE_GROUP)  # клиент одних машин и сервис других
+        self.manager = make_user("manager", MANAGER_GROUP, CLIENT_GROUP)
+        self.staff = make_user("staff", is_staff=True)
+        self.nobody = make_user("nobody")
+        owners = [self.client_user, self.service, self.both, self.manager]
+        for i, (client, service) in enumerate(product(owners, owners)):
+            machine = make_machine(f"{i:04d}", client, service)
+            make_maintenance(machine, datetime.date(2023, 3, 1) + datetime.timedelta(days=i), i)
+            make_complaint(machine, datetime.date(2023, 4, 1) + datetime.timedelta(days=i), i)
+        self.users = [self.client_user, self.service, self.both, self.manager, self.staff, self.nobody]
+
+    def request(self, role):
+        return RequestFactory().get("/", **({"HTTP_X_ACTIVE_ROLE": role} if role else {}))
+
+    def cases(self):
+        for user, role in product(self.users, ROLES):
+            user = User.objects.get(pk=user.pk)
+            # роль, в которой пользователь не состоит, игнорируется — как «роль не выбрана»
+            effective = role if role and user.groups.filter(name=role).exists() else None
+            yield user, role, effective
+
+    def assert_same_visibility(self):
+        for user, role, effective in self.cases():
+            request = self.request(role)
+            expected = set(legacy_machines(user, effective).values_list("pk", flat=True))
+            with self.subTest(user=user.username, role=role):
+                machines = scope.restrict(Machine.objects.all(), user, request)
+                self.assertEqual(set(machines.values_list("pk", flat=True)), expected)
+                for model in (Maintenance, Complaint):
+                    rows = scope.restrict(model.objects.all(), user, request, via="machine")
+                    self.assertEqual(set(rows.values_list("machine_id", flat=True)), expected)
+                    self.assertEqual(rows.count(), len(expected))  # строки не размножаются
+
+    def test_same_visibility_with_fleet_cache(self):
+        self.assert_same_visibility()
+        self.assert_same_visibility()  # второй проход — из кэша парков
+
+    @override_settings(SILANT_FLEET_CACHE_TIMEOUT=0)
+    def test_same_visibility_with_subqueries(self):
+        self.assert_same_visibility()
+
+    def test_same_visibility_for_large_fleets(self):
+        with mock.patch.object(scope, "FLEET_MAX_IDS", 2):
+            self.assert_same_visibility()
+
+    def test_anonymous_sees_nothing(self):
+        from django.contrib.auth.models import AnonymousUser
+        self.assertFalse(scope.restrict(Machine.objects.all(), AnonymousUser(), self.request(None)).exists())
+
+
+@override_settings(SILANT_FLEET_CACHE_TIMEOUT=0)
+class ScopeQueryPlanTests(SilantTestCase):
+    """SQL списков API: без OR по полям машины и без DISTINCT в любой роли."""
+
+    def setUp(self):
+        super().setUp()
+        self.both = make_user("both", CLIENT_GROUP, SERVICE_GROUP)
+        other = make_user("other", CLIENT_GROUP)
+        for machine in (make_machine("0001", self.both, other), make_machine("0002", other, self.both)):
+            make_maintenance(machine, datetime.date(2023, 3, 1))
+            make_complaint(machine, datetime.date(2023, 4, 1))
+
+    def sql(self, url, role):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api(self.both, role=role).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()["results"])
+        return [q["sql"] for q in ctx.captured_queries if '"silant_machine"' in q["sql"]]
+
+    def test_no_or_and_no_distinct(self):
+        for url, role in product(("/api/machines/", "/api/maintenance/", "/api/complaints/"),
+                                 (None, CLIENT_GROUP, SERVICE_GROUP)):
+            with self.subTest(url=url, role=role):
+                for sql in self.sql(url, role):
+                    self.assertNotIn("DISTINCT", sql.upper())
+                    self.assertIsNone(re.search(r"\bOR\b", sql, re.IGNORECASE), sql)
+
+    def test_no_role_uses_union_all(self):
+        sql = " ".join(self.sql("/api/maintenance/", None))
+        self.assertIn("UNION ALL", sql.upper())
+
+    def test_single_role_is_plain_equality(self):
+        sql = " ".join(self.sql("/api/machines/", CLIENT_GROUP))
+        self.assertNotIn("UNION", sql.upper())
+        self.assertIn('"silant_machine"."client_id" =', sql)
@@ -0,0 +1,97 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+
+from silant import search
+from silant.models import Machine
+from silant.roles import CLIENT_GROUP, MANAGER_GROUP, SERVICE_GROUP
+
+from .base import SilantTestCase, make_machine, make_maintenance, make_user
+
+
+class MachineSearchTests(SilantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client_user, self.service = make_user("client", CLIENT_GROUP), make_user("svc", SERVICE_GROUP)
+        self.exact = self.machine("0017", consignee="ООО Север")
+        self.prefix = self.machine("00171", consignee="ИП Южный")
+        self.inside = self.machine("A0017", delivery_address="г. Вологда, ул. Северная")
+        self.other = self.machine("9999", contract_number="Д-42/2023", consignee="ЗАО Восток")
+
+    def machine(self, serial, **fields):
+        return make_machine(serial, self.client_user, self.service, **fields)
+
+    def found(self, text, queryset=None):
+        return set(search.matching(queryset or Machine.objects.all(), text).values_list("serial_number", flat=True))
+
+    def test_backend_per_vendor(self):
+        expected = {"sqlite": "fts5", "postgresql": "trigram"}.get(connection.vendor, "like")
+        self.assertEqual(search.backend(), expected)
+
+    def test_substring_in_any_field(self):
+        self.assertEqual(self.found("0017"), {"0017", "00171", "A0017"})
+        self.assertEqual(self.found("север"), {"0017", "A0017"})
+        self.assertEqual(self.found("42/20"), {"9999"})
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.found("0017 север"), {"0017", "A0017"})
+        self.assertEqual(self.found("север восток"), set())
+
+    def test_short_words_fall_back_to_icontains(self):
+        # LIKE в SQLite не сворачивает регистр кириллицы — берём слово как в данных
+        self.assertEqual(self.found("ИП"), {"00171"})
+        self.assertEqual(self.found("Д- 42"), {"9999"})
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.consignee = "ООО Запад"
+        self.other.save()
+        self.assertEqual(self.found("запад"), {"9999"})
+        self.assertEqual(self.found("восток"), set())
+        self.other.delete()
+        self.assertEqual(self.found("запад"), set())
+
+    def test_index_follows_bulk_create(self):
+        refs = {f"{key}_id": getattr(self.other, f"{key}_id") for key in (
+            "model_technique", "model_engine", "model_transmission", "model_drive_bridge", "model_steer_bridge")}
+        Machine.objects.bulk_create([Machine(
+            serial_number="B-777", shipment_date=datetime.date(2023, 1, 1),
+            client=self.client_user, service_company=self.service, **refs,
+        )])
+        self.assertEqual(self.found("b-777"), {"B-777"})
+
+    def test_ranking_exact_then_prefix(self):
+        ranked = search.rank(search.matching(Machine.objects.all(), "0017"), "0017")
+        serials = [m.serial_number for m in ranked]
+        self.assertEqual(serials[:2], ["0017", "00171"])
+        self.assertEqual(serials[2], "A0017")
+
+    def test_api_ranks_unless_ordering_given(self):
+        api = self.api(self.service, role=SERVICE_GROUP)
+        rows = api.get("/api/machines/", {"search": "0017"}).json()["results"]
+        self.assertEqual([r["serial_number"] for r in rows], ["0017", "00171", "A0017"])
+        rows = api.get("/api/machines/", {"search": "0017", "ordering": "-serial_number"}).json()["results"]
+        self.assertEqual([r["serial_number"] for r in rows], ["A0017", "00171", "0017"])
+
+    def test_child_lists_search_through_machine(self):
+        make_maintenance(self.exact, datetime.date(2023, 3, 1))
+        make_maintenance(self.other, datetime.date(2023, 3, 2))
+        manager = self.api(make_user("manager", MANAGER_GROUP), role=MANAGER_GROUP)
+        rows = manager.get("/api/maintenance/", {"search": "север 0017"}).json()["results"]
+        self.assertEqual([r["machine"] for r in rows], [self.exact.pk])
+
+    def test_search_respects_role_scope(self):
+        stranger = make_user("stranger", CLIENT_GROUP)
+        rows = self.api(stranger, role=CLIENT_GROUP).get("/api/machines/", {"search": "0017"}).json()["results"]
+        self.assertEqual(rows, [])
+
+
+@skipUnless(connection.vendor == "postgresql", "только PostgreSQL")
+class PostgresMachineSearchTests(SilantTestCase):
+
+    def test_icontains_uses_upper_trigram_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = search.matching(Machine.objects.order_by(), "север").explain()
+        self.assertIn("_utrgm", plan)
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+# ---- ограничение частоты публичных запросов ----
+# «Ведро с токенами» на IP: ведро вмещает burst токенов и пополняется со
+# скоростью rate токенов в секунду; запрос тратит cost токенов (пакетный
+# поиск — по токену на номер, но не больше ёмкости ведра).
+# Ведро считается скользящим окном длиной burst / rate секунд: счётчик текущего
+# окна плюс та доля прошлого, что ещё не «вытекла». Счётчики меняются только через
+# add/incr/decr, поэтому параллельные запросы с одного IP не тратят одни и те же
+# токены и ничего не ждут. Атомарны эти операции не во всех бэкендах: в LocMem —
+# в пределах процесса, в Redis/Memcached — между процессами; в файловом и БД-кэше
+# incr — это get + set. Поэтому ведро живёт в отдельном кэше SILANT_THROTTLE_CACHE.
+# IP берётся так же, как у троттлинга DRF (X-Forwarded-For с учётом NUM_PROXIES).
+
+
+def _config():
+    conf = getattr(settings, "SILANT_PUBLIC_THROTTLE", {})
+    return float(conf.get("rate", 1.0)), float(conf.get("burst", 20))
+
+
+def _cache():
+    return caches[getattr(settings, "SILANT_THROTTLE_CACHE", "default")]
+
+
+def client_ident(request) -> str:
+    """Идентификатор клиента для ведра — тот же, что у троттлинга DRF."""
+    return BaseThrottle().get_ident(request)
+
+
+def take(ident: str, cost: int = 1):
+    """
+    Списывает cost токенов из ведра ident.
+    Возвращает None, если запрос разрешён, иначе — сколько секунд ждать.
+    """
+    rate, burst = _config()
+    cost = min(cost, int(burst))  # пакет больше ведра просто опустошает его
+    window = burst / rate
+    slot, elapsed = divmod(time.time(), window)
+    key = f"silant:bucket:{ident}"
+    current, previous = f"{key}:{int(slot)}", f"{key}:{int(slot) - 1}"
+
+    store = _cache()
+    store.add(current, 0, int(2 * window) + 1)  # окно нужно и следующему как прошлое
+    used = store.incr(current, cost)
+    level = used + (store.get(previous) or 0) * (1 - elapsed / window)
+    if level <= burst:
+        return None
+    store.decr(current, cost)  # отказ токенов не тратит
+    return (level - burst) / rate
+
+
+class PublicLookupThrottle(BaseThrottle):
+    """Token bucket по IP для публичного поиска по зав. №."""
+
+    def allow_request(self, request, view):
+        cost = getattr(view, "throttle_cost", lambda request: 1)(request)
+        self._wait = take(client_ident(request), cost)
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .api_views import (
     MachineViewSet, MaintenanceViewSet, ComplaintViewSet, ReferenceViewSet,
-    PublicMachineBySerial, profile
+    AnalyticsView, PublicMachineBySerial, ServiceCompanyList, profile
 )
 
 router = DefaultRouter()
@@ -15,6 +15,9 @@ router.register(r"references", ReferenceViewSet)
 urlpatterns = [
     path("api/", include(router.urls)),
     path("api/public/machine-by-serial/", PublicMachineBySerial.as_view()),
+    path("api/service-companies/", ServiceCompanyList.as_view(), name="service_companies"),
+    path("api/analytics/", AnalyticsView.as_view(), name="analytics"),
+    path("api/analytics/<str:dimension>/", AnalyticsView.as_view(), name="analytics_dimension"),
     path("api/auth/jwt/create/", TokenObtainPairView.as_view(), name="jwt_obtain"),
     path("api/auth/jwt/refresh/", TokenRefreshView.as_view(), name="jwt_refresh"),
     path("api/auth/me/", profile, name="profile"),
@@ -0,0 +1,71 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# ---- счётчики изменений таблиц ----
+# По счётчику на таблицу в кэше Django; увеличиваются сигналами сохранения
+# и удаления (см. signals.py) и импортом после bulk-записи. Из них и из
+# области видимости пользователя собираются ETag'и ответов API.
+# Пропавший из кэша счётчик заводится заново от текущего времени, чтобы
+# старые ETag'и не совпали случайно.
+
+MACHINES = "machine"
+MAINTENANCE = "maintenance"
+COMPLAINTS = "complaint"
+REFERENCES = "reference"
+USERS = "user"
+
+KEY_PREFIX = "silant:version:"
+
+
+def _key(table: str) -> str:
+    return KEY_PREFIX + table
+
+
+def _seed() -> int:
+    return time.time_ns() // 1000
+
+
+def current(*tables) -> tuple:
+    """Текущие значения счётчиков (один запрос к кэшу)."""
+    found = cache.get_many([_key(t) for t in tables])
+    values = []
+    for table in tables:
+        value = found.get(_key(table))
+        if value is None:
+            cache.add(_key(table), _seed(), None)
+            value = cache.get(_key(table))
+        values.append(value)
+    return tuple(values)
+
+
+def _incr(tables):
+    for table in tables:
+        try:
+            cache.incr(_key(table))
+        except ValueError:
+            cache.set(_key(table), _seed(), None)
+
+
+def bump(*tables):
+    """Отмечает изменение таблиц — сразу и ещё раз после фиксации транзакции."""
+    _incr(tables)
+    transaction.on_commit(lambda: _incr(tables))
+
+
+def etag(*parts) -> str:
+    """Слабый ETag из произвольных значений (версии, пользователь, запрос)."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def matches(request, tag: str) -> bool:
+    """Совпадает ли ETag с If-None-Match запроса (сравнение слабое)."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    plain = tag.removeprefix("W/")
+    return "*" in candidates or any(c.removeprefix("W/") == plain for c in candidates)
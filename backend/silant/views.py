@@ -2,12 +2,15 @@ from django.views.generic import (
     DetailView, CreateView, UpdateView, TemplateView, RedirectView
 )
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.http import HttpResponse
 from django.urls import reverse_lazy
 from django_filters.views import FilterView
 
 from .models import Machine, Maintenance, Complaint
 from .filters import MachineFilter, MaintenanceFilter, ComplaintFilter
 from .acl import RoleQuerysetMixin, OwnerWriteRequiredMixin
+from .public_lookup import lookup, normalize_serial
+from .throttling import client_ident, take
 
 
 # --- Домашний редирект: аноним -> public_lookup, авторизованный -> список машин
@@ -23,22 +26,21 @@ class HomeRedirectView(RedirectView):
 class PublicMachineLookupView(TemplateView):
     template_name = "silant/public_lookup.html"
 
+    def get(self, request, *args, **kwargs):
+        serial = normalize_serial(request.GET.get("serial"))
+        if serial:
+            wait = take(client_ident(request))
+            if wait is not None:
+                response = HttpResponse("Слишком много запросов, повторите позже.", status=429)
+                response["Retry-After"] = str(int(wait) + 1)
+                return response
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        serial = self.request.GET.get("serial", "").strip()
-        machine = None
-        if serial:
-            machine = (
-                Machine.objects.select_related(
-                    "model_technique",
-                    "model_engine",
-                    "model_transmission",
-                    "model_drive_bridge",
-                    "model_steer_bridge",
-                )
-                .filter(serial_number=serial)
-                .first()
-            )
+        serial = normalize_serial(self.request.GET.get("serial"))
+        # поля 1–10 из кэша публичного поиска (model_*_name, serial_*), без запроса к БД при попадании
+        machine = lookup([serial])[serial] if serial else None
         ctx.update({"serial": serial, "machine": machine})
         return ctx
 
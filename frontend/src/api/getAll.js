@@ -0,0 +1,15 @@
+import api from "./axios";
+
+/**
+ * все строки списка одним запросом: GET <url>all/ отдаёт JSON Lines
+ * (те же фильтры и права, что у списка, без пагинации).
+ * url — адрес списка со слешем на конце, например "/api/references/".
+ */
+export default async function getAll(url, params) {
+  const { data } = await api.get(`${url}all/`, {
+    params,
+    responseType: "text",
+    transformResponse: [(d) => d],
+  });
+  return data.split("\n").filter(Boolean).map((line) => JSON.parse(line));
+}
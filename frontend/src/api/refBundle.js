@@ -0,0 +1,17 @@
+import api from "./axios";
+
+let pending = null;
+
+/**
+ * все справочники одним запросом: { entity: [{ id, name, description }] }.
+ * Запрос общий для всех select'ов страницы; сервер отдаёт ETag,
+ * так что повторная загрузка обходится ответом 304.
+ */
+export default function loadRefBundle({ force = false } = {}) {
+  if (!pending || force) {
+    pending = api.get("/api/references/bundle/")
+      .then(({ data }) => data)
+      .catch((e) => { pending = null; throw e; });
+  }
+  return pending;
+}
@@ -1,5 +1,5 @@
 import { useEffect, useState, useCallback } from "react";
-import api from "./axios";
+import loadRefBundle from "./refBundle";
 
 /**
  * подгружает элементы справочника и отдаёт options для <Select/>.
@@ -10,27 +10,13 @@ export default function useRefOptions(entity) {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
 
-  const load = useCallback(async () => {
+  const load = useCallback(async (force = false) => {
     if (!entity) return;
     setLoading(true);
     setError("");
-    try {   
-      let url = "/api/references/";
-      const params = { entity, ordering: "name", page_size: 100 };
-      let items = [];
-      let { data } = await api.get(url, { params });
-      if (Array.isArray(data)) {
-        items = data;
-      } else {
-        items = data.results || [];
-        while (data.next) {
-          const nextUrl = new URL(data.next);
-          const query = Object.fromEntries(nextUrl.searchParams.entries());
-          const { data: more } = await api.get(url, { params: query });
-          items = items.concat(more.results || []);
-          data = more;
-        }
-      }
+    try {
+      const bundle = await loadRefBundle({ force });
+      const items = bundle[entity] || [];
 
       setOptions(items.map(i => ({ label: i.name, value: i.id, raw: i })));
     } catch (e) {
@@ -43,5 +29,5 @@ export default function useRefOptions(entity) {
 
   useEffect(() => { load(); }, [load]);
 
-  return { options, loading, error, reload: load };
+  return { options, loading, error, reload: () => load(true) };
 }
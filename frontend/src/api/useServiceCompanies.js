@@ -1,6 +1,5 @@
 import { useEffect, useState } from "react";
 import api from "./axios";
-import { userDisplayName } from "../utils/displayName";
 
 export default function useServiceCompanies() {
   const [options, setOptions] = useState([]);
@@ -11,18 +10,9 @@ export default function useServiceCompanies() {
     (async () => {
       setLoading(true);
       try {
-        const { data } = await api.get("/api/machines/", { params: { page_size: 1000 }});
-        const users = new Map();
-        (data.results || data).forEach(m => {
-          if (m.service_company) {
-            const key = m.service_company.id || m.service_company.username;
-            if (!users.has(key)) users.set(key, m.service_company);
-          }
-        });
-        const opts = Array.from(users.values())
-          .map(u => ({ value: u.id || u.username, label: userDisplayName(u) }))
-          .sort((a,b) => a.label.localeCompare(b.label, "ru"));
-        if (mounted) setOptions(opts);
+        // сервер отдаёт уже отфильтрованный по роли и отсортированный список
+        const { data } = await api.get("/api/service-companies/");
+        if (mounted) setOptions(data.map(c => ({ value: c.id, label: c.name })));
       } finally {
         if (mounted) setLoading(false);
       }
@@ -5,6 +5,9 @@ import api from "../api/axios";
 import useRefOptions from "../api/useRefOptions";
 import useServiceCompanies from "../api/useServiceCompanies";
 
+// колонки таблицы — остальное приходит в карточке (GET по id)
+const LIST_FIELDS = "id,failure_date,machine_serial,failure_node_name,recovery_method_name,service_company";
+
 export default function Complaints() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -26,11 +29,11 @@ export default function Complaints() {
   async function load() {
     setLoading(true);
     try {
-      const params = { ordering: "-failure_date" };
+      const params = { ordering: "-failure_date", fields: LIST_FIELDS };
       if (filters.failure_node) params.failure_node = filters.failure_node;
       if (filters.recovery_method) params.recovery_method = filters.recovery_method;
       if (filters.service_company) params.service_company = filters.service_company;
-      if (filters.sn) params["machine__serial_number"] = filters.sn;
+      if (filters.sn) params.search = filters.sn;
       const { data } = await api.get("/api/complaints/", { params });
       setData(data.results || data);
     } finally {
@@ -5,6 +5,12 @@ import api from "../api/axios";
 import useRefOptions from "../api/useRefOptions";
 import { userDisplayName } from "../utils/displayName";
 
+// колонки таблицы — остальное приходит в карточке (GET по id)
+const LIST_FIELDS = [
+  "id", "serial_number", "model_technique_name", "model_engine_name", "shipment_date",
+  "client", "service_company", "last_maintenance_date", "complaint_count", "total_downtime_days",
+].join(",");
+
 export default function Machines() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -31,6 +37,7 @@ export default function Machines() {
     try {
       const params = {
         ordering: "-shipment_date",
+        fields: LIST_FIELDS,
         ...Object.fromEntries(Object.entries(filters).filter(([, v]) => v)),
       };
       const { data } = await api.get("/api/machines/", { params });
@@ -54,6 +61,9 @@ export default function Machines() {
       title: "Сервис",
       render: (_, r) => r.service_company?.first_name || r.service_company?.username || "—",
     },
+    { title: "Последнее ТО", dataIndex: "last_maintenance_date", render: (v) => v || "—" },
+    { title: "Рекламаций", dataIndex: "complaint_count" },
+    { title: "Простой, дн.", dataIndex: "total_downtime_days" },
   ];
 
   async function openDetails(record) {
@@ -5,6 +5,9 @@ import api from "../api/axios";
 import useRefOptions from "../api/useRefOptions";
 import useServiceCompanies from "../api/useServiceCompanies";
 
+// колонки таблицы — остальное приходит в карточке (GET по id)
+const LIST_FIELDS = "id,performed_date,machine_serial,kind_name,operating_hours,service_company";
+
 export default function Maintenance() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -20,10 +23,10 @@ export default function Maintenance() {
   async function load() {
     setLoading(true);
     try {
-      const params = { ordering: "-performed_date" };
+      const params = { ordering: "-performed_date", fields: LIST_FIELDS };
       if (filters.kind) params.kind = filters.kind;
       if (filters.service_company) params.service_company = filters.service_company;
-      if (filters.sn) params["machine__serial_number"] = filters.sn;
+      if (filters.sn) params.search = filters.sn;
       const { data } = await api.get("/api/maintenance/", { params });
       setData(data.results || data);
     } finally {